@@ -12,7 +12,29 @@
 # Applicable on:
 # - IModelElement
 #
+# Installation:
+#   This script uses modules of the "lib" directory which must be copied in the
+#   same directory as this very file (see the header of CoExplorer.py).
+#
 # Version history:
+# 1.3
+#    - Name filtering is done by the module namefilter of the "lib" directory,
+#      shared with batch searches on model snapshots (lib/batchsearch.py)
+#    - Compiled regular expressions are cached and names are prechecked
+#      against the literal parts of the expression (see lib/namefilter.py)
+#    - The number of instances of each metaclass is displayed, empty
+#      metaclasses can be hidden and the search starts with smallest ones.
+#      The counts are computed again when the model has changed
+#    - The search engine is in lib/searchengine.py
+#    - Searches can be saved with a name and run again. Their last results
+#      are reused and updated with the model changes (see lib/savedsearches.py).
+#      Saved searches can be run from scripts with runSavedSearch(name)
+#    - Notes, tagged values and stereotypes can be searched as well as names,
+#      with up to two criteria, using indexes (see lib/searchindex.py)
+#    - Fuzzy search: elements with a name or path similar to the filter are
+#      listed, the most similar first
+#    - The results table is virtual: rows, labels and images are only
+#      created when displayed, so that large results open instantly
 # 1.2  28 Oct 2013    
 #    - Support to Modelio 3.0 (and 2.x at the same time)
 #    - Refactoring and comments
@@ -35,6 +57,29 @@ except:
 # The proper way to get version in general is as below
 # version = Modelio.getInstance().getContext().getVersion()
 
+# add the "lib" directory to the path and load its modules from the
+# compiled cache (see CoExplorer.py and lib/bytecodecache.py)
+import os
+import sys
+def addLibraryToPath():
+  workspaceDirectory = Modelio.getInstance().getContext().getWorkspacePath().toString()
+  if orgVersion:
+    macrosDirectory = os.path.join(workspaceDirectory,'macros')
+  else:
+    macrosDirectory = os.path.join(workspaceDirectory,'.config','macros')
+  libraryDirectory = os.path.join(macrosDirectory,'lib')
+  if libraryDirectory not in sys.path:
+    sys.path.extend([macrosDirectory,libraryDirectory])
+  import bytecodecache
+  bytecodecache.install(libraryDirectory)
+addLibraryToPath()
+from misc import exists
+from namefilter import NameFilter
+from searchengine import searchElements
+from searchindex import searchFields,fuzzySearch,FIELD_NAMES
+from savedsearches import SavedSearch,theSavedSearchStore,runSavedSearch
+from modelchanges import theModelChangeTracker
+
 from java.lang import *
 from java.lang import Integer
 from java.util import ArrayList
@@ -63,9 +108,13 @@ from org.eclipse.swt.layout import GridLayout
 from org.eclipse.jface.viewers import TableViewer
 from org.eclipse.jface.viewers import ISelectionChangedListener
 from org.eclipse.jface.viewers import IStructuredContentProvider
+from org.eclipse.jface.viewers import ILazyContentProvider
 from org.eclipse.jface.viewers import LabelProvider
 from org.eclipse.jface.viewers import ListViewer
 from org.eclipse.jface.viewers import ViewerSorter
+from org.eclipse.jface.viewers import ViewerFilter
+from org.eclipse.jface.dialogs import InputDialog
+from org.eclipse.swt.widgets import Combo
 if orgVersion:
   from org.modelio.api.ui.text import TextWrapperForIElement
   from org.modelio.api.meta import IMetamodelService
@@ -150,52 +199,159 @@ class MetaclassWrapper:
   def __init__(self, metaclass):
     self.metaclass = metaclass
     self.name = metaclass.getSimpleName()
+    # number of instances of the metaclass (or submetaclasses). None if unknown
+    self.count = None
+  def getLabel(self):
+    if self.count is None:
+      return self.name
+    else:
+      return self.name + " (" + unicode(self.count) + ")"
 
 
-#=== Search Engine ================================================================= 
-import re
-def search(metaclasses, regexp, options):
-  print "Searching ..."
-  rawResults = HashSet()
+#=== Metaclass instance counts =====================================================
+# The number of instances of each metaclass, including the instances of its
+# submetaclasses, is computed in one pass over all the instances of the root
+# metaclass, in a background thread. The counts are kept between executions of
+# the macro with the watermark of the model when they were computed (see
+# lib/modelchanges.py), and are computed again when the model has changed.
+# They are displayed in the metaclass tables, with the time they were computed,
+# and used to order searches (see planSearch).
+import threading
+import time
+
+try:
+  METACLASS_COUNTS
+except NameError:
+  # (watermark, time, { metaclass : count }) or None
+  METACLASS_COUNTS = None
+
+def getMetaclassName(element):
+  if orgVersion:
+    return element.getMClass().getName()
+  else:
+    return element.metaclassName
+
+def computeMetaclassCounts(metaclasses, watermark):
   session = Modelio.getInstance().getModelingSession()
-  
-  #--- (1) Add all instances of selected metaclasses 
+  # number of instances of exactly each metaclass
+  exactCounts = {}
+  for element in session.findByClass(ROOT_METACLASS):
+    name = getMetaclassName(element)
+    exactCounts[name] = exactCounts.get(name, 0) + 1
+  exactMetaclassCounts = [(METAMODEL_SERVICE.getMetaclass(name), count) for (name, count) in exactCounts.items()]
+  counts = {}
   for metaclass in metaclasses:
-    print "  searching for instance of metaclass ",metaclass.getSimpleName()," ... ",
-    metaclassInstances = session.findByClass(metaclass)
-    print unicode(len(metaclassInstances)),"elements found"
-    rawResults.addAll(metaclassInstances)
-  # remove predefined types
-  predefTypes = Modelio.getInstance().getModelingSession().getModel().getUmlTypes().getBOOLEAN().getOwner()
-  rawResults.remove(predefTypes)
-  rawResults.remove(predefTypes.getOwner())
-  print "  ==>",unicode(len(rawResults)),"elements found (primitive types excluded)"
-  
-  #--- (2) Check for name matching
-  filteredResults = []
+    counts[metaclass] = sum([count for (exactMetaclass, count) in exactMetaclassCounts
+                                   if issubclass(exactMetaclass, metaclass)])
+  return (watermark, time.time(), counts)
+
+def getMetaclassCounts():
+  """ Return the counts if the model has not changed since they were computed,
+      None otherwise
+  """
+  if METACLASS_COUNTS is not None \
+     and theModelChangeTracker().isUpToDate(METACLASS_COUNTS[0]):
+    return METACLASS_COUNTS[2]
+  return None
+
+def getMetaclassCountsLabel():
+  """ Return a text telling when the counts displayed were computed
+  """
+  if METACLASS_COUNTS is None:
+    return "Counting the instances of the metaclasses..."
+  text = "Instances counted at " + time.strftime("%H:%M:%S", time.localtime(METACLASS_COUNTS[1]))
+  if getMetaclassCounts() is None:
+    text = text + " (the model has changed since, counting again...)"
+  return text
+
+def applyMetaclassCounts(counts):
+  for mc in unselectedMetaclasses + selectedMetaclasses:
+    mc.count = counts.get(mc.metaclass)
+
+def startMetaclassCounts(onCountsFun):
+  """ Compute the counts in the background if they are not known or if the
+      model has changed since they were computed, then set them in the metaclass
+      wrappers and call onCountsFun in the UI thread
+  """
+  counts = getMetaclassCounts()
+  if counts is not None:
+    applyMetaclassCounts(counts)
+    onCountsFun()
+    return
+  # the watermark is read before counting so that changes made during the
+  # count are seen by the next call
+  watermark = theModelChangeTracker().getWatermark()
+  metaclasses = [mc.metaclass for mc in unselectedMetaclasses + selectedMetaclasses]
+  class _OnCountsRunnable(Runnable):
+    def run(self):
+      applyMetaclassCounts(METACLASS_COUNTS[2])
+      onCountsFun()
+  def _count():
+    global METACLASS_COUNTS
+    try:
+      METACLASS_COUNTS = computeMetaclassCounts(metaclasses, watermark)
+    except Exception, e:
+      print "Metaclass instances cannot be counted:", e
+      return
+    Display.getDefault().asyncExec(_OnCountsRunnable())
+  thread = threading.Thread(target=_count, name="AdvancedSearch metaclass counts")
+  thread.setDaemon(True)
+  thread.start()
+
+def planSearch(metaclasses):
+  """ Return the metaclasses to search, smallest first if the counts are up to
+      date. Metaclasses that are submetaclasses of another one of the list are
+      removed since they cannot add any element to the result. The counts are
+      only used to order the search: they may be out of date, so metaclasses
+      are never removed because they had no instances.
+  """
+  planned = [metaclass for metaclass in metaclasses
+               if not exists(lambda other: other is not metaclass and issubclass(metaclass, other), metaclasses)]
+  counts = getMetaclassCounts()
+  if counts is not None:
+    planned.sort(key=lambda metaclass: counts.get(metaclass, sys.maxint))
+  return planned
+
+
+#=== Search Engine ================================================================= 
+# see lib/searchengine.py
+# criteria is the list of (fieldName, pattern) searched in addition to the name.
+# Searches on fields use the indexes of lib/searchindex.py
+# options[1] is True for a fuzzy search: results are then sorted by similarity
+def search(metaclasses, regexp, options, fieldName="Name", criteria=[]):
+  useRegex = options[0] == 1
+  if len(options) > 1 and options[1]:
+    return [element for (score, element) in fuzzySearch(planSearch(metaclasses), regexp)]
   try:
-    if options[0] == 1:
-      p = Pattern.compile(regexp)
-      for result in rawResults:
-        name = result.getName()
-        if (p.matcher(name).matches()):
-          filteredResults.append(result)
+    nameFilter = NameFilter(regexp, useRegex)
+    if fieldName == "Name" and len(criteria) == 0:
+      return searchElements(planSearch(metaclasses), nameFilter)
     else:
-      for result in rawResults:
-        if result.getName().find(regexp) != -1:
-          filteredResults.append(result)
+      fieldCriteria = [(fieldName, regexp, useRegex)] \
+                      + [(otherFieldName, pattern, useRegex) for (otherFieldName, pattern) in criteria]
+      return searchFields(planSearch(metaclasses), fieldCriteria)
   except PatternSyntaxException:
     messageBox("The entered regular expression: '"+regexp+"' has a syntax error.")
   except IllegalArgumentException:
     messageBox("Illegal Argument Exception.")
-  print "  "+unicode(len(filteredResults))+" elements selected after name filtering"
-  
-  #--- (3) sort results by name
-  filteredResults.sort(key=lambda x:x.getName())
-  return filteredResults
+  return []
 
 
+#=== Saved searches ================================================================
+# Saved searches are stored in the workspace (see lib/savedsearches.py)
+def saveCurrentSearch(name, metaclassWrappers, regexp, options):
+  search = SavedSearch(name, [mc.name for mc in metaclassWrappers], regexp, options[0] == 1)
+  theSavedSearchStore().add(search)
+  return search
 
+def runSavedSearchFromGUI(name):
+  try:
+    return runSavedSearch(name)
+  except PatternSyntaxException:
+    messageBox("The regular expression of the saved search '"+name+"' has a syntax error.")
+  except NameError, e:
+    messageBox(unicode(e))
+  return None
 
 
   
@@ -218,14 +374,7 @@ def messageBox(s):
 # Note that if a object is selected in the list of objects found, 
 # then it will be selected in modelio explorer.
 class SearchResultsWindow:
-  def __init__(self, parentWindow, metaclasses, wordtosearch, options):
-    # do the search
-    results = HashSet()
-    listMC = ArrayList()
-    for mc in metaclasses:
-      listMC.add(mc.metaclass)
-    results = search(listMC, wordtosearch, options)
-
+  def __init__(self, parentWindow, results, wordtosearch):
     # build the interface
     childW = 420
     if (len(results)==0):
@@ -270,7 +419,9 @@ class SearchResultsWindow:
       gridLayout2 = GridLayout()
       gridLayout2.numColumns = 1
       resultsGroup.setLayout(gridLayout)
-      table = TableViewer(resultsGroup, SWT.NONE);
+      # The table is virtual: its rows are only created when they become visible
+      table = TableViewer(resultsGroup, SWT.VIRTUAL);
+      table.setUseHashlookup(True)
       table.getControl().setLayoutData(GridData(GridData.FILL_BOTH))
       # When a element in the list is selected then select it in modelio explorer
       # This is achieved with fireNavigate method of the NavigationService
@@ -286,10 +437,11 @@ class SearchResultsWindow:
             Modelio.getInstance().getNavigationService().fireNavigate(element)
 
       sclistener = SCListener(self)
-      table.setContentProvider(self.SearchResultsContentProvider(results))
+      table.setContentProvider(self.SearchResultsContentProvider(table, results))
       table.setLabelProvider(self.SearchResultsLabelProvider())
       table.addSelectionChangedListener(sclistener)
       table.setInput(results)
+      table.setItemCount(resultsCount)
 
     #-- "Close" Button
     closeBtn = Button(child, SWT.FLAT)
@@ -303,12 +455,17 @@ class SearchResultsWindow:
     btndata = GridData(GridData.HORIZONTAL_ALIGN_END) ;    btndata.widthHint = 50
     closeBtn.setLayoutData(btndata)
     
-  #-- Content Provider for the table  
-  class SearchResultsContentProvider(IStructuredContentProvider):
-    def __init__(self, results):
+  #-- Lazy content Provider for the table
+  # Rows are given to the table on demand, when they become visible
+  class SearchResultsContentProvider(ILazyContentProvider):
+    def __init__(self, viewer, results):
+      self.viewer = viewer
       self.results = results
-    def getElements(self, element):
-      return self.results
+    def updateElement(self, index):
+      self.viewer.replace(self.results[index], index)
+    def inputChanged(self, viewer, oldInput, newInput):
+      if newInput is not None:
+        self.results = newInput
     def dispose(self):
       pass
 
@@ -358,11 +515,16 @@ class SearchWindow:
     def getImage(self, metaclassWrapper):
       return getMetaclassImageFromMetaclass(metaclassWrapper.metaclass)
     def getText(self, metaclassWrapper):
-      return metaclassWrapper.name
+      return metaclassWrapper.getLabel()
+
+  # Filter hiding the metaclasses known to have no instances
+  class _NonEmptyMCFilter(ViewerFilter):
+    def select(self, viewer, parentElement, metaclassWrapper):
+      return metaclassWrapper.count != 0
       
   def __init__(self):
     childW = 500
-    childH = 400
+    childH = 540
     parent = Display.getDefault().getActiveShell()
     child = Shell(parent, SWT.CLOSE | SWT.RESIZE)
     child.setMinimumSize(childW, childH)
@@ -375,6 +537,22 @@ class SearchWindow:
     child.setLocation((parentW-childW)/2+parentX, (parentH-childH)/2+parentY)
     child.setSize(childW, childH)
     child.open()
+    startMetaclassCounts(self._refreshMetaclassTables)
+
+  def _refreshMetaclassTables(self):
+    for table in [self.unselectedMetaclassesTable, self.selectedMetaclassTable]:
+      if not table.getControl().isDisposed():
+        table.refresh()
+    if not self.countsLabel.isDisposed():
+      self.countsLabel.setText(getMetaclassCountsLabel())
+
+  def _refreshMetaclassCounts(self):
+    """ Show that the counts are out of date if the model has changed, and
+        compute them again
+    """
+    if not self.countsLabel.isDisposed():
+      self.countsLabel.setText(getMetaclassCountsLabel())
+    startMetaclassCounts(self._refreshMetaclassTables)
 
   def _createContent(self, child):
     gridLayout = GridLayout(1, 1)
@@ -382,22 +560,68 @@ class SearchWindow:
 
     #---- (1) "Name filter" group
     # This group contains:
-    # - a text area with a filter label
+    # - a filter label, a combo for the field searched and a text area
+    # - an optional second criterion ("and") with the same components
     # - regexpr check box with its label
     nameFilterGroup = Group(child, SWT.NONE)
     fd_resultsGroup = GridData(GridData.FILL_HORIZONTAL)
     nameFilterGroup.setLayoutData(fd_resultsGroup)
     nameFilterGroup.setText("Name filter")
     gridLayout2 = GridLayout()
-    gridLayout2.numColumns = 2
+    gridLayout2.numColumns = 3
     nameFilterGroup.setLayout(gridLayout2)
     filterlabel = Label(nameFilterGroup, SWT.NULL)
     filterlabel.setText("Filter: ")
+    fieldCombo = Combo(nameFilterGroup, SWT.READ_ONLY)
+    fieldCombo.setItems(FIELD_NAMES)
+    fieldCombo.select(0)
     filterTxt = Text(nameFilterGroup, SWT.SINGLE | SWT.BORDER)
     gridData = GridData(SWT.FILL, SWT.DEFAULT, 1, 0)
     filterTxt.setLayoutData(gridData)
+    andlabel = Label(nameFilterGroup, SWT.NULL)
+    andlabel.setText("and: ")
+    andFieldCombo = Combo(nameFilterGroup, SWT.READ_ONLY)
+    andFieldCombo.setItems(FIELD_NAMES)
+    andFieldCombo.select(1)
+    andFilterTxt = Text(nameFilterGroup, SWT.SINGLE | SWT.BORDER)
+    andFilterTxt.setLayoutData(GridData(SWT.FILL, SWT.DEFAULT, 1, 0))
     regexpCheckBox = Button(nameFilterGroup, SWT.CHECK)
     regexpCheckBox.setText("Use regular expression")
+    gdataRegexp = GridData()
+    gdataRegexp.horizontalSpan = 3
+    regexpCheckBox.setLayoutData(gdataRegexp)
+    fuzzyCheckBox = Button(nameFilterGroup, SWT.CHECK)
+    fuzzyCheckBox.setText("Fuzzy search on names and paths (most similar first)")
+    gdataFuzzy = GridData()
+    gdataFuzzy.horizontalSpan = 3
+    fuzzyCheckBox.setLayoutData(gdataFuzzy)
+
+    # Return the criteria of the "and" line, if any
+    def getOtherCriteria():
+      andWord = andFilterTxt.getText().strip()
+      if andWord == "":
+        return []
+      else:
+        return [(andFieldCombo.getText(), andWord)]
+
+    #---- (1b) "Saved searches" group
+    # This group contains a combo with the names of the saved searches
+    # and the "Run", "Save..." and "Delete" buttons
+    savedSearchesGroup = Group(child, SWT.NONE)
+    savedSearchesGroup.setLayoutData(GridData(GridData.FILL_HORIZONTAL))
+    savedSearchesGroup.setText("Saved searches")
+    gridLayoutSaved = GridLayout()
+    gridLayoutSaved.numColumns = 4
+    savedSearchesGroup.setLayout(gridLayoutSaved)
+    savedSearchesCombo = Combo(savedSearchesGroup, SWT.READ_ONLY)
+    savedSearchesCombo.setLayoutData(GridData(SWT.FILL, SWT.DEFAULT, 1, 0))
+    savedSearchesCombo.setItems(theSavedSearchStore().getNames())
+    runSavedBtn = Button(savedSearchesGroup, SWT.FLAT)
+    runSavedBtn.setText("Run")
+    saveBtn = Button(savedSearchesGroup, SWT.FLAT)
+    saveBtn.setText("Save...")
+    deleteSavedBtn = Button(savedSearchesGroup, SWT.FLAT)
+    deleteSavedBtn.setText("Delete")
 
     #---- (2) "Metaclass filter" group
     # This group contains:
@@ -450,6 +674,24 @@ class SearchWindow:
     gdata3.minimumWidth = 200;
     selectedMetaclassTable.getControl().setLayoutData(gdata3)
     selectedMetaclassTable.setInput(selectedMetaclasses)
+    self.unselectedMetaclassesTable = unselectedMetaclassesTable
+    self.selectedMetaclassTable = selectedMetaclassTable
+
+    # (2.4) "Hide empty metaclasses" check box, below the tables
+    hideEmptyCheckBox = Button(mcFilterGroup, SWT.CHECK)
+    hideEmptyCheckBox.setText("Hide metaclasses without instances")
+    gdata4 = GridData(GridData.FILL_HORIZONTAL)
+    gdata4.horizontalSpan = 3
+    hideEmptyCheckBox.setLayoutData(gdata4)
+    nonEmptyFilter = self._NonEmptyMCFilter()
+    # (2.5) Time of the counts of instances
+    countsLabel = Label(mcFilterGroup, SWT.NONE)
+    countsLabel.setText(getMetaclassCountsLabel())
+    gdata5 = GridData(GridData.FILL_HORIZONTAL)
+    gdata5.horizontalSpan = 3
+    countsLabel.setLayoutData(gdata5)
+    self.countsLabel = countsLabel
+    window = self
 
     #---- (3) Bottom buttons : "Search" and "Close"
     compositeBottomButtons = Composite(child, SWT.NONE)
@@ -478,37 +720,90 @@ class SearchWindow:
           # "Search" button handler
           wordtosearch = filterTxt.getText().strip()
           if (wordtosearch != ""):
-            options = [regexpCheckBox.getSelection()]
-            SearchResultsWindow(child, selectedMetaclasses, wordtosearch, options)
+            options = [regexpCheckBox.getSelection(), fuzzyCheckBox.getSelection()]
+            results = search([mc.metaclass for mc in selectedMetaclasses], wordtosearch, options,
+                             fieldCombo.getText(), getOtherCriteria())
+            SearchResultsWindow(child, results, wordtosearch)
+          window._refreshMetaclassCounts()
+        elif (event.widget == saveBtn):
+          # "Save..." button handler: save the current criteria with a name
+          wordtosearch = filterTxt.getText().strip()
+          if fieldCombo.getText() != "Name" or len(getOtherCriteria()) != 0 \
+             or fuzzyCheckBox.getSelection():
+            messageBox("Only searches on names can be saved.")
+          elif (wordtosearch != ""):
+            dialog = InputDialog(child, "Save search", "Name of the search:",
+                                 savedSearchesCombo.getText(), None)
+            if dialog.open() == InputDialog.OK and dialog.getValue().strip() != "":
+              name = dialog.getValue().strip()
+              options = [regexpCheckBox.getSelection()]
+              saveCurrentSearch(name, selectedMetaclasses, wordtosearch, options)
+              savedSearchesCombo.setItems(theSavedSearchStore().getNames())
+              savedSearchesCombo.setText(name)
+        elif (event.widget == runSavedBtn):
+          # "Run" button handler: show the criteria of the saved search and its results
+          name = savedSearchesCombo.getText()
+          if (name != ""):
+            savedSearch = theSavedSearchStore().get(name)
+            fieldCombo.select(0)
+            fuzzyCheckBox.setSelection(False)
+            filterTxt.setText(savedSearch.pattern)
+            andFilterTxt.setText("")
+            regexpCheckBox.setSelection(savedSearch.regex)
+            for mc in unselectedMetaclasses + selectedMetaclasses:
+              if mc.name in savedSearch.metaclassNames and mc in unselectedMetaclasses:
+                unselectedMetaclasses.remove(mc)
+                selectedMetaclasses.append(mc)
+              elif mc.name not in savedSearch.metaclassNames and mc in selectedMetaclasses:
+                selectedMetaclasses.remove(mc)
+                unselectedMetaclasses.append(mc)
+            selectedMetaclasses.sort(key=key_name)
+            unselectedMetaclasses.sort(key=key_name)
+            unselectedMetaclassesTable.refresh()
+            selectedMetaclassTable.refresh()
+            results = runSavedSearchFromGUI(name)
+            if results is not None:
+              SearchResultsWindow(child, results, savedSearch.pattern)
+        elif (event.widget == deleteSavedBtn):
+          # "Delete" button handler
+          name = savedSearchesCombo.getText()
+          if (name != ""):
+            theSavedSearchStore().remove(name)
+            savedSearchesCombo.setItems(theSavedSearchStore().getNames())
         elif (event.widget == addBtn):
           #  ">>" button handler
-          indices = unselectedMetaclassesTable.getControl().getSelectionIndices()
-          i = 0
-          for indice in indices:
-            mc = unselectedMetaclasses[indice-i]
+          # (the selection is used rather than indices as some rows may be hidden)
+          for mc in unselectedMetaclassesTable.getSelection().toList():
             selectedMetaclasses.append(mc)
             unselectedMetaclasses.remove(mc)
-            i = i+1
           selectedMetaclasses.sort(key=key_name)
           unselectedMetaclassesTable.refresh()
           selectedMetaclassTable.refresh()
         elif (event.widget == removeBtn):
           #  "<<" button handler
-          indices = selectedMetaclassTable.getControl().getSelectionIndices()
-          i = 0
-          for indice in indices:
-            mc = selectedMetaclasses[indice-i]
+          for mc in selectedMetaclassTable.getSelection().toList():
             unselectedMetaclasses.append(mc)
             selectedMetaclasses.remove(mc)
-            i = i+1
           unselectedMetaclasses.sort(key=key_name)
           unselectedMetaclassesTable.refresh()
           selectedMetaclassTable.refresh()
+        elif (event.widget == hideEmptyCheckBox):
+          # "Hide metaclasses without instances" handler
+          window._refreshMetaclassCounts()
+          for table in [unselectedMetaclassesTable, selectedMetaclassTable]:
+            if hideEmptyCheckBox.getSelection():
+              table.addFilter(nonEmptyFilter)
+            else:
+              table.removeFilter(nonEmptyFilter)
     listener = _ButtonsListener()
     addBtn.addListener(SWT.Selection, listener)
     removeBtn.addListener(SWT.Selection, listener)
     closeBtn.addListener(SWT.Selection, listener)
     searchBtn.addListener(SWT.Selection, listener)
+    hideEmptyCheckBox.addListener(SWT.Selection, listener)
+    runSavedBtn.addListener(SWT.Selection, listener)
+    saveBtn.addListener(SWT.Selection, listener)
+    deleteSavedBtn.addListener(SWT.Selection, listener)
     
     #---- Install a table listener for both tables
     class _TableSelectionChangedListener(ISelectionChangedListener):
@@ -18,8 +18,10 @@
 #   sheets presents a "user oriented" view of the model, the CoExplorer will present
 #   a view strictly in line with the actual metamodel. 
 #   The set of all (non empty) features associated with each element is displayed,
-#   allowing the navigation to continue. Note that the tree is virtually infinite and
-#   that there is currently no indication that an element has been already visited.
+#   allowing the navigation to continue. Note that the tree is virtually infinite.
+#   With explore(...,markVisited=True) the elements already displayed are marked
+#   as visited and are not expanded again. Traversals of the model visiting each
+#   element once are provided by the module traversal (traverse, reachable).
 #   The methods followed are those of the form getXXX(), isXXX() and toString() with no
 #   parameters. A few "virtual" methods which do not have direct correspondance in modelio
 #   are also added, in particular to enable navigation to and within diagrams.
@@ -44,6 +46,8 @@
 #                 introspection.py
 #                 misc.py
 #                 modelioscriptor.py
+#                 bytecodecache.py
+#                 traversal.py
 #                 ...                <--- possibly other jython modules
 #                 res/
 #                     assoc-1.gif
@@ -51,6 +55,11 @@
 #                     ...            <--- other resources.
 #
 # History
+#   Version 1.2
+#      - modules are loaded from a versioned compiled cache (USE_BYTECODE_CACHE)
+#      - modules are reloaded only if their source file has changed (RELOAD_MODE)
+#      - import timings are printed when DEBUG_IMPORTS is True
+#      - modules traversal and metamodelschema
 #   Version 1.1 - December 02, 2013
 #      - addition of some explaination on startup
 #      - use modelioscriptor
@@ -58,8 +67,23 @@
 #   Version 1.0 - October 31, 2013
 #      - first public realease
 
-# MODULES_TO_RELOAD = []
-MODULES_TO_RELOAD = [ "misc", "modelioscriptor", "introspection"  ]
+# Modules of the "lib" directory used by the CoExplorer, in the order of their dependencies.
+# RELOAD_MODE tells when these modules are reloaded at each execution of the CoExplorer:
+#   "changed" : only if the source file of the module has changed since it was loaded.
+#               All the modules following a reloaded one are reloaded as well since they
+#               may import symbols from it.
+#   "always"  : at each execution (useful when developing the modules)
+#   "never"   : only loaded once
+# If DEBUG_IMPORTS is True the time spent to import each module is printed
+MODULES_TO_RELOAD = [ "misc", "modelioscriptor", "metamodelschema", "introspection", "traversal"  ]
+RELOAD_MODE = "changed"
+DEBUG_IMPORTS = False
+# If True the modules are loaded from the compiled cache lib/.jycache (see lib/bytecodecache.py)
+USE_BYTECODE_CACHE = True
+
+import os
+import sys
+import time
 
 def startup():
   print "The CoExplorer is starting ..."
@@ -88,6 +112,11 @@ def startup():
   print "   Current workspace is "+WORKSPACE_DIRECTORY
   print "   "+MACROS_DIRECTORY+" added to script path"
   print "   "+SCRIPT_LIBRARY_DIRECTORY+" added to script path"
+  #---- load the modules of the "lib" directory from the compiled cache (see bytecodecache)
+  if USE_BYTECODE_CACHE:
+    import bytecodecache
+    bytecodecache.install(SCRIPT_LIBRARY_DIRECTORY)
+    print "   "+bytecodecache.getCacheDirectory(SCRIPT_LIBRARY_DIRECTORY)+" used as compiled module cache"
 
   
 def displayInitialMessage():
@@ -100,6 +129,49 @@ def displayInitialMessage():
   print "exp(allInstances(Package))            --> explore all packages"
   print "exp(allDiagrams())                    --> explore all diagrams"
   print "explore(allMClasses())                --> explore the metamodel"
+  print "explore(selectedElements,markVisited=True) --> mark elements already displayed"
+  print "reachable(selectedElements,[\"getOwner\"]) --> list the owners of the elements"
+
+
+def getModuleSourceMTime(moduleName):
+  """ Return the modification time of the source file of a loaded module
+      or None if the module is not loaded or its source cannot be found.
+  """
+  module = sys.modules.get(moduleName)
+  path = getattr(module,"__file__",None)
+  if path is None:
+    return None
+  if path.endswith("$py.class"):
+    path = path[:-len("$py.class")]+".py"
+  elif path.endswith(".pyc"):
+    path = path[:-1]
+  try:
+    return os.path.getmtime(path)
+  except:
+    return None
+
+def unloadModules(moduleNames,mode):
+  """ Remove from sys.modules the modules that should be reloaded
+      according to the reload mode (see RELOAD_MODE)
+  """
+  stale = False
+  for moduleName in moduleNames:
+    if moduleName in sys.modules and mode != "never":
+      stale = stale \
+              or mode == "always" \
+              or getModuleSourceMTime(moduleName) != CO_EXPLORER_MODULE_MTIMES.get(moduleName)
+      if stale:
+        del sys.modules[moduleName]
+        if DEBUG_IMPORTS:
+          print "   module",moduleName,"will be reloaded"
+
+def recordModules(moduleNames):
+  for moduleName in moduleNames:
+    CO_EXPLORER_MODULE_MTIMES[moduleName] = getModuleSourceMTime(moduleName)
+
+def reportImport(moduleName,startTime):
+  if DEBUG_IMPORTS:
+    print "   import %s: %.3fs" % (moduleName,time.time()-startTime)
 
 
 #---- check if this is the first time this macro is loaded or not  
@@ -110,23 +182,34 @@ except:
   # this is the first time
   CO_EXPLORER_EXECUTION = 1
   startup()
+
+#---- modification time of the source of each module when it was loaded
+try:
+  CO_EXPLORER_MODULE_MTIMES
+except NameError:
+  CO_EXPLORER_MODULE_MTIMES = {}
     
 
-#----- reload and imports the modules (see the variable at the end of script)
-if "misc" in MODULES_TO_RELOAD:
-  try: del sys.modules["misc"] ; del misc
-  except: pass
+#----- reload if necessary and imports the modules (see the variables at the beginning of script)
+unloadModules(MODULES_TO_RELOAD,RELOAD_MODE)
+
+importStartTime = time.time()
 from misc import *
+reportImport("misc",importStartTime)
 
-if "modelioscriptor" in MODULES_TO_RELOAD:
-  try: del sys.modules["modelioscriptor"] ; del modelioscriptor
-  except: pass
+importStartTime = time.time()
 from modelioscriptor import *
+reportImport("modelioscriptor",importStartTime)
 
-if "introspection" in MODULES_TO_RELOAD:
-  try: del sys.modules["introspection"] ; del introspection
-  except: pass
+importStartTime = time.time()
 from introspection import *
+reportImport("introspection",importStartTime)
+
+importStartTime = time.time()
+from traversal import *
+reportImport("traversal",importStartTime)
+
+recordModules(MODULES_TO_RELOAD)
 
 
 
@@ -0,0 +1,185 @@
+#
+# DiagramUsageReport
+#
+# Description:
+# This script reports how diagrams are used to display the model:
+# - the number of elements displayed in 0, 1, 2, ... diagrams (histogram),
+# - the number of nodes and links of each diagram,
+# - the elements displayed in no diagram (orphans).
+# All diagrams are scanned once, using the index of diagram graphics of
+# the module modelioscriptor (see theDiagramIndex), so that running the
+# report again only scans the diagrams changed in the meantime.
+# The report is written in CSV or HTML (see the settings below).
+#
+# Author: jmfavre
+#
+# Applicable on: No selection
+#
+# Compatibility: Modelio 3.x
+#
+# Installation:
+#   This script uses modules of the "lib" directory which must be copied in the
+#   same directory as this very file (see the header of CoExplorer.py).
+#
+# Settings:
+#   OUTPUT_FORMAT    : "csv" or "html"
+#   OUTPUT_DIRECTORY : directory of the report files. None for the macros directory
+#   ORPHAN_METACLASS : metaclass of the elements reported when they are in no diagram
+#
+# CSV output:
+#   diagram-usage-histogram.csv : number of diagrams, number of elements
+#   diagram-usage-diagrams.csv  : diagram, metaclass, nodes, links, elements
+#   diagram-usage-elements.csv  : element, metaclass, number of diagrams
+# HTML output:
+#   diagram-usage.html          : the same tables
+#
+# Version history:
+# 1.0
+#    - Creation
+#
+
+#----- Settings
+OUTPUT_FORMAT = "html"
+OUTPUT_DIRECTORY = None
+ORPHAN_METACLASS = "NameSpace"
+
+import os
+import sys
+import csv
+import time
+import cgi
+from org.modelio.api.modelio import Modelio
+from org.modelio.api.diagram import IDiagramLink
+
+# add the "lib" directory to the path (see CoExplorer.py)
+WORKSPACE_DIRECTORY = Modelio.getInstance().getContext().getWorkspacePath().toString()
+MACROS_DIRECTORY = os.path.join(WORKSPACE_DIRECTORY,'macros')
+LIBRARY_DIRECTORY = os.path.join(MACROS_DIRECTORY,'lib')
+if LIBRARY_DIRECTORY not in sys.path:
+  sys.path.extend([MACROS_DIRECTORY,LIBRARY_DIRECTORY])
+import bytecodecache
+bytecodecache.install(LIBRARY_DIRECTORY)
+from modelioscriptor import allInstances,allDiagrams,theDiagramIndex
+
+
+def getFullName(element):
+  """ Return full qualified name of an element
+  """
+  name = element.getName()
+  owner = element.getCompositionOwner()
+  if owner is not None:
+    name = getFullName(owner) + "." + name
+  return name
+
+def isModifiable(element):
+  """ Elements of libraries, such as predefined types, are not modifiable
+  """
+  try:
+    return element.isModifiable()
+  except:
+    return True
+
+def getDiagramStatistics(index, diagram):
+  """ Return the number of nodes, links and elements displayed in a diagram
+      (the diagram itself excepted)
+  """
+  nbNodes = 0
+  nbLinks = 0
+  nbElements = 0
+  for element in index.getDisplayedElements(diagram):
+    if element == diagram:
+      continue
+    nbElements += 1
+    for graphic in index.getDiagramGraphics(element, [diagram]):
+      if isinstance(graphic, IDiagramLink):
+        nbLinks += 1
+      else:
+        nbNodes += 1
+  return (nbNodes, nbLinks, nbElements)
+
+def computeReport():
+  """ Return (histogram, diagramRows, elementRows, orphans) where
+      histogram is a list of (number of diagrams, number of elements),
+      diagramRows a list of (diagram, nodes, links, elements),
+      elementRows a list of (element, number of diagrams) and
+      orphans the list of the ORPHAN_METACLASS instances in no diagram
+  """
+  index = theDiagramIndex(refresh=True)
+  diagrams = list(allDiagrams())
+  diagramSet = set(diagrams)
+  diagramRows = [ (diagram,) + getDiagramStatistics(index, diagram) for diagram in diagrams ]
+  elementRows = [ (element, len(graphicsByDiagram))
+                  for (element, graphicsByDiagram) in index.elementGraphics.items()
+                  if element not in diagramSet ]
+  orphans = [ element for element in allInstances(ORPHAN_METACLASS)
+                if element not in index.elementGraphics and isModifiable(element) ]
+  elementRows.extend([ (element, 0) for element in orphans ])
+  counts = {}
+  for (element, nbDiagrams) in elementRows:
+    counts[nbDiagrams] = counts.get(nbDiagrams, 0) + 1
+  histogram = sorted(counts.items())
+  diagramRows.sort(key=lambda row: -row[1]-row[2])
+  elementRows.sort(key=lambda row: -row[1])
+  return (histogram, diagramRows, elementRows, orphans)
+
+
+#----- Output
+
+def getTables(report):
+  """ Return the tables of the report as (name, header, rows) with string cells
+  """
+  (histogram, diagramRows, elementRows, orphans) = report
+  def _metaclassName(element):
+    return element.getMClass().getName()
+  return [
+    ("histogram", ["Diagrams", "Elements"],
+       [ [unicode(n), unicode(count)] for (n, count) in histogram ]),
+    ("diagrams", ["Diagram", "Metaclass", "Nodes", "Links", "Elements"],
+       [ [getFullName(d), _metaclassName(d), unicode(nodes), unicode(links), unicode(elements)]
+         for (d, nodes, links, elements) in diagramRows ]),
+    ("elements", ["Element", "Metaclass", "Diagrams"],
+       [ [getFullName(e), _metaclassName(e), unicode(n)] for (e, n) in elementRows ]) ]
+
+def writeCSV(tables, directory):
+  paths = []
+  for (name, header, rows) in tables:
+    path = os.path.join(directory, "diagram-usage-"+name+".csv")
+    f = open(path, "wb")
+    try:
+      writer = csv.writer(f)
+      for row in [header] + rows:
+        writer.writerow([ cell.encode("utf-8") for cell in row ])
+    finally:
+      f.close()
+    paths.append(path)
+  return paths
+
+def writeHTML(tables, directory):
+  path = os.path.join(directory, "diagram-usage.html")
+  f = open(path, "wb")
+  try:
+    f.write("<html><head><meta charset='utf-8'><title>Diagram usage</title></head><body>\n")
+    for (name, header, rows) in tables:
+      f.write("<h2>%s</h2>\n<table border='1'>\n" % name.capitalize())
+      f.write("<tr>"+"".join([ "<th>%s</th>" % cell for cell in header ])+"</tr>\n")
+      for row in rows:
+        f.write(("<tr>"+"".join([ "<td>%s</td>" % cgi.escape(cell) for cell in row ])+"</tr>\n").encode("utf-8"))
+      f.write("</table>\n")
+    f.write("</body></html>\n")
+  finally:
+    f.close()
+  return [path]
+
+
+startTime = time.time()
+report = computeReport()
+(histogram, diagramRows, elementRows, orphans) = report
+directory = OUTPUT_DIRECTORY or MACROS_DIRECTORY
+if OUTPUT_FORMAT == "csv":
+  paths = writeCSV(getTables(report), directory)
+else:
+  paths = writeHTML(getTables(report), directory)
+print len(diagramRows),"diagrams,",len(elementRows),"elements,",len(orphans),"orphan "+ORPHAN_METACLASS+" instances"
+for (n, count) in histogram:
+  print "   %6d elements in %d diagram%s" % (count, n, "s" if n > 1 else "")
+print "report written to",", ".join(paths),"in %.1fs" % (time.time()-startTime)
@@ -1,15 +1,26 @@
 #
 # GetNewIdentifier
-#  This script generates a new unique identifier for module development.
+#  This script generates new unique identifiers for module development.
 #
 # Author:  tma, jmfavre
 #
 # Applicable on: All elements
 #
 # Version history:
+# 1.2   bulk mode: NB_IDENTIFIERS identifiers are generated at once, without
+#       creating elements in the model (Modelio 3 only). They are time-based
+#       (version 1) UUIDs, like the identifiers of Modelio elements
 # 1.1   27 October 2013 - update for Modelio 3.0
 # 1.0   16th April 2012 - creation
 
+# Number of identifiers to generate
+NB_IDENTIFIERS = 1
+
+# If OUTPUT_PATH is None the identifiers are printed in the script window,
+# otherwise they are written in the given file, one per line, for instance:
+#    OUTPUT_PATH = "C:\\MODELIO3-WORKSPACE\\identifiers.txt"
+OUTPUT_PATH = None
+
 # check if this is modelio 3 because the API has changed
 try:
   from org.modelio.api.modelio import Modelio
@@ -17,11 +28,58 @@ try:
 except:
   from com.modeliosoft.modelio.api.modelio import Modelio
   orgVersion = False
-  
-newElement = modelingSession.getModel().createClass()
-if orgVersion:
-  print newElement.getUuid() 
+
+# offset between the UUID epoch (15 October 1582) and the java epoch
+# (1 January 1970) in units of 100 nanoseconds
+UUID_EPOCH_OFFSET = 0x01B21DD213814000L
+
+def timeBasedUUIDs(n):
+  """ Return a list of n time-based (version 1) UUIDs, as defined in RFC 4122.
+      The UUIDs have consecutive timestamps starting from the current time.
+      The clock sequence and the node are random; the node has its multicast
+      bit set as it is not the address of a network card (RFC 4122, 4.5).
+  """
+  from java.lang import System
+  from java.security import SecureRandom
+  random = SecureRandom()
+  clockSequence = 0x8000 | random.nextInt(0x4000)
+  node = (random.nextLong() & 0xFFFFFFFFFFFFL) | 0x010000000000L
+  start = System.currentTimeMillis()*10000 + UUID_EPOCH_OFFSET
+  uuids = []
+  for i in xrange(n):
+    timestamp = start + i
+    uuids.append("%08x-%04x-%04x-%04x-%012x" % (
+      timestamp & 0xFFFFFFFFL,
+      (timestamp >> 32) & 0xFFFF,
+      0x1000 | ((timestamp >> 48) & 0x0FFF),
+      clockSequence,
+      node))
+  return uuids
+
+def newIdentifiers(n):
+  """ Return a list of n new identifiers.
+      With Modelio 3 identifiers are time-based UUIDs, which are generated
+      directly (see timeBasedUUIDs).
+      With Modelio 2 a temporary element is created and deleted for each
+      identifier, as identifiers are allocated by the model.
+  """
+  if orgVersion:
+    return timeBasedUUIDs(n)
+  else:
+    identifiers = []
+    for i in xrange(n):
+      newElement = modelingSession.getModel().createClass()
+      identifiers.append(newElement.getIdentifier())
+      newElement.delete()
+    return identifiers
+
+text = "\n".join(newIdentifiers(NB_IDENTIFIERS))
+if OUTPUT_PATH is None:
+  print text
 else:
-  print newElement.getIdentifier()
-  
-newElement.delete()
\ No newline at end of file
+  output = open(OUTPUT_PATH, "w")
+  try:
+    output.write(text + "\n")
+  finally:
+    output.close()
+  print NB_IDENTIFIERS, "identifiers written to", OUTPUT_PATH
@@ -11,7 +11,22 @@
 #
 # Compatibility 2.x, 3.x
 #
+# Installation:
+#   With Modelio 3.x, the diagrams are traversed with the module modelioscriptor
+#   of the "lib" directory, which must be copied in the same directory as this
+#   very file (see the header of CoExplorer.py). Otherwise each diagram is asked
+#   for the graphics of each selected element.
+#
+# Settings:
+#   OPEN_EDITORS : if True the diagrams found are opened, each one once
+#
 # Version history:
+# 1.2
+#    - Batch mode: the diagrams displaying all the selected elements are
+#      found in one pass over the diagrams, by traversing their graphics
+#    - Each diagram found is opened once, results are grouped by diagram
+#    - Diagram handles are closed after use
+#    - The graphics are traversed with getDiagramContent of modelioscriptor
 # 1.1  30 Oct 2013   
 #    - Port to Modelio 3.0
 #    - Refactoring and some comments
@@ -55,30 +70,87 @@ def getFullName(element):
       name = getFullName(owner) + "." + name
   return name
 
+#----- Settings
+# if True the diagrams found are opened in editors
+OPEN_EDITORS = True
+
 DIAGRAM_SERVICE = Modelio.getInstance().getDiagramService()
 ALL_DIAGRAMS = Modelio.getInstance().getModelingSession().findByClass(ModelioAbstractDiagram)
-ALL_DIAGRAM_HANDLES = map(DIAGRAM_SERVICE.getDiagramHandle,ALL_DIAGRAMS)
+
+if orgVersion:
+  # add the "lib" directory to the path (see CoExplorer.py)
+  import os
+  import sys
+  WORKSPACE_DIRECTORY = Modelio.getInstance().getContext().getWorkspacePath().toString()
+  MACROS_DIRECTORY = os.path.join(WORKSPACE_DIRECTORY,'macros')
+  LIBRARY_DIRECTORY = os.path.join(MACROS_DIRECTORY,'lib')
+  if LIBRARY_DIRECTORY not in sys.path:
+    sys.path.extend([MACROS_DIRECTORY,LIBRARY_DIRECTORY])
+try:
+  from modelioscriptor import getDiagramContent
+except ImportError:
+  # Modelio 2.x, or the "lib" directory is not installed
+  getDiagramContent = None
+
+def getDisplayedElements(diagram, elements):
+  """ Return the elements of the given set that are displayed in the diagram
+  """
+  if getDiagramContent is not None:
+    return set([element for element in getDiagramContent(diagram) if element in elements])
+  # ask the diagram for each element
+  diagramHandle = DIAGRAM_SERVICE.getDiagramHandle(diagram)
+  try:
+    return set([element for element in elements
+                  if len(diagramHandle.getDiagramGraphics(element)) != 0])
+  finally:
+    diagramHandle.close()
+
+def getDisplayingDiagramsOfElements(elements):
+  """ Return a dictionary giving for each element the list of the diagrams
+      displaying it. This is done in one pass over the diagrams.
+  """
+  elements = set(elements)
+  elementDiagrams = {}
+  for element in elements:
+    elementDiagrams[element] = []
+  for diagram in ALL_DIAGRAMS:
+    for element in getDisplayedElements(diagram, elements):
+      elementDiagrams[element].append(diagram)
+  return elementDiagrams
 
 def getDisplayingDiagrams(element):
   """ Return all diagrams displaying the element in a graphical form
   """
-  selectedDiagrams = []
-  for diagramHandle in ALL_DIAGRAM_HANDLES:
-    graphicElements = diagramHandle.getDiagramGraphics(element)
-    if len(graphicElements)!=0:
-      selectedDiagrams.append(diagramHandle.getDiagram())
-  return selectedDiagrams
+  return getDisplayingDiagramsOfElements([element])[element]
 
 def getDiagramSignature(diagram):
   return getFullName(diagram)+" : "+getMetaClassName(diagram)
 
+def plural(n, word):
+  return str(n)+" "+word+("s" if n>1 else "")
+
   
+elementDiagrams = getDisplayingDiagramsOfElements(selectedElements)
+# group the elements by diagram, keeping the order of the selection
+diagrams = []
+diagramElements = {}
 for element in selectedElements:
-  diagrams = getDisplayingDiagrams(element)
-  nbDiagrams = len(diagrams)
-  if nbDiagrams != 0:
-    print '"'+getFullName(element)+'"',"found in",nbDiagrams,"diagram"+("s" if nbDiagrams>1 else "")
-    for diagram in diagrams:
-      print "      ==>  "+getDiagramSignature(diagram)
-      Modelio.getInstance().getEditionService().openEditor(diagram)
-    print
+  diagramsOfElement = elementDiagrams[element]
+  if len(diagramsOfElement) == 0:
+    print '"'+getFullName(element)+'"',"not found in any diagram"
+  for diagram in diagramsOfElement:
+    if diagram not in diagramElements:
+      diagrams.append(diagram)
+      diagramElements[diagram] = []
+    if element not in diagramElements[diagram]:
+      diagramElements[diagram].append(element)
+print
+for diagram in diagrams:
+  elementsOfDiagram = diagramElements[diagram]
+  print getDiagramSignature(diagram),"displays",plural(len(elementsOfDiagram),"selected element")
+  for element in elementsOfDiagram:
+    print '      ==>  "'+getFullName(element)+'"'
+  if OPEN_EDITORS:
+    Modelio.getInstance().getEditionService().openEditor(diagram)
+  print
+print plural(len(selectedElements),"element"),"searched,",plural(len(diagrams),"diagram"),"found"
@@ -2,7 +2,7 @@ from org.modelio.metamodel.mda import ModuleComponent
 from org.modelio.metamodel.uml.infrastructure import Profile
 
 #
-# generateprofile 2.0
+# generateprofile 2.2
 #  This script generates a part of the 'module.xml' file used for the module development.
 #  It displays the complete description of a profile.
 #
@@ -13,8 +13,74 @@ from org.modelio.metamodel.uml.infrastructure import Profile
 # Version history:
 # 1.0   16th March 2012 - creation
 # 2.0   10th October 2013 - update for Modelio 3
+# 2.1   - the XML is written through a buffered writer instead of the console
+#       - attribute values are escaped
+#       - all the selected modules and profiles are generated in one document,
+#         in a root element <generated-profiles>
+# 2.2   - fragments of unchanged stereotypes are reused from a cache
+#       - only the stereotypes changed since the last execution are checked
+#         again (using the model change tracker of the "lib" directory)
 #
 
+#
+# Where to write the generated XML.
+# If OUTPUT_PATH is None the document is written in memory and is available
+# after the execution in the variable 'generatedXml' of the script window.
+# Otherwise the document is written in the given file, for instance:
+#    OUTPUT_PATH = "C:\\MODELIO3-WORKSPACE\\module-profiles.xml"
+#
+OUTPUT_PATH = None
+
+#
+# The fragments generated for stereotypes and metaclass references are kept
+# in a cache, keyed by the uuid of the element, together with a hash of the
+# content they were generated from. A fragment is regenerated only if this
+# hash has changed. The cache lives in the script window between executions.
+# Computing the hash reads the whole stereotype, so when the modules of the
+# "lib" directory are installed (see CoExplorer.py) the changes of the model
+# are tracked (see lib/modelchanges.py) and the fragments of the elements
+# that have not changed since they were last checked are reused directly.
+# If CACHE_PATH is not None, the cache is also saved in this file so that it
+# survives a restart of Modelio, for instance:
+#    CACHE_PATH = "C:\\MODELIO3-WORKSPACE\\module-profiles.cache"
+#
+CACHE_PATH = None
+
+import codecs
+import hashlib
+import os
+import sys
+import pickle
+from StringIO import StringIO
+from org.modelio.api.modelio import Modelio
+from org.modelio.metamodel.uml.infrastructure import Stereotype
+
+# add the "lib" directory to the path (see CoExplorer.py)
+WORKSPACE_DIRECTORY = Modelio.getInstance().getContext().getWorkspacePath().toString()
+MACROS_DIRECTORY = os.path.join(WORKSPACE_DIRECTORY, 'macros')
+LIBRARY_DIRECTORY = os.path.join(MACROS_DIRECTORY, 'lib')
+if LIBRARY_DIRECTORY not in sys.path:
+    sys.path.extend([MACROS_DIRECTORY, LIBRARY_DIRECTORY])
+try:
+    from modelchanges import theModelChangeTracker
+except ImportError:
+    # the "lib" directory is not installed: all fragments are checked
+    theModelChangeTracker = None
+
+try:
+    PROFILE_FRAGMENT_CACHE
+except NameError:
+    PROFILE_FRAGMENT_CACHE = {}
+
+# Watermark of the model (see lib/modelchanges.py) when the fragments were
+# last checked, and uuids of the elements whose fragment has been checked
+# against the model and has not changed since this watermark
+try:
+    PROFILE_CACHE_WATERMARK
+except NameError:
+    PROFILE_CACHE_WATERMARK = None
+    PROFILE_CACHE_CHECKED = set()
+
 #
 # Convert a boolean to string
 # Example:
@@ -23,38 +89,150 @@ from org.modelio.metamodel.uml.infrastructure import Profile
 #
 def booleanToString (value):
     return str(value).lower()
-    
+
+#
+# Escape a value so that it can be used as an XML attribute value
+# Example:
+#    a "b" & <c>  -->  a &quot;b&quot; &amp; &lt;c&gt;
+#
+def xmlEscape (value):
+    if value is None:
+        return u""
+    value = unicode(value)
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    if "\"" in value:
+        value = value.replace("\"", "&quot;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    return value
+
 #
 # Returns the description of an XML attribute
 # Example:
 #    name="value"
 #
 def xmlAttribute (name,value):
-    return name + "=\"" + value + "\""
+    return name + "=\"" + xmlEscape(value) + "\""
+
+#
+# Streaming XML writer
+#  Lines are accumulated in a buffer which is written to the output stream
+#  in chunks of 'bufferSize' characters, instead of printing each line.
+#  The number of elements written for each tag is counted to print a summary.
+# Example:
+#    writer = XmlWriter(StringIO())
+#    writer.start("profile", [("uid", "38cd..."), ("name", "JavaProfile")])
+#    writer.empty("notetype", [("name", "summary")])
+#    writer.end("profile")
+#    writer.flush()
+#
+class XmlWriter:
+    def __init__ (self, out, indent="    ", bufferSize=65536, depth=0):
+        self.out = out
+        self.indent = indent
+        self.bufferSize = bufferSize
+        self.depth = depth
+        self.buffer = []
+        self.bufferedSize = 0
+        self.counts = {}
+        self.regenerated = 0
+        self.checked = 0
+        self.reused = 0
+
+    def _write (self, line):
+        line = self.indent * self.depth + line + "\n"
+        self.buffer.append(line)
+        self.bufferedSize += len(line)
+        if self.bufferedSize >= self.bufferSize:
+            self.flush()
+
+    def _count (self, tag):
+        self.counts[tag] = self.counts.get(tag, 0) + 1
+
+    def _tag (self, tag, attributes):
+        return "<" + " ".join([tag] + [xmlAttribute(name, value) for (name, value) in attributes])
+
+    def start (self, tag, attributes=[]):
+        self._count(tag)
+        self._write(self._tag(tag, attributes) + ">")
+        self.depth += 1
+
+    def empty (self, tag, attributes=[]):
+        self._count(tag)
+        self._write(self._tag(tag, attributes) + "/>")
+
+    def end (self, tag):
+        self.depth -= 1
+        self._write("</" + tag + ">")
+
+    def raw (self, text, counts):
+        self.buffer.append(text)
+        self.bufferedSize += len(text)
+        for (tag, count) in counts.items():
+            self.counts[tag] = self.counts.get(tag, 0) + count
+        if self.bufferedSize >= self.bufferSize:
+            self.flush()
+
+    def flush (self):
+        if len(self.buffer) != 0:
+            self.out.write(u"".join(self.buffer))
+            self.buffer = []
+            self.bufferedSize = 0
+
+    def getCount (self, tag):
+        return self.counts.get(tag, 0)
 
 #
 # Note type description
 # Example:
 #    <notetype uid="38cfed8d-6a06-11e1-b50d-0027103f347d" name="summary" label="Summary" is-hidden="false"/>
 #
-def generateNoteType (notetype):
-    print "            <notetype " + xmlAttribute ("uid", notetype.getUuid().toString()) + " " + xmlAttribute ("name", notetype.getName()) + " " + xmlAttribute("label", notetype.getLabelKey()) + " " + xmlAttribute ("is-hidden", booleanToString(notetype.isIsHidden())) + "/>"
+def noteTypeAttributes (notetype):
+    return [
+        ("uid", notetype.getUuid().toString()),
+        ("name", notetype.getName()),
+        ("label", notetype.getLabelKey()),
+        ("is-hidden", booleanToString(notetype.isIsHidden()))]
+
+def generateNoteType (writer, notetype):
+    writer.empty("notetype", noteTypeAttributes(notetype))
 
 #
 # ExternDocument type description
 # Example:
 #    <externdocumenttype uid="38cfed8d-6a06-11e1-b50d-0027103f347d" name="summary" label="Summary" is-hidden="false"/>
 #
-def generateExternDocType (doctype):
-    print "            <externdocumenttype " + xmlAttribute ("uid", doctype.getUuid().toString()) + " " + xmlAttribute ("name", doctype.getName()) + " " + xmlAttribute("label", doctype.getLabelKey()) + " " + xmlAttribute ("is-hidden", booleanToString(doctype.isIsHidden())) + "/>"
+def externDocTypeAttributes (doctype):
+    return [
+        ("uid", doctype.getUuid().toString()),
+        ("name", doctype.getName()),
+        ("label", doctype.getLabelKey()),
+        ("is-hidden", booleanToString(doctype.isIsHidden()))]
+
+def generateExternDocType (writer, doctype):
+    writer.empty("externdocumenttype", externDocTypeAttributes(doctype))
 
 #
 # Tag type description
 # Example:
 #    <taggedvalues uid="38cfed8d-6a06-11e1-b50d-0027103f347d" name="implementation" label="implementation" parameter-card="1" is-hidden="false" is-signed="false" />
 #
-def generateTagType (tagtype):
-    print "            <taggedvalues " + xmlAttribute ("uid", tagtype.getUuid().toString()) + " " + xmlAttribute ("name", tagtype.getName()) + " " + xmlAttribute("label", tagtype.getLabelKey()) + " " + xmlAttribute ("parameter-card", tagtype.getParamNumber()) + " " + xmlAttribute ("is-hidden", booleanToString(tagtype.isIsHidden())) + " " + xmlAttribute ("is-signed", booleanToString(tagtype.isIsQualified())) + "/>"
+def tagTypeAttributes (tagtype):
+    return [
+        ("uid", tagtype.getUuid().toString()),
+        ("name", tagtype.getName()),
+        ("label", tagtype.getLabelKey()),
+        ("parameter-card", tagtype.getParamNumber()),
+        ("is-hidden", booleanToString(tagtype.isIsHidden())),
+        ("is-signed", booleanToString(tagtype.isIsQualified()))]
+
+def generateTagType (writer, tagtype):
+    writer.empty("taggedvalues", tagTypeAttributes(tagtype))
 
 #
 # Stereotype description
@@ -67,22 +245,30 @@ def generateTagType (tagtype):
 #        ...
 #    </stereotype>
 #
-def generateStereotype (stereotype):
-    owner = ""
+def stereotypeAttributes (stereotype):
+    attributes = [
+        ("uid", stereotype.getUuid().toString()),
+        ("name", stereotype.getName()),
+        ("label", stereotype.getLabelKey()),
+        ("metaclass", stereotype.getBaseClassName())]
     if stereotype.getParent() != None:
-        owner = " " + xmlAttribute ("owner-stereotype", stereotype.getParent().getName())
-    print "        <stereotype " + xmlAttribute ("uid", stereotype.getUuid().toString()) + " " + xmlAttribute ("name", stereotype.getName()) + " " + xmlAttribute("label", stereotype.getLabelKey()) + " " + xmlAttribute ("metaclass", stereotype.getBaseClassName()) + owner + " " + xmlAttribute ("is-hidden", booleanToString(stereotype.isIsHidden())) + ">"
-    print "            <icons>"
-    print "                <explorer " + xmlAttribute ("path", stereotype.getIcon()) + "/>"
-    print "                <diagram " + xmlAttribute ("path", stereotype.getImage()) + "/>"
-    print "            </icons>"
+        attributes.append(("owner-stereotype", stereotype.getParent().getName()))
+    attributes.append(("is-hidden", booleanToString(stereotype.isIsHidden())))
+    return attributes
+
+def generateStereotype (writer, stereotype):
+    writer.start("stereotype", stereotypeAttributes(stereotype))
+    writer.start("icons")
+    writer.empty("explorer", [("path", stereotype.getIcon())])
+    writer.empty("diagram", [("path", stereotype.getImage())])
+    writer.end("icons")
     for notetype in stereotype.getDefinedNoteType():
-        generateNoteType(notetype)
+        generateNoteType(writer, notetype)
     for tagtype in stereotype.getDefinedTagType():
-        generateTagType(tagtype)
+        generateTagType(writer, tagtype)
     for externDocType in stereotype.getDefinedExternDocumentType():
-        generateExternDocType(externDocType)
-    print "        </stereotype>"
+        generateExternDocType(writer, externDocType)
+    writer.end("stereotype")
 
 #
 # Metaclass description
@@ -91,15 +277,136 @@ def generateStereotype (stereotype):
 #        ...
 #    </anonymous-stereotype>
 #
-def generateMetaclassRef (metaclass):
-    print "        <anonymous-stereotype " + xmlAttribute ("uid", metaclass.getUuid().toString()) + " " + xmlAttribute ("metaclass", metaclass.getReferencedClassName()) + ">"
+def metaclassRefAttributes (metaclass):
+    return [
+        ("uid", metaclass.getUuid().toString()),
+        ("metaclass", metaclass.getReferencedClassName())]
+
+def generateMetaclassRef (writer, metaclass):
+    writer.start("anonymous-stereotype", metaclassRefAttributes(metaclass))
     for notetype in metaclass.getDefinedNoteType():
-        generateNoteType(notetype)
+        generateNoteType(writer, notetype)
     for tagtype in metaclass.getDefinedTagType():
-        generateTagType(tagtype)
+        generateTagType(writer, tagtype)
     for externDocType in metaclass.getDefinedExternDocumentType():
-        generateExternDocType(externDocType)
-    print "        </anonymous-stereotype>"
+        generateExternDocType(writer, externDocType)
+    writer.end("anonymous-stereotype")
+
+#
+# Content of a stereotype or a metaclass reference, that is everything
+# its fragment is generated from, including the owned note/tag/document types
+#
+def definedTypesContent (element):
+    return [noteTypeAttributes(notetype) for notetype in element.getDefinedNoteType()] \
+         + [tagTypeAttributes(tagtype) for tagtype in element.getDefinedTagType()] \
+         + [externDocTypeAttributes(doctype) for doctype in element.getDefinedExternDocumentType()]
+
+def stereotypeContent (stereotype):
+    return [stereotypeAttributes(stereotype), stereotype.getIcon(), stereotype.getImage()] \
+         + definedTypesContent(stereotype)
+
+def metaclassRefContent (metaclass):
+    return [metaclassRefAttributes(metaclass)] + definedTypesContent(metaclass)
+
+#
+# Hash of a content. The depth is part of the hash as it changes the indentation
+#
+def contentHash (depth, content):
+    return hashlib.sha1(repr((depth, content))).hexdigest()
+
+#
+# Uuids of the elements changed or deleted since a watermark, with their
+# owners, and the stereotypes whose parent stereotype has changed (its name
+# is in their fragment). None if the changes are not known.
+#
+def changedUuids (tracker, watermark):
+    changes = tracker.getChangesSince(watermark)
+    if changes is None:
+        return None
+    (changedElements, deletedIds) = changes
+    uuids = set(deletedIds)
+    for element in changedElements:
+        if element.getUuid().toString() in deletedIds:
+            continue
+        if isinstance(element, Stereotype) and element.getOwner() is not None:
+            for stereotype in element.getOwner().getDefinedStereotype():
+                if stereotype.getParent() == element:
+                    uuids.add(stereotype.getUuid().toString())
+        while element is not None:
+            uuids.add(element.getUuid().toString())
+            element = element.getCompositionOwner()
+    return uuids
+
+#
+# Forget the checks of the elements changed since the last execution, or of
+# all elements if these changes are not known
+#
+def startCacheCheck ():
+    global PROFILE_CACHE_WATERMARK
+    if theModelChangeTracker is None:
+        PROFILE_CACHE_CHECKED.clear()
+        return
+    tracker = theModelChangeTracker()
+    # the watermark is read before generating so that changes made during the
+    # generation are seen by the next execution
+    watermark = tracker.getWatermark()
+    uuids = changedUuids(tracker, PROFILE_CACHE_WATERMARK)
+    if uuids is None:
+        PROFILE_CACHE_CHECKED.clear()
+    else:
+        PROFILE_CACHE_CHECKED.difference_update(uuids)
+    PROFILE_CACHE_WATERMARK = watermark
+
+#
+# Write the fragment of a stereotype or a metaclass reference, either from the
+# cache if the element has not changed since it was checked or if its content
+# has not changed, or by generating it again
+#
+def generateCached (writer, element, contentFun, generateFun):
+    uuid = element.getUuid().toString()
+    entry = PROFILE_FRAGMENT_CACHE.get(uuid)
+    if entry is not None and uuid in PROFILE_CACHE_CHECKED and entry[3] == writer.depth:
+        writer.reused += 1
+    else:
+        key = contentHash(writer.depth, contentFun(element))
+        if entry is None or entry[0] != key:
+            out = StringIO()
+            fragmentWriter = XmlWriter(out, writer.indent, depth=writer.depth)
+            generateFun(fragmentWriter, element)
+            fragmentWriter.flush()
+            text = out.getvalue()
+            counts = fragmentWriter.counts
+            writer.regenerated += 1
+        else:
+            # the content has not changed: the fragment is reused, and its
+            # entry is stored again below with the depth as entries loaded
+            # from a CACHE_PATH file written by a previous version have none
+            (text, counts) = (entry[1], entry[2])
+            writer.checked += 1
+        entry = (key, text, counts, writer.depth)
+        PROFILE_FRAGMENT_CACHE[uuid] = entry
+        PROFILE_CACHE_CHECKED.add(uuid)
+    writer.raw(entry[1], entry[2])
+
+#
+# Load and save the cache from/to CACHE_PATH
+#
+def loadCache (path):
+    # loaded once, as the cache in memory is more recent than the file
+    if path is not None and os.path.exists(path) and len(PROFILE_FRAGMENT_CACHE) == 0:
+        f = open(path, "rb")
+        try:
+            PROFILE_FRAGMENT_CACHE.update(pickle.load(f))
+        finally:
+            f.close()
+
+def saveCache (path):
+    if path is not None:
+        f = open(path, "wb")
+        try:
+            pickle.dump(PROFILE_FRAGMENT_CACHE, f)
+        finally:
+            f.close()
 
 #
 # Profile description
@@ -108,13 +415,15 @@ def generateMetaclassRef (metaclass):
 #        ...
 #    </profile>
 #
-def generateProfile(profile):
-    print "    <profile " + xmlAttribute ("uid", profile.getUuid().toString()) + " " + xmlAttribute ("name", profile.getName()) + ">"
+def generateProfile (writer, profile):
+    writer.start("profile", [
+        ("uid", profile.getUuid().toString()),
+        ("name", profile.getName())])
     for metaclass in profile.getOwnedReference():
-        generateMetaclassRef (metaclass)
+        generateCached (writer, metaclass, metaclassRefContent, generateMetaclassRef)
     for stereotype in profile.getDefinedStereotype():
-        generateStereotype (stereotype)
-    print "    </profile>"
+        generateCached (writer, stereotype, stereotypeContent, generateStereotype)
+    writer.end("profile")
 
 #
 # Module description
@@ -123,17 +432,67 @@ def generateProfile(profile):
 #        ...
 #    </module>
 #
-def generateModule (module):
-    print "<module " + xmlAttribute ("uid", metaclass.getUuid().toString()) + " " + xmlAttribute ("name", module.getName()) + " " + xmlAttribute ("class", module.getjavaClassName()) + ">"
+def generateModule (writer, module):
+    writer.start("module", [
+        ("uid", module.getUuid().toString()),
+        ("name", module.getName()),
+        ("class", module.getJavaClassName())])
     for profile in module.getOwnedProfile():
-        generateProfile(profile)
+        generateProfile(writer, profile)
+    writer.end("module")
+
+#
+# Generate the description of all the selected modules and profiles
+# in the given output stream. Return the writer used.
+# The document has a single root element so that it is well-formed even
+# when several modules are selected. Profiles selected on their own are
+# indented as in a module.
+# Example:
+#    <generated-profiles>
+#        <module uid="..." name="JavaDesigner" class="...">
+#            ...
+#        </module>
+#    </generated-profiles>
+#
+def generateDocument (out, elements):
+    writer = XmlWriter(out)
+    writer.start("generated-profiles")
+    for element in elements:
+        if (isinstance(element, ModuleComponent)):
+            generateModule (writer, element)
+        if (isinstance(element, Profile)):
+            writer.depth = 2
+            generateProfile (writer, element)
+            writer.depth = 1
+    writer.end("generated-profiles")
+    writer.flush()
+    return writer
+
+#
+# Print a summary of the generation on the console
+#
+def printSummary (writer, destination):
+    print "module.xml fragment written to", destination
+    for tag in ["module", "profile", "anonymous-stereotype", "stereotype", "notetype", "taggedvalues", "externdocumenttype"]:
+        print "    %6d %s" % (writer.getCount(tag), tag)
+    print "    %d stereotypes and metaclass references regenerated, %d checked unchanged, %d reused" \
+          % (writer.regenerated, writer.checked, writer.reused)
 
 #
 # The macro execution starts here
 #
-for element in selectedElements:
-    if (isinstance(element, ModuleComponent)):
-        for profile in element.getOwnedProfile():
-            generateProfile (profile)
-    if (isinstance(element, Profile)):
-        generateProfile (element)
\ No newline at end of file
+loadCache(CACHE_PATH)
+startCacheCheck()
+if OUTPUT_PATH is None:
+    output = StringIO()
+    writer = generateDocument(output, selectedElements)
+    generatedXml = output.getvalue()
+    printSummary(writer, "the variable 'generatedXml' (" + str(len(generatedXml)) + " characters)")
+else:
+    output = codecs.open(OUTPUT_PATH, "w", "utf-8")
+    try:
+        writer = generateDocument(output, selectedElements)
+    finally:
+        output.close()
+    printSummary(writer, OUTPUT_PATH)
+saveCache(CACHE_PATH)
@@ -0,0 +1,192 @@
+#
+# batchsearch
+#
+# Headless search over model snapshots, with the name filters of AdvancedSearch.
+#
+# Author: jmfavre
+#
+# Compatibility: python 2.6+ (outside Modelio). Not jython 2.5, which has no json
+#   module. The search is sequential if multiprocessing is not available.
+#
+# Description:
+#   A search rule selects the elements that are instances of a set of
+#   metaclasses (or of their submetaclasses) and whose name is selected by
+#   a name filter (substring, or full match of a regular expression), that
+#   is with the same semantics as the search function of AdvancedSearch.
+#   Rules are applied to snapshots produced with the module snapshotexport.
+#   The snapshots are split in ranges of elements that are searched in a pool
+#   of processes, and the matches are written as JSON lines as soon as each
+#   range is searched. The order of the lines is thus not deterministic.
+#   Each line is like:
+#     {"snapshot": "a.snapshot", "rule": "class-names", "id": "...",
+#      "metaclass": "Class", "name": "order", "path": "Root.Sales.order"}
+#
+# Usage:
+#   python batchsearch.py [options] snapshot...
+#   Options:
+#     -r FILE, --rules=FILE          JSON file containing a list of rules like
+#                                    {"name": "class-names", "metaclasses": ["Class"],
+#                                     "pattern": "[A-Z].*", "regex": false}
+#     -m LIST, --metaclasses=LIST    comma separated metaclasses of a single rule
+#     -p PATTERN, --pattern=PATTERN  pattern of a single rule
+#     -x, --regex                    the pattern of the single rule is a regex
+#     -j N, --jobs=N                 number of processes (default: number of cores)
+#     -o FILE, --output=FILE         output file (default: standard output)
+#   EXAMPLE
+#     python batchsearch.py -m Class,Interface -x -p "[a-z].*" models/*.snapshot
+#
+# History
+#   Version 1.0
+#      - first version
+
+import sys
+import json
+import optparse
+
+try:
+  import multiprocessing
+except ImportError:
+  multiprocessing = None
+
+from snapshot import Snapshot
+from namefilter import NameFilter
+
+# number of elements searched by a task
+TASK_SIZE = 200000
+
+
+class SearchRule(object):
+  """ A named search: a set of metaclasses and a name filter
+  """
+  def __init__(self,name,metaclasses,pattern,regex=False):
+    self.name = name
+    self.metaclasses = metaclasses
+    self.pattern = pattern
+    self.regex = regex
+  def getNameFilter(self):
+    return NameFilter(self.pattern,self.regex)
+
+def readRules(path):
+  f = open(path)
+  try:
+    descriptions = json.load(f)
+  finally:
+    f.close()
+  return [ SearchRule(d.get("name",d["pattern"]),d["metaclasses"],d["pattern"],d.get("regex",False))
+             for d in descriptions ]
+
+
+# snapshots opened by the current process, indexed by path
+_OPENED_SNAPSHOTS = {}
+
+def _getSnapshot(path):
+  if path not in _OPENED_SNAPSHOTS:
+    _OPENED_SNAPSHOTS[path] = Snapshot(path)
+  return _OPENED_SNAPSHOTS[path]
+
+def searchRange(snapshotPath,rules,start,stop):
+  """ Apply the rules to the elements of the snapshot with an index in [start,stop).
+      Return the matches as a list of JSON lines.
+  """
+  snapshot = _getSnapshot(snapshotPath)
+  compiledRules = []
+  for rule in rules:
+    codes = set()
+    for metaclass in rule.metaclasses:
+      codes.update(snapshot.getMetaclassCodes(metaclass))
+    compiledRules.append((rule,codes,rule.getNameFilter()))
+  lines = []
+  metaclasses = snapshot.metaclasses.readRange(start,stop)
+  for j in range(stop-start):
+    code = metaclasses[j]
+    name = None
+    for (rule,codes,nameFilter) in compiledRules:
+      if code in codes:
+        index = start+j
+        if name is None:
+          name = snapshot.names[index]
+        if nameFilter.matches(name):
+          element = snapshot.getElement(index)
+          lines.append(json.dumps({
+            "snapshot"  : snapshotPath,
+            "rule"      : rule.name,
+            "id"        : snapshot.ids[index],
+            "metaclass" : snapshot.getMetaclassName(code),
+            "name"      : name,
+            "path"      : snapshot.getElementPath(element) }))
+  return lines
+
+def _searchTask(task):
+  (snapshotPath,rules,start,stop) = task
+  return searchRange(snapshotPath,rules,start,stop)
+
+def _getTasks(snapshotPaths,rules):
+  for snapshotPath in snapshotPaths:
+    snapshot = Snapshot(snapshotPath)
+    try:
+      count = len(snapshot)
+    finally:
+      snapshot.close()
+    for start in range(0,count,TASK_SIZE):
+      yield (snapshotPath,rules,start,min(start+TASK_SIZE,count))
+
+def batchSearch(snapshotPaths,rules,output,jobs=None):
+  """ Apply the rules to all the snapshots and write the matches as JSON lines
+      in output. Return the number of matches.
+      ([String],[SearchRule],file,int|None) -> int
+  """
+  # check the rules before starting the processes
+  for rule in rules:
+    rule.getNameFilter()
+  tasks = _getTasks(snapshotPaths,rules)
+  if multiprocessing is None or jobs == 1:
+    pool = None
+    results = (_searchTask(task) for task in tasks)
+  else:
+    pool = multiprocessing.Pool(jobs)
+    results = pool.imap_unordered(_searchTask,tasks)
+  nbMatches = 0
+  try:
+    for lines in results:
+      for line in lines:
+        output.write(line+"\n")
+      output.flush()
+      nbMatches += len(lines)
+  finally:
+    if pool is not None:
+      pool.close()
+      pool.join()
+  return nbMatches
+
+def main(args):
+  parser = optparse.OptionParser(usage="%prog [options] snapshot...")
+  parser.add_option("-r","--rules",dest="rules",help="JSON file containing the rules")
+  parser.add_option("-m","--metaclasses",dest="metaclasses",default="ModelElement",
+                    help="comma separated metaclasses of a single rule")
+  parser.add_option("-p","--pattern",dest="pattern",help="pattern of a single rule")
+  parser.add_option("-x","--regex",dest="regex",action="store_true",default=False,
+                    help="the pattern of the single rule is a regular expression")
+  parser.add_option("-j","--jobs",dest="jobs",type="int",default=None,
+                    help="number of processes")
+  parser.add_option("-o","--output",dest="output",help="output file")
+  (options,snapshotPaths) = parser.parse_args(args)
+  if options.rules is not None:
+    rules = readRules(options.rules)
+  elif options.pattern is not None:
+    rules = [ SearchRule(options.pattern,options.metaclasses.split(","),options.pattern,options.regex) ]
+  else:
+    parser.error("either --rules or --pattern must be given")
+  if len(snapshotPaths) == 0:
+    parser.error("no snapshot given")
+  output = sys.stdout if options.output is None else open(options.output,"w")
+  try:
+    nbMatches = batchSearch(snapshotPaths,rules,output,options.jobs)
+  finally:
+    if options.output is not None:
+      output.close()
+  sys.stderr.write("%d matches\n" % nbMatches)
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv[1:]))
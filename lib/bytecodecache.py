@@ -0,0 +1,163 @@
+#
+# bytecodecache
+#
+# Versioned cache of the compiled jython modules of the "lib" directory.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   Jython compiles each module into a "$py.class" file next to its source and
+#   reuses this file as long as it looks more recent than the source. Compiled
+#   files copied with the sources (from a zip, a repository, ...) may thus be
+#   outdated, and a fresh workspace compiles every module on first use.
+#   This module stores compiled modules in the directory lib/.jycache/<version>
+#   where <version> identifies the jython version. Each compiled file is named
+#   after the module and the SHA-1 of its source, so a compiled file is reused
+#   only for the exact source and jython version it was compiled from.
+#
+# Usage:
+#   - install(libDirectory) adds an importer to sys.meta_path that loads the
+#     modules of libDirectory from the cache, compiling them when necessary.
+#   - compileAll(libDirectory) fills the cache for all modules. This is the
+#     deploy step, for instance from the command line:
+#          jython lib/bytecodecache.py
+#   If the jython compiler API is not available, modules are imported as usual.
+#
+# History
+#   Version 1.0
+#      - first version
+
+import os
+import sys
+import glob
+import hashlib
+
+try:
+  from org.python.core import imp as JythonImp
+  from java.io import FileInputStream, FileOutputStream
+except ImportError:
+  JythonImp = None
+
+CACHE_DIRECTORY_NAME = ".jycache"
+COMPILED_SUFFIX = "$py.class"
+
+
+def getJythonVersionTag():
+  """ Return a string identifying the version of jython and of its bytecode
+  """
+  version = sys.version.split()[0]
+  try:
+    return version+"-api"+str(JythonImp.getAPIVersion())
+  except:
+    return version
+
+def getCacheDirectory(libDirectory):
+  return os.path.join(libDirectory,CACHE_DIRECTORY_NAME,getJythonVersionTag())
+
+def getSourceHash(sourcePath):
+  f = open(sourcePath,"rb")
+  try:
+    return hashlib.sha1(f.read()).hexdigest()
+  finally:
+    f.close()
+
+def getCompiledPath(cacheDirectory,moduleName,sourcePath):
+  """ Return the path of the compiled file for the current content of the source
+  """
+  return os.path.join(cacheDirectory,
+                      moduleName+"-"+getSourceHash(sourcePath)[:16]+COMPILED_SUFFIX)
+
+def compileModule(cacheDirectory,moduleName,sourcePath):
+  """ Compile the source of a module in the cache if it is not already there,
+      remove the compiled files of previous versions of the source and return
+      the path of the compiled file.
+  """
+  compiledPath = getCompiledPath(cacheDirectory,moduleName,sourcePath)
+  if not os.path.exists(compiledPath):
+    if not os.path.isdir(cacheDirectory):
+      os.makedirs(cacheDirectory)
+    source = FileInputStream(sourcePath)
+    try:
+      bytecode = JythonImp.compileSource(moduleName,source,sourcePath)
+    finally:
+      source.close()
+    # write in a temporary file first so that a partial file is never loaded
+    temporaryPath = compiledPath+".tmp"
+    output = FileOutputStream(temporaryPath)
+    try:
+      output.write(bytecode)
+    finally:
+      output.close()
+    for previousPath in glob.glob(os.path.join(cacheDirectory,moduleName+"-*"+COMPILED_SUFFIX)):
+      try: os.remove(previousPath)
+      except: pass
+    os.rename(temporaryPath,compiledPath)
+  return compiledPath
+
+def compileAll(libDirectory):
+  """ Compile all the modules of the given directory into the cache
+  """
+  cacheDirectory = getCacheDirectory(libDirectory)
+  for sourcePath in sorted(glob.glob(os.path.join(libDirectory,"*.py"))):
+    moduleName = os.path.splitext(os.path.basename(sourcePath))[0]
+    try:
+      compileModule(cacheDirectory,moduleName,sourcePath)
+      print "   ",moduleName,"compiled"
+    except Exception, e:
+      print "   ",moduleName,"not compiled:",e
+
+
+class CachedModuleImporter(object):
+  """ PEP 302 importer loading the top level modules of a directory
+      from the compiled cache.
+  """
+  isBytecodeCacheImporter = True
+  def __init__(self,libDirectory):
+    self.libDirectory = libDirectory
+    self.cacheDirectory = getCacheDirectory(libDirectory)
+  def _getSourcePath(self,moduleName):
+    return os.path.join(self.libDirectory,moduleName+".py")
+  def find_module(self,fullname,path=None):
+    if "." not in fullname and os.path.isfile(self._getSourcePath(fullname)):
+      return self
+    return None
+  def _load(self,fullname,sourcePath):
+    compiledPath = compileModule(self.cacheDirectory,fullname,sourcePath)
+    compiled = FileInputStream(compiledPath)
+    try:
+      # testing=True returns None instead of failing if the bytecode
+      # version is not the one of the running jython.
+      # The source path is given as compiled name so that __file__ refers
+      # to the source, as for a regular import.
+      return JythonImp.createFromPyClass(fullname,compiled,True,sourcePath,sourcePath)
+    finally:
+      compiled.close()
+  def load_module(self,fullname):
+    if fullname in sys.modules:
+      return sys.modules[fullname]
+    sourcePath = self._getSourcePath(fullname)
+    module = self._load(fullname,sourcePath)
+    if module is None:
+      # unusable compiled file: compile it again
+      os.remove(getCompiledPath(self.cacheDirectory,fullname,sourcePath))
+      module = self._load(fullname,sourcePath)
+      if module is None:
+        raise ImportError("cannot load compiled module "+fullname)
+    return sys.modules[fullname]
+
+
+def install(libDirectory):
+  """ Install the importer for libDirectory in sys.meta_path.
+      Previously installed importers are replaced.
+  """
+  if JythonImp is None:
+    return
+  sys.meta_path[:] = [ importer for importer in sys.meta_path
+                       if not getattr(importer,"isBytecodeCacheImporter",False) ]
+  sys.meta_path.insert(0,CachedModuleImporter(libDirectory))
+
+
+if __name__ == "__main__":
+  compileAll(os.path.dirname(os.path.abspath(__file__)))
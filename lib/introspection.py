@@ -9,6 +9,17 @@
 #
 # 
 # History
+#   Version 1.4
+#      - getSuperMetaclasses uses a table of super metaclasses built once
+#        for all registered metaclasses; metaclass signatures are cached
+#      - the metamodel schema exported by metamodelschema is loaded on
+#        startup and used instead of reflection (see loadMetamodelSchema)
+#   Version 1.3
+#      - explore(x,markVisited=True) marks the elements already displayed
+#      - getSlotColumns: bulk evaluation of features on many elements
+#      - ModelValue, MetaFeatureSlot and ElementInfo objects use __slots__
+#        and a single NoneModelValue is shared (see measureHeap in misc)
+#      - getAssociationMetaFeatures
 #   Version 1.2 - December 04, 2013
 #      - addition of a function "exp" as a shortcut to explore with html
 #   Version 1.1 - December 03, 2013
@@ -44,8 +55,10 @@ __all__ = [
   "getMetaclassMetamodelURL",
   "getSubMetaclasses",
   "getSuperMetaclasses",
+  "loadMetamodelSchema",
   "MetaFeature",
   "getMetaFeatures",
+  "getAssociationMetaFeatures",
   
   "MetaclassInfo",
   "getMetaclassInfo",
@@ -63,6 +76,7 @@ __all__ = [
   "getElementInfo",
   "MetaFeatureSlots",
   "getMetaFeatureSlots",
+  "getSlotColumns",
   
   "ElementInfo",
   "getElementInfo",
@@ -330,10 +344,128 @@ def getMetaclassMetamodelURL(metaclass,relative=False):
     
 
     
+#--------- metamodel schema ----------
+# The schema of the metamodel of this version of Modelio (see metamodelschema)
+# gives for each metaclass name its super/sub metaclasses and the signatures of
+# its meta features. It is loaded on startup if it has been exported and is
+# then used instead of reflection. None if there is no schema.
+METAMODEL_SCHEMA = None
+# java class name -> class, for the classes referred to in the schema
+_SCHEMA_CLASSES = dict()
+# java class name -> metaclass name, for the metaclasses of the schema
+_SCHEMA_METACLASS_NAMES = dict()
+# metaclass name -> meta features built from the schema, None if some of
+# their types cannot be found (e.g. type variables)
+_SCHEMA_META_FEATURES = dict()
+
+def loadMetamodelSchema(path=None):
+  """ Load the schema of the metamodel, by default the one exported for this
+      version of Modelio. Return True if a schema has been loaded.
+      (String|None) -> Boolean
+  """
+  global METAMODEL_SCHEMA,ANCESTOR_TABLE_BUILT
+  # imported here as metamodelschema imports this module to export schemas
+  from metamodelschema import loadSchema
+  schema = loadSchema(path)
+  METAMODEL_SCHEMA = None if schema is None else schema["metaclasses"]
+  _SCHEMA_CLASSES.clear()
+  _SCHEMA_METACLASS_NAMES.clear()
+  _SCHEMA_META_FEATURES.clear()
+  if METAMODEL_SCHEMA is not None:
+    for (name,entry) in METAMODEL_SCHEMA.items():
+      _SCHEMA_METACLASS_NAMES[entry["javaClass"]] = name
+  ANCESTOR_TABLE.clear()
+  ANCESTOR_TABLE_BUILT = False
+  METACLASS_INFOS.clear()
+  ASSOCIATION_META_FEATURES.clear()
+  return METAMODEL_SCHEMA is not None
+
+def _getSchemaEntry(metaclass):
+  """ Return the entry of the schema for a metaclass interface, or None if
+      there is no schema or if this is not the interface of a metaclass
+  """
+  if METAMODEL_SCHEMA is None:
+    return None
+  entry = METAMODEL_SCHEMA.get(getNameFromMetaclass(metaclass))
+  # implementation classes have the name of their metaclass
+  if entry is not None and entry["javaClass"] == metaclass.getCanonicalName():
+    return entry
+  return None
+
+import java.lang
+PRIMITIVE_JAVA_TYPES = {
+  "boolean" : java.lang.Boolean.TYPE,
+  "byte"    : java.lang.Byte.TYPE,
+  "char"    : java.lang.Character.TYPE,
+  "short"   : java.lang.Short.TYPE,
+  "int"     : java.lang.Integer.TYPE,
+  "long"    : java.lang.Long.TYPE,
+  "float"   : java.lang.Float.TYPE,
+  "double"  : java.lang.Double.TYPE,
+  "void"    : java.lang.Void.TYPE
+}
+
+def _loadClass(canonicalName):
+  """ Load a class from its canonical name with the class loader of the
+      metamodel. The name of a nested class (a.B.C) is not the name expected
+      by Class.forName (a.B$C): the last dots are replaced until it is found.
+  """
+  loader = ModelioElement.getClassLoader()
+  name = canonicalName
+  while True:
+    try:
+      return JavaLangClass.forName(name,False,loader)
+    except java.lang.ClassNotFoundException:
+      if "." not in name:
+        raise
+      i = name.rindex(".")
+      name = name[:i]+"$"+name[i+1:]
+
+def _getSchemaClass(canonicalName):
+  """ Return the class with the given canonical name. Metaclasses are got
+      from the metamodel service, other classes are loaded once.
+  """
+  if canonicalName not in _SCHEMA_CLASSES:
+    if canonicalName in _SCHEMA_METACLASS_NAMES:
+      javaclass = getMetaclassFromName(_SCHEMA_METACLASS_NAMES[canonicalName])
+    elif canonicalName in PRIMITIVE_JAVA_TYPES:
+      javaclass = PRIMITIVE_JAVA_TYPES[canonicalName]
+    else:
+      javaclass = _loadClass(canonicalName)
+    _SCHEMA_CLASSES[canonicalName] = javaclass
+  return _SCHEMA_CLASSES[canonicalName]
+
+def _getSchemaMetaFeatures(metaclass):
+  """ Return the meta features of a metaclass according to the schema, or None
+      if they are not in the schema
+  """
+  entry = _getSchemaEntry(metaclass)
+  if entry is None:
+    return None
+  name = getNameFromMetaclass(metaclass)
+  if name not in _SCHEMA_META_FEATURES:
+    features = entry["features"]
+    if exists(lambda (fname,declaringClass,type,multiple):declaringClass is None or type is None,features):
+      # some types are not classes (e.g. type variables): use reflection
+      _SCHEMA_META_FEATURES[name] = None
+    else:
+      _SCHEMA_META_FEATURES[name] = \
+        [ GetterMetaFeature(_getSchemaClass(declaringClass),fname,_getSchemaClass(type),multiple)
+          for (fname,declaringClass,type,multiple) in features ]
+  features = _SCHEMA_META_FEATURES[name]
+  return None if features is None else list(features)
+
+
+def _getSubMetaclassesFromModelio(metaclass):
+  return METAMODEL_SERVICE.getInheritingMetaclasses(metaclass)
+
 def getSubMetaclasses(metaclass):
   """ returns the list of direct subMetaclasses of a metaclass starting 
   """ 
-  return METAMODEL_SERVICE.getInheritingMetaclasses(metaclass)
+  entry = _getSchemaEntry(metaclass)
+  if entry is not None:
+    return map(getMetaclassFromName,entry["subs"])
+  return _getSubMetaclassesFromModelio(metaclass)
 
 
 # FIXME does not work with Modelio 3.0
@@ -344,8 +476,73 @@ def getSuperMetaclasses(metaclass,inclusive=True):
   """ This function is intentend to be used primarily with Modelio java metaclass,
       either implementation or interface, but in all cases that are below Element.
       If inclusive=True includes the metaclass at the beginning.
-      This function is inte
+      The super metaclasses are read from a table built once for all
+      metaclasses (see _buildAncestorTable).
+      (Class,Boolean?) -> [Class]
+      EXAMPLES
+        getSuperMetaclasses(getMetaclassFromName("Class"))
+        getSuperMetaclasses(getMetaclassFromName("Class"),inclusive=False)
+  """
+  if not ANCESTOR_TABLE_BUILT:
+    _buildAncestorTable()
+  ancestors = _getAncestors(metaclass)
+  return list(ancestors) if inclusive else list(ancestors[1:])
+
+# metaclass -> tuple of the metaclass and its super metaclasses. This table is
+# filled for all registered metaclasses on the first call to getSuperMetaclasses
+# (see _buildAncestorTable) and then on demand for other classes (e.g. the
+# implementation classes of metaclasses)
+ANCESTOR_TABLE = dict()
+ANCESTOR_TABLE_BUILT = False
+
+def _getAncestors(metaclass):
+  """ Return the tuple of the metaclass and its super metaclasses, from the
+      schema if any, otherwise by reflection. The ancestors of the super
+      metaclass are reused so that each metaclass is reflected once.
   """
+  if metaclass in ANCESTOR_TABLE:
+    return ANCESTOR_TABLE[metaclass]
+  entry = _getSchemaEntry(metaclass)
+  if entry is not None:
+    ancestors = (metaclass,)+tuple(map(getMetaclassFromName,entry["supers"]))
+  elif issubclass(metaclass,ModelioElement) and metaclass is not ModelioElement:
+    # for modelio classes, the algorithm below use the fact that until Element
+    # there is only one interface 
+    superInterfaces = metaclass.getInterfaces()
+    if len(superInterfaces) == 1:
+      ancestors = (metaclass,)+_getAncestors(superInterfaces[0])
+    else:
+      ancestors = (metaclass,)
+  else:
+    ancestors = (metaclass,)
+  ANCESTOR_TABLE[metaclass] = ancestors
+  return ancestors
+
+def _getRegisteredMetaclasses():
+  """ Return the java interfaces of all the metaclasses: those of the schema
+      if any, otherwise those reached from ModelioElement through the
+      inheritance tree given by the metamodel service
+  """
+  if METAMODEL_SCHEMA is not None:
+    return map(getMetaclassFromName,METAMODEL_SCHEMA.keys())
+  metaclasses = [ModelioElement]
+  seen = set(metaclasses)
+  i = 0
+  while i < len(metaclasses):
+    for sub in _getSubMetaclassesFromModelio(metaclasses[i]):
+      if sub not in seen:
+        seen.add(sub)
+        metaclasses.append(sub)
+    i += 1
+  return metaclasses
+
+def _buildAncestorTable():
+  global ANCESTOR_TABLE_BUILT
+  for metaclass in _getRegisteredMetaclasses():
+    _getAncestors(metaclass)
+  ANCESTOR_TABLE_BUILT = True
+
+def _getSuperMetaclassesByReflection(metaclass,inclusive=True):
   metaclasses = [metaclass] if inclusive else []
   if issubclass(metaclass,ModelioElement):
     # for modelio classes, the algorithm below use the fact that until Element
@@ -558,16 +755,23 @@ VIRTUAL_META_FEATURES = [
   
 
        
-def getMetaFeatures(metaclass,inherited=True,groupBySuper=False,methodFilterFun=None,additionalFun=[]):
-  """ return the meta features of a metaclass, that is MetaFeature created
-      for methods getXXX(), isXXX() and toString() with no arguments
-  """
+def _getMetaFeaturesByReflection(metaclass,inherited=True,methodFilterFun=None):
   javaMethods = _getJavaMethods(metaclass,inherited=inherited,regexp='^get|is|toString',argTypes=[],methodFilterFun=methodFilterFun)
   # get the signaturex 
   javaMethodInfos = map(_getJavaMethodInfo,javaMethods )
   # in method info the parameters are indicated. Here we skip this as we know that
   # the methods do not have parameters.
-  metafeatures = map( _getMetaFeatureFromJavaMethodInfo,javaMethodInfos)
+  return map( _getMetaFeatureFromJavaMethodInfo,javaMethodInfos)
+
+def getMetaFeatures(metaclass,inherited=True,groupBySuper=False,methodFilterFun=None,additionalFun=[]):
+  """ return the meta features of a metaclass, that is MetaFeature created
+      for methods getXXX(), isXXX() and toString() with no arguments
+  """
+  metafeatures = None
+  if inherited and methodFilterFun is None:
+    metafeatures = _getSchemaMetaFeatures(metaclass)
+  if metafeatures is None:
+    metafeatures = _getMetaFeaturesByReflection(metaclass,inherited,methodFilterFun)
   # Add virtual thoes virtual meta features that match the given metaclass using subclasses
   for vFeature in VIRTUAL_META_FEATURES:
     (vFeatureName,vFeatureClass,vFeatureFun,vFeatureReturnType,vFeatureMultiplicity) = vFeature
@@ -576,23 +780,45 @@ def getMetaFeatures(metaclass,inherited=True,groupBySuper=False,methodFilterFun=
                        + [ FunMetaFeature(vFeatureFun,vFeatureClass,vFeatureName,vFeatureReturnType,vFeatureMultiplicity)] 
   return metafeatures
 
+# A map that for each metaclass name return the list of its association ends
+# This map is computed on demand
+ASSOCIATION_META_FEATURES = dict()
+
+def getAssociationMetaFeatures(metaclass):
+  """ return the meta features of a metaclass that are association ends, i.e.
+      whose values are elements or lists of elements. Virtual meta features are
+      excluded as they are computed by scanning diagrams.
+  """
+  name = getNameFromMetaclass(metaclass)
+  if name not in ASSOCIATION_META_FEATURES:
+    ASSOCIATION_META_FEATURES[name] = \
+      [ feature for feature in getMetaFeatures(metaclass)
+          if feature.isAssociationEnd and not isinstance(feature,FunMetaFeature) ]
+  return ASSOCIATION_META_FEATURES[name]
+
 class MetaclassInfo(object):
   """ Descriptor of metaclass
   """
   def __init__(self,metaclass):
     self.metaclass = metaclass
     self.metaFeatures = getMetaFeatures(metaclass)
+    # (mcsigtemplate,mcsigsep) -> signature, as signatures are computed for
+    # each label displayed
+    self.signatures = {}
   def getName(self):               return getNameFromMetaclass(self.metaclass)
   def getSuperMetaclasses(self):   return getSuperMetaclasses(self.metaclass)
   def getSubMetaclasses(self):     return getSubMetaclasses(self.metaclass)
   def getMetaFeatures(self):       return self.metaFeatures
   def getSignature(self,mcsigtemplate=None,mcsigsep=" > ",html=False):
-    if mcsigtemplate is None:
-      mcsigtemplate = "$mcsig"
-    s = Template(mcsigtemplate).substitute( \
-          mcsig = \
-            mcsigsep.join(map(getNameFromMetaclass,self.getSuperMetaclasses())) )   
-    return unicode(s)
+    key = (mcsigtemplate,mcsigsep)
+    if key not in self.signatures:
+      if mcsigtemplate is None:
+        mcsigtemplate = "$mcsig"
+      s = Template(mcsigtemplate).substitute( \
+            mcsig = \
+              mcsigsep.join(map(getNameFromMetaclass,self.getSuperMetaclasses())) )   
+      self.signatures[key] = unicode(s)
+    return self.signatures[key]
   def __repr__(self):
     return self.getSignature()
   def __unicode__(self):
@@ -750,7 +976,10 @@ def getElementSignature(element,unnamed=None):
 
     
 
+# Many ModelValue, MetaFeatureSlot and ElementInfo objects are created while
+# exploring. They have __slots__ so that they have no __dict__.
 class ModelValue(object):
+  __slots__ = []
   def __unicode__(self):  return unicode(self.getText())
   # isScalar()
   # getValue()
@@ -767,6 +996,7 @@ class ModelValue(object):
   def notEmpty(self):                 return not self.isEmpty()
   
 class ElementContainerModelValue(ModelValue):
+  __slots__ = []
   # isEmpty()
   # notEmpty()
   # getCard()
@@ -777,6 +1007,7 @@ class ElementContainerModelValue(ModelValue):
   def isAtomic(self):                 return False
   
 class NoneModelValue(ElementContainerModelValue):
+  __slots__ = []
   def getValue(self):                 return None
   def getKind(self):                  return "element"
   def isElement(self):                return True
@@ -787,6 +1018,7 @@ class NoneModelValue(ElementContainerModelValue):
   def getText(self):                  return "None"
   
 class ElementModelValue(ElementContainerModelValue):
+  __slots__ = ["element"]
   def __init__(self,element):          
     self.element = element    
   def getValue(self):                 return self.element
@@ -800,6 +1032,7 @@ class ElementModelValue(ElementContainerModelValue):
     return "\n    "+getElementSignature(self.element)
 
 class ElementListModelValue(ElementContainerModelValue):
+  __slots__ = ["elementList"]
   def __init__(self,elementList):          
     self.elementList = elementList    
   def getValue(self):                 return self.elementList
@@ -813,6 +1046,7 @@ class ElementListModelValue(ElementContainerModelValue):
     return "\n    "+"\n    ".join(map(getElementSignature,self.elementList))
   
 class AtomicModelValue(ModelValue):
+  __slots__ = []
   def isElementContainer(self):       return False
   def isElement(self):                return False
   def isElementList(self):            return False
@@ -820,6 +1054,7 @@ class AtomicModelValue(ModelValue):
   def isEmpty(self):                  return False
   
 class EnumerationLiteralModelValue(AtomicModelValue):
+  __slots__ = ["literal"]
   def __init__(self,literal):     
     self.literal = literal
   def isEnumerationLiteral(self):     return True
@@ -829,6 +1064,7 @@ class EnumerationLiteralModelValue(AtomicModelValue):
   def isScalar(self):                 return False
 
 class ScalarModelValue(AtomicModelValue):
+  __slots__ = ["scalar"]
   def __init__(self,scalar):          self.scalar = scalar
   def getValue(self):                 return self.scalar
   def getKind(self):                  return "scalar"
@@ -836,6 +1072,7 @@ class ScalarModelValue(AtomicModelValue):
   def isScalar(self):                 return True
   
 class StringModelValue(ScalarModelValue):
+  __slots__ = []
   def __init__(self,string):
     ScalarModelValue.__init__(self,string)
   def getText(self):                  return u'"'+self.scalar+'"'
@@ -843,9 +1080,12 @@ class StringModelValue(ScalarModelValue):
   
 
   
+# the NoneModelValue shared by all empty slots
+NONE_MODEL_VALUE = NoneModelValue()
+
 def getModelValueFromValue(value):
   if isNone(value):
-    return NoneModelValue()
+    return NONE_MODEL_VALUE
   if isString(value):
     return StringModelValue(value)
   elif isEnumerationLiteral(value):
@@ -907,6 +1147,7 @@ def getModelRoot():
 class MetaFeatureSlot(object):
   """ MetaFeature slots are values of a given feature for given element
   """
+  __slots__ = ["metaFeature","element","modelValue"]
   def __init__(self,element,metafeature):
     self.metaFeature = metafeature
     self.element = element
@@ -951,11 +1192,110 @@ class MetaFeatureSlot(object):
 def getMetaFeatureSlots(element,inherited=True):
   metaclass = getMetaclass(element)
   return [MetaFeatureSlot(element,feature) for feature in getMetaFeatures(metaclass)]
+
+
+#---- Bulk evaluation of features
+# For exports and metrics, the values of some features are evaluated for many
+# elements at once, without creating MetaFeatureSlot or ModelValue objects.
+# For each metaclass an accessor is computed once for each feature: the java
+# method itself for getters (called with the element as parameter), or the
+# function of virtual features.
+
+import sys
+import threading
+
+def _getMetaclassKey(element):
+  if isinstance(element,ModelioElement):
+    if orgVersion:
+      return element.getMClass().getName()
+    else:
+      return element.metaclassName
+  else:
+    return type(element)
+
+def _getFeatureAccessor(metaclass,feature):
+  if isinstance(feature,FunMetaFeature):
+    return feature.fun
+  try:
+    return getattr(metaclass,feature.getName())
+  except AttributeError:
+    return feature.eval
+
+def _getAccessors(metaclass,featureNames):
+  """ Return for each feature name the accessor of the feature for the
+      metaclass, or None if the metaclass has no such feature
+  """
+  features = dict([ (feature.getName(),feature) for feature in getMetaFeatures(metaclass) ])
+  return [ (_getFeatureAccessor(metaclass,features[name]) if name in features else None)
+           for name in featureNames ]
+
+def _fillSlotColumns(elements,start,stop,accessorsByMetaclass,columns):
+  for row in range(start,stop):
+    element = elements[row]
+    accessors = accessorsByMetaclass[_getMetaclassKey(element)]
+    for (column,accessor) in zip(columns,accessors):
+      if accessor is not None:
+        # only the failures of the model API leave the value to None.
+        # Other errors are bugs and propagate
+        try:
+          column[row] = accessor(element)
+        except (java.lang.Exception,AttributeError):
+          pass
+
+def _fillSlotColumnsInThread(elements,start,stop,accessorsByMetaclass,columns,errors):
+  # an exception raised in a thread would only be printed: it is kept to be
+  # raised again by the caller
+  try:
+    _fillSlotColumns(elements,start,stop,accessorsByMetaclass,columns)
+  except:
+    errors.append(sys.exc_info())
+
+def getSlotColumns(elements,featureNames,nbThreads=1):
+  """ Return the values of the given features for the given elements as a
+      dictionary giving for each feature name the list of its values, in the
+      order of the elements. The value is None when the element has no such
+      feature or when the model API fails to evaluate it (java exception or
+      AttributeError). Values are returned as given by the API (e.g. java
+      lists). Rows are split among nbThreads threads.
+      ([Element],[String],int) -> { String : [Object] }
+      EXAMPLES
+        columns = getSlotColumns(allInstances(Class),["getName","isAbstract","getOwnedAttribute"])
+        columns["getName"][0]
+  """
+  elements = list(elements)
+  # accessors are computed before starting threads
+  accessorsByMetaclass = {}
+  for element in elements:
+    key = _getMetaclassKey(element)
+    if key not in accessorsByMetaclass:
+      accessorsByMetaclass[key] = _getAccessors(getMetaclass(element),featureNames)
+  columns = [ [None]*len(elements) for name in featureNames ]
+  nbThreads = max(1,min(nbThreads,len(elements)))
+  if nbThreads == 1:
+    _fillSlotColumns(elements,0,len(elements),accessorsByMetaclass,columns)
+  else:
+    # each thread fills its own range of rows
+    size = (len(elements)+nbThreads-1)/nbThreads
+    errors = []
+    threads = [ threading.Thread(target=_fillSlotColumnsInThread,
+                                 args=(elements,start,min(start+size,len(elements)),
+                                       accessorsByMetaclass,columns,errors))
+                for start in range(0,len(elements),size) ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    if len(errors) != 0:
+      (type,value,traceback) = errors[0]
+      raise type,value,traceback
+  return dict(zip(featureNames,columns))
   
   
 class ElementInfo(object):
   """
   """
+  __slots__ = ["element","identifier","metaclass","metaclassName","metaclassInfo",
+               "name","path","slotList","slotMap"]
   def __init__(self,element):
     self.element = element
     self.identifier = id(element) # TODO self.element.getIdentifier()
@@ -1059,10 +1399,29 @@ from org.eclipse.swt.widgets import Display
 
 
 
-def explore(x,browser=False,emptySlots=False):
+def explore(x,browser=False,emptySlots=False,markVisited=False):
+  """ Explore the element(s) in a tree window. If markVisited is True, an
+      element already displayed in the tree is marked as visited when it is
+      displayed again, and it is not expanded (see also the module traversal)
+  """
   if browser:
     metamodelHtmlWindow = HtmlWindow(title="Modelio Metamodel Guide")
     javadocHtmlWindow = HtmlWindow(title="Modelio API Javadoc")
+  # ids of the elements displayed
+  visitedElementIds = set()
+  # python ids of the ElementInfo displaying an element already displayed
+  revisitedInfos = set()
+  def _getElementInfo(element):
+    info = getElementInfo(element)
+    if markVisited:
+      elementId = getElementId(element)
+      if elementId in visitedElementIds:
+        revisitedInfos.add(id(info))
+      else:
+        visitedElementIds.add(elementId)
+    return info
+  def _isRevisited(data):
+    return id(data) in revisitedInfos
 
   def _getChildren(data):
     if isinstance(data,ElementInfo):
@@ -1070,14 +1429,14 @@ def explore(x,browser=False,emptySlots=False):
     elif isinstance(data,MetaFeatureSlot):
       mv = data.getModelValue()
       if mv.isElement():
-        return [ getElementInfo(mv.getValue()) ]
+        return [ _getElementInfo(mv.getValue()) ]
       elif mv.isElementList():
-        return map(getElementInfo,mv.getValue())
+        return map(_getElementInfo,mv.getValue())
       else:
         return []        
   def _isLeaf(data):
     if isinstance(data,ElementInfo):
-      return False
+      return _isRevisited(data)
     elif isinstance(data,MetaFeatureSlot):
       mv = data.getModelValue()
       if mv.isElement():
@@ -1088,6 +1447,8 @@ def explore(x,browser=False,emptySlots=False):
         return True
   def _getText(data):
     if isinstance(data,ElementInfo):
+      if _isRevisited(data):
+        return data.getSignature()+" (visited)"
       return data.getSignature()
     elif isinstance(data,MetaFeatureSlot):
       mv = data.getModelValue()
@@ -1114,7 +1475,7 @@ def explore(x,browser=False,emptySlots=False):
         return NAVIGATOR_IMAGE_PROVIDER.getImageFromName("enumeration")
   def _getGrayed(data):
     if isinstance(data,ElementInfo):
-      return False
+      return _isRevisited(data)
     else:
       return True  
   def _getForeground(data):
@@ -1143,7 +1504,7 @@ def explore(x,browser=False,emptySlots=False):
       print "slot selected with model value:",mv
   if not isList(x):
     x = [x]
-  TreeWindow(map(getElementInfo,x),_getChildren,_isLeaf, \
+  TreeWindow(map(_getElementInfo,x),_getChildren,_isLeaf, \
                  getTextFun=_getText,getImageFun=_getImage, \
                  getGrayedFun=_getGrayed, \
                  getForegroundFun=_getForeground,
@@ -1165,4 +1526,9 @@ def navigateToElement(element):
                   
                   
                   
+try:
+  loadMetamodelSchema()
+except Exception, e:
+  print "Metamodel schema not loaded:",e
+
 print "module introspection loaded from",__file__
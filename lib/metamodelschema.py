@@ -0,0 +1,252 @@
+#
+# metamodelschema
+#
+# Export of the metamodel to a schema file, and comparison of schemas.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   The introspection module computes the metamodel by reflection on the java
+#   interfaces of the metaclasses, in each session. A schema is a plain
+#   description of the metamodel of a version of Modelio: for each metaclass,
+#   the name of its java interface, the names of its super and sub metaclasses
+#   and the signatures of its meta features (name, declaring class, type,
+#   multiplicity). Classes are referred to by their canonical names, so that a
+#   schema contains only strings, booleans, lists and dictionaries.
+#   A schema is exported once for a version of Modelio, in the file
+#   "metamodel-<version>.schema" of the macros directory. When this file
+#   exists, the introspection module loads it on startup and uses it instead
+#   of reflection (see loadMetamodelSchema in introspection).
+#   Schemas are stored with pickle since the json module is not available in
+#   Jython 2.5. Two schemas, for instance of two versions of Modelio, can be
+#   compared with diffSchemas.
+#
+# Usage:
+#   from metamodelschema import exportSchema,loadSchema,diffSchemas,printSchemaDiff
+#   exportSchema()
+#   printSchemaDiff(diffSchemas(loadSchema("metamodel-3.0.schema"),loadSchema()))
+#
+# History
+#   Version 1.0
+#      - first version
+
+import os
+import re
+import pickle
+
+try:
+  from org.modelio.api.modelio import Modelio
+  orgVersion = True
+except:
+  from com.modeliosoft.modelio.api.modelio import Modelio
+  orgVersion = False
+
+# version of the format of the file
+SCHEMA_FORMAT = 2
+
+
+def getModelioVersion():
+  """ Return the version of Modelio as a string
+  """
+  return unicode(Modelio.getInstance().getContext().getVersion())
+
+def getDefaultSchemaPath(modelioVersion=None):
+  """ Return the path of the schema file of a version of Modelio, by default
+      the current one
+  """
+  if modelioVersion is None:
+    modelioVersion = getModelioVersion()
+  workspaceDirectory = Modelio.getInstance().getContext().getWorkspacePath().toString()
+  if orgVersion:
+    macrosDirectory = os.path.join(workspaceDirectory,'macros')
+  else:
+    macrosDirectory = os.path.join(workspaceDirectory,'.config','macros')
+  fileName = "metamodel-"+re.sub(r"[^\w.-]","_",modelioVersion)+".schema"
+  return os.path.join(macrosDirectory,fileName)
+
+
+#-----------------------------------------------------------------------------------
+#   Export
+#-----------------------------------------------------------------------------------
+
+def getJavaClassName(javaclass):
+  """ Return the canonical name of a class (e.g. "java.lang.String", "boolean"),
+      or None for types that are not classes (e.g. type variables)
+  """
+  # java classes are python types. getName() cannot be used as it is the
+  # method of the elements for the interfaces of metaclasses
+  if not isinstance(javaclass,type):
+    return None
+  return unicode(javaclass.getCanonicalName())
+
+def computeSchema():
+  """ Compute the schema of the current metamodel by reflection
+      () -> dict
+  """
+  # imported here as the introspection module imports this one
+  import introspection
+  root = introspection.ModelioElement
+  metaclasses = [root]
+  seen = set([introspection.getNameFromMetaclass(root)])
+  i = 0
+  while i < len(metaclasses):
+    for sub in introspection._getSubMetaclassesFromModelio(metaclasses[i]):
+      name = introspection.getNameFromMetaclass(sub)
+      if name not in seen:
+        seen.add(name)
+        metaclasses.append(sub)
+    i += 1
+  entries = {}
+  for metaclass in metaclasses:
+    javaClassName = getJavaClassName(metaclass)
+    if javaClassName is None:
+      raise TypeError("%r is not a class" % metaclass)
+    features = [ (feature.getName(),
+                  getJavaClassName(feature.getMetaclass()),
+                  getJavaClassName(feature.getType()),
+                  feature.isMultiple())
+                 for feature in introspection._getMetaFeaturesByReflection(metaclass) ]
+    entries[introspection.getNameFromMetaclass(metaclass)] = {
+      "javaClass" : javaClassName,
+      "supers"    : map(introspection.getNameFromMetaclass,
+                        introspection._getSuperMetaclassesByReflection(metaclass,inclusive=False)),
+      "subs"      : map(introspection.getNameFromMetaclass,
+                        introspection._getSubMetaclassesFromModelio(metaclass)),
+      "features"  : features }
+  return { "modelioVersion" : getModelioVersion(),
+           "metaclasses"    : entries }
+
+def saveSchema(schema,path):
+  # write in a temporary file first so that a partial file is never loaded
+  temporaryPath = path+".tmp"
+  f = open(temporaryPath,"wb")
+  try:
+    pickle.dump((SCHEMA_FORMAT,schema),f,pickle.HIGHEST_PROTOCOL)
+  finally:
+    f.close()
+  if os.path.exists(path):
+    os.remove(path)
+  os.rename(temporaryPath,path)
+
+def exportSchema(path=None):
+  """ Compute the schema of the current metamodel and save it, by default in
+      the file loaded by the introspection module on startup
+      String|None -> String
+      EXAMPLES
+        exportSchema()
+  """
+  if path is None:
+    path = getDefaultSchemaPath()
+  schema = computeSchema()
+  saveSchema(schema,path)
+  print len(schema["metaclasses"]),"metaclasses of Modelio",schema["modelioVersion"],"exported to",path
+  return path
+
+
+#-----------------------------------------------------------------------------------
+#   Loading
+#-----------------------------------------------------------------------------------
+
+def loadSchema(path=None):
+  """ Return the schema saved in a file, by default the one of the current
+      version of Modelio, or None if the file does not exist or cannot be read
+      String|None -> dict|None
+  """
+  if path is None:
+    path = getDefaultSchemaPath()
+  if not os.path.isfile(path):
+    return None
+  f = open(path,"rb")
+  try:
+    try:
+      (format,schema) = pickle.load(f)
+    except Exception, e:
+      print "Metamodel schema cannot be read from",path,":",e
+      return None
+  finally:
+    f.close()
+  if format != SCHEMA_FORMAT:
+    return None
+  return schema
+
+
+#-----------------------------------------------------------------------------------
+#   Comparison
+#-----------------------------------------------------------------------------------
+
+def _getFeatureSignatures(entry):
+  return dict([ (name,(declaringClass,type,multiple))
+                for (name,declaringClass,type,multiple) in entry["features"] ])
+
+def diffSchemas(oldSchema,newSchema):
+  """ Return the differences between two schemas as a dictionary with the
+      following keys (all values are sorted lists):
+        "addedMetaclasses", "removedMetaclasses" : metaclass names
+        "changedSupers"   : (metaclass name, old supers, new supers)
+        "addedFeatures", "removedFeatures" : (metaclass name, feature name)
+        "changedFeatures" : (metaclass name, feature name, old signature, new signature)
+      Features are compared on their declaring class, type and multiplicity.
+      (dict,dict) -> dict
+  """
+  oldEntries = oldSchema["metaclasses"]
+  newEntries = newSchema["metaclasses"]
+  oldNames = set(oldEntries.keys())
+  newNames = set(newEntries.keys())
+  diff = { "addedMetaclasses"   : sorted(newNames-oldNames),
+           "removedMetaclasses" : sorted(oldNames-newNames),
+           "changedSupers"      : [],
+           "addedFeatures"      : [],
+           "removedFeatures"    : [],
+           "changedFeatures"    : [] }
+  for name in sorted(oldNames & newNames):
+    oldEntry = oldEntries[name]
+    newEntry = newEntries[name]
+    if list(oldEntry["supers"]) != list(newEntry["supers"]):
+      diff["changedSupers"].append((name,oldEntry["supers"],newEntry["supers"]))
+    oldFeatures = _getFeatureSignatures(oldEntry)
+    newFeatures = _getFeatureSignatures(newEntry)
+    for featureName in sorted(set(newFeatures.keys())-set(oldFeatures.keys())):
+      diff["addedFeatures"].append((name,featureName))
+    for featureName in sorted(set(oldFeatures.keys())-set(newFeatures.keys())):
+      diff["removedFeatures"].append((name,featureName))
+    for featureName in sorted(set(oldFeatures.keys()) & set(newFeatures.keys())):
+      if oldFeatures[featureName] != newFeatures[featureName]:
+        diff["changedFeatures"].append( \
+          (name,featureName,oldFeatures[featureName],newFeatures[featureName]))
+  return diff
+
+def _getSignatureText(signature):
+  (declaringClass,type,multiple) = signature
+  return "%s%s (%s)" % (type,"[*]" if multiple else "",declaringClass)
+
+def getSchemaDiffLines(diff):
+  """ Return the differences between two schemas (see diffSchemas) as lines
+      of text
+  """
+  lines = []
+  for name in diff["addedMetaclasses"]:
+    lines.append("+ "+name)
+  for name in diff["removedMetaclasses"]:
+    lines.append("- "+name)
+  for (name,oldSupers,newSupers) in diff["changedSupers"]:
+    lines.append("~ "+name+" : "+" > ".join(oldSupers)+"  ->  "+" > ".join(newSupers))
+  for (name,featureName) in diff["addedFeatures"]:
+    lines.append("+ "+name+"."+featureName)
+  for (name,featureName) in diff["removedFeatures"]:
+    lines.append("- "+name+"."+featureName)
+  for (name,featureName,oldSignature,newSignature) in diff["changedFeatures"]:
+    lines.append("~ "+name+"."+featureName+" : "+_getSignatureText(oldSignature) \
+                 +"  ->  "+_getSignatureText(newSignature))
+  return lines
+
+def printSchemaDiff(diff):
+  lines = getSchemaDiffLines(diff)
+  for line in lines:
+    print line
+  if len(lines) == 0:
+    print "no difference"
+
+
+print "module metamodelschema loaded from",__file__
@@ -122,6 +122,29 @@ def exists(predicate,coll):
   return reduce(operator.or_, map(predicate,coll), False)
 
 
+#----- memory -----------------------------------------------------------------------------
+
+def getUsedHeap():
+  """ return the number of bytes used in the heap of the JVM, after a garbage collection
+  """
+  from java.lang import Runtime, System
+  runtime = Runtime.getRuntime()
+  for i in range(3):
+    System.gc()
+  return runtime.totalMemory()-runtime.freeMemory()
+
+def measureHeap(fun,*args):
+  """ return a pair (result of fun(*args), number of bytes of heap retained by this result)
+      The measure is approximative as other threads may allocate memory as well.
+      EXAMPLE
+        (infos,size) = measureHeap(lambda:[getElementInfo(e).getSlotList() for e in allInstances(Class)])
+        print size/len(infos),"bytes per element"
+  """
+  before = getUsedHeap()
+  result = fun(*args)
+  after = getUsedHeap()
+  return (result,after-before)
+
 #----- graphical user interface ---------------------------------------------------------
 
 from org.eclipse.swt import SWT
@@ -0,0 +1,158 @@
+#
+# modelchanges
+#
+# Tracking of the changes made to the model during a modeling session.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   A model change tracker registers a model change listener once for the
+#   modeling session and keeps
+#     - a token identifying the tracker, randomly generated,
+#     - a revision number incremented at each model change event,
+#     - a bounded log of the elements created, updated, moved or deleted.
+#   The pair (token,revision) is a watermark that can be stored with data
+#   computed from the model. Later on, getChangesSince(watermark) tells
+#   which elements have changed since then, or None if this is unknown: the
+#   watermark comes from another session (or another tracker), or the
+#   changes are older than the ones kept in the log.
+#   The tracker is kept between executions of macros, and a new one is
+#   created when the modeling session changes (e.g. another project is opened).
+#
+# Usage:
+#   from modelchanges import theModelChangeTracker
+#   tracker = theModelChangeTracker()
+#   watermark = tracker.getWatermark()
+#   ... later ...
+#   changes = tracker.getChangesSince(watermark)
+#   if changes is not None:
+#     (changedElements,deletedIds) = changes
+#
+# History
+#   Version 1.0
+#      - first version
+
+try:
+  from org.modelio.api.modelio import Modelio
+  from org.modelio.api.model.change import IModelChangeListener
+except:
+  from com.modeliosoft.modelio.api.modelio import Modelio
+  from com.modeliosoft.modelio.api.model.change import IModelChangeListener
+from java.util import UUID
+
+from searchengine import getElementIdentifier
+
+# maximum number of elements kept in the log of changes
+MAX_LOGGED_ELEMENTS = 100000
+
+
+class ModelChangeTracker(object):
+  """ Revision counter and log of changes for a modeling session
+  """
+  def __init__(self,session,maxLoggedElements=MAX_LOGGED_ELEMENTS):
+    self.session = session
+    self.token = unicode(UUID.randomUUID().toString())
+    self.revision = 0
+    self.maxLoggedElements = maxLoggedElements
+    # list of (revision,changedElements,deletedIds), oldest first
+    self.log = []
+    self.nbLoggedElements = 0
+    # the changes made after this revision are all in the log
+    self.firstKnownRevision = 0
+    tracker = self
+    class _Listener(IModelChangeListener):
+      def modelChanged(self,session,event):
+        tracker._onModelChange(event)
+    self.listener = _Listener()
+    session.addModelListener(self.listener)
+
+  def _onModelChange(self,event):
+    changed = []
+    deletedIds = []
+    try:
+      changed.extend(event.getCreationEvents())
+      changed.extend(event.getUpdateEvents())
+      for moveEvent in event.getMoveEvents():
+        changed.append(moveEvent.getMovedElement())
+      for deleteEvent in event.getDeleteEvents():
+        deletedIds.append(getElementIdentifier(deleteEvent.getDeletedElement()))
+    except:
+      # the content of the event is unknown: previous watermarks are invalidated
+      self.revision += 1
+      self._forgetLog()
+      return
+    self.revision += 1
+    self.log.append((self.revision,changed,deletedIds))
+    self.nbLoggedElements += len(changed)+len(deletedIds)
+    while self.nbLoggedElements > self.maxLoggedElements and len(self.log) != 0:
+      (revision,oldChanged,oldDeletedIds) = self.log.pop(0)
+      self.nbLoggedElements -= len(oldChanged)+len(oldDeletedIds)
+      self.firstKnownRevision = revision
+
+  def _forgetLog(self):
+    self.log = []
+    self.nbLoggedElements = 0
+    self.firstKnownRevision = self.revision
+
+  def getWatermark(self):
+    """ Return the current watermark
+        () -> (String,int)
+    """
+    return (self.token,self.revision)
+
+  def isUpToDate(self,watermark):
+    """ Return True if the model has not changed since the watermark
+    """
+    return watermark == self.getWatermark()
+
+  def getChangesSince(self,watermark):
+    """ Return the elements changed and the ids of the elements deleted
+        since the watermark, or None if they are not known.
+        An element deleted after being changed is in both.
+        (String,int) -> ([Element],set(String))|None
+    """
+    if watermark is None:
+      return None
+    (token,revision) = watermark
+    if token != self.token or revision < self.firstKnownRevision or revision > self.revision:
+      return None
+    changed = []
+    seen = set()
+    deletedIds = set()
+    for (logRevision,logChanged,logDeletedIds) in self.log:
+      if logRevision > revision:
+        for element in logChanged:
+          if element not in seen:
+            seen.add(element)
+            changed.append(element)
+        deletedIds.update(logDeletedIds)
+    return (changed,deletedIds)
+
+  def dispose(self):
+    try:
+      self.session.removeModelListener(self.listener)
+    except:
+      pass
+
+
+try:
+  MODEL_CHANGE_TRACKER
+except NameError:
+  MODEL_CHANGE_TRACKER = None
+
+def theModelChangeTracker():
+  """ Return the tracker of the current modeling session, creating it if needed
+      () -> ModelChangeTracker
+  """
+  global MODEL_CHANGE_TRACKER
+  session = Modelio.getInstance().getModelingSession()
+  if MODEL_CHANGE_TRACKER is None or MODEL_CHANGE_TRACKER.session is not session:
+    if MODEL_CHANGE_TRACKER is not None:
+      MODEL_CHANGE_TRACKER.dispose()
+    MODEL_CHANGE_TRACKER = ModelChangeTracker(session)
+  return MODEL_CHANGE_TRACKER
+
+
+print "module modelchanges loaded from",__file__
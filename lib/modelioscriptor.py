@@ -9,6 +9,14 @@
 # Compatibility: Modelio 3.x
 # 
 # History
+#   Version 1.1
+#      - index of diagram graphics built by a pool of threads (theDiagramIndex)
+#      - options "indexed" and "refresh" for getDisplayingDiagrams and
+#        getDiagramGraphics
+#      - fingerprints of diagrams: only changed diagrams are scanned again
+#        when the index is refreshed (theDiagramIndex(refresh=True))
+#      - isKindOf uses an interval numbering of the metaclasses
+#        (getMClassIntervals); filterKindOf and filterTypeOf
 #   Version 1.0 - December 04, 2013
 #      - functions M1 <--> M2
 #      - function theMClass renamed to getMClass
@@ -217,6 +225,95 @@ def theMetamodelExtensions():
   return theSession().getMetamodelExtensions()  
   
 
+#----------------------------------------------------------------------------
+#   Kind and type checks
+#----------------------------------------------------------------------------
+# The hierarchy of metaclasses is numbered once: metaclasses are numbered in
+# pre-order in a depth first traversal of the inheritance tree, and each
+# metaclass gets the interval (first,last) of the numbers of the metaclasses
+# of its subtree, itself included. An element is an instance of a metaclass
+# or of one of its submetaclasses if the number of its MClass is in the
+# interval of this metaclass. Metaclasses registered after the numbering
+# (e.g. by a module) are checked as before, with isinstance.
+
+# MClass -> (first,last), built on first use (see getMClassIntervals)
+MCLASS_INTERVALS = None
+# java interface -> MClass
+_INTERFACE_MCLASSES = dict()
+# MClass or java interface -> its interval (first,last), or False if it is
+# not a numbered metaclass
+_KIND_INTERVALS = dict()
+
+def _getSuperMClass(mclass):
+  try:
+    return mclass.getSuper()
+  except AttributeError:
+    # MClass of versions of Modelio without getSuper
+    superInterfaces = mclass.getJavaInterface().getInterfaces()
+    if len(superInterfaces) == 1:
+      return Metamodel.getMClass(superInterfaces[0])
+    return None
+
+def getMClassIntervals():
+  """ Return the interval numbering of all known metaclasses, as a dictionary
+      giving for each MClass the pair (first,last) where first is the number
+      of the MClass and last the greatest number of its submetaclasses.
+      () -> { MClass : (int,int) }
+  """
+  global MCLASS_INTERVALS
+  if MCLASS_INTERVALS is None:
+    mclasses = list(allMClasses())
+    known = set(mclasses)
+    subs = dict([ (mclass,[]) for mclass in mclasses ])
+    roots = []
+    for mclass in mclasses:
+      superMClass = _getSuperMClass(mclass)
+      if superMClass in known:
+        subs[superMClass].append(mclass)
+      else:
+        roots.append(mclass)
+    intervals = {}
+    number = 0
+    # stack of (mclass,number) where number is None before the subtree is visited
+    stack = [ (root,None) for root in reversed(roots) ]
+    while len(stack) != 0:
+      (mclass,first) = stack.pop()
+      if first is None:
+        stack.append((mclass,number))
+        intervals[mclass] = (number,number)
+        number += 1
+        stack.extend([ (sub,None) for sub in reversed(subs[mclass]) ])
+      else:
+        intervals[mclass] = (first,number-1)
+    MCLASS_INTERVALS = intervals
+  return MCLASS_INTERVALS
+
+def _toMClass(mclassOrMInterface):
+  if isinstance(mclassOrMInterface,MClass):
+    return mclassOrMInterface
+  if mclassOrMInterface not in _INTERFACE_MCLASSES:
+    try:
+      mclass = Metamodel.getMClass(mclassOrMInterface)
+    except:
+      mclass = None
+    _INTERFACE_MCLASSES[mclassOrMInterface] = mclass
+  return _INTERFACE_MCLASSES[mclassOrMInterface]
+
+def _getKindInterval(mclassOrMInterface):
+  """ Return the interval of a MClass or interface, or False if it is not a
+      numbered metaclass (e.g. IDiagramGraphic)
+  """
+  interval = _KIND_INTERVALS.get(mclassOrMInterface)
+  if interval is None:
+    interval = getMClassIntervals().get(_toMClass(mclassOrMInterface),False)
+    _KIND_INTERVALS[mclassOrMInterface] = interval
+  return interval
+
+def _toMInterface(mclassOrMInterface):
+  if isinstance(mclassOrMInterface,MClass):
+    return mclassOrMInterface.getJavaInterface()
+  return mclassOrMInterface
+
 def isKindOf(element,mclassOrMInterface):
   """ Check if the element is a direct  or indirect instance of a MClass 
       or inteface. Use isTypeOf to test if the type is exactly
@@ -225,9 +322,16 @@ def isKindOf(element,mclassOrMInterface):
         print isKindOf(instanceNamed(DataType,"string"),Element)
         print isKindOf(instanceNamed(DataType,"string"),UseCase)
   """
-  if isinstance(mclassOrMInterface,MClass):
-    mclassOrMInterface = mclassOrMInterface.getJavaInterface()
-  return isinstance(element,mclassOrMInterface)
+  interval = _getKindInterval(mclassOrMInterface)
+  if interval is not False:
+    try:
+      elementInterval = MCLASS_INTERVALS.get(element.getMClass())
+    except AttributeError:
+      # not a model element
+      elementInterval = None
+    if elementInterval is not None:
+      return interval[0] <= elementInterval[0] <= interval[1]
+  return isinstance(element,_toMInterface(mclassOrMInterface))
   
 def isTypeOf(element,mclassOrMInterface):
   """ Check if the element has exactly the type specified, not one of
@@ -237,9 +341,43 @@ def isTypeOf(element,mclassOrMInterface):
         print isTypeOf(instanceNamed(DataType,"string"),DataType)
         print isTypeOf(instanceNamed(DataType,"string"),Element)
   """
-  if isinstance(mclassOrMInterface,JavaClass):
-    mclassOrMInterface = Metamodel.getMClass(mclassOrMInterface)
-  return element.getMClass() is mclassOrMInterface
+  return element.getMClass() is _toMClass(mclassOrMInterface)
+
+def filterKindOf(elements,mclassOrMInterface):
+  """ Return the elements that are direct or indirect instances of a MClass
+      or interface. The metaclass is looked up once for all elements.
+      ([Element],MClass|Class) -> [Element]
+      EXAMPLES
+        filterKindOf(allInstances(Element),Classifier)
+  """
+  interval = _getKindInterval(mclassOrMInterface)
+  if interval is False:
+    javaInterface = _toMInterface(mclassOrMInterface)
+    return [ element for element in elements if isinstance(element,javaInterface) ]
+  (first,last) = interval
+  intervals = MCLASS_INTERVALS
+  # MClass -> result of the check, for the MClass of the elements
+  checks = {}
+  selected = []
+  for element in elements:
+    mclass = element.getMClass()
+    if mclass not in checks:
+      if mclass in intervals:
+        checks[mclass] = first <= intervals[mclass][0] <= last
+      else:
+        checks[mclass] = isKindOf(element,mclassOrMInterface)
+    if checks[mclass]:
+      selected.append(element)
+  return selected
+
+def filterTypeOf(elements,mclassOrMInterface):
+  """ Return the elements that have exactly the type specified
+      ([Element],MClass|Class) -> [Element]
+      EXAMPLES
+        filterTypeOf(allInstances(Classifier),Class)
+  """
+  mclass = _toMClass(mclassOrMInterface)
+  return [ element for element in elements if element.getMClass() is mclass ]
   
 #----------------------------------------------------------------------------
 #   Access to diagram graphics
@@ -275,12 +413,19 @@ def theAutoDiagramFactory():
 def getDiagramHandle(diagram):
   return theDiagramService().getDiagramHandle(diagram)
   
-def getDisplayingDiagrams(element):
-  """ Return all diagrams displaying the element in some graphical form
-      Element -> [ AbstractDiagram ]
+def getDisplayingDiagrams(element,indexed=False,refresh=False):
+  """ Return all diagrams displaying the element in some graphical form.
+      If indexed is True the index of diagram graphics is used. It is not
+      updated with the changes of the diagrams unless refresh is True: a
+      script making many queries should rather refresh the index once
+      before them (see theDiagramIndex).
+      Element*Boolean?*Boolean? -> [ AbstractDiagram ]
       EXAMPLES
         print getDisplayingDiagrams(myclass)
+        print getDisplayingDiagrams(myclass,indexed=True,refresh=True)
   """
+  if indexed:
+    return theDiagramIndex(refresh=refresh).getDisplayingDiagrams(element)
   selectedDiagrams = []
   for diagram in allDiagrams():
     handle = getDiagramHandle(diagram)
@@ -290,22 +435,28 @@ def getDisplayingDiagrams(element):
     handle.close()
   return selectedDiagrams
 
-def getDiagramGraphics(element,diagramOrDiagramsOrNone=None):
+def getDiagramGraphics(element,diagramOrDiagramsOrNone=None,indexed=False,refresh=False):
   """ Return all diagram graphics (i.e. DiagramLink, DiagramNode) that are used
       to display the given element. If a second parameter is given then
-      only the search is restricted to the given diagram(s) 
-      (Element,(AbstractDiagram|[AbstractDiagram]|?) -> [ AbstractDiagram ]      
+      only the search is restricted to the given diagram(s).
+      If indexed is True the index of diagram graphics is used. It is not
+      updated with the changes of the diagrams unless refresh is True (see
+      getDisplayingDiagrams and theDiagramIndex).
+      (Element,(AbstractDiagram|[AbstractDiagram]|?),Boolean?,Boolean?) -> [ IDiagramGraphic ]
       EXAMPLES
         print getDiagramGraphics(e)
         print getDiagramGraphics(e,mydiagram)
         print getDiagramGraphics(e,[diagram1,diagram2,diagram3])
+        print getDiagramGraphics(e,indexed=True,refresh=True)
   """
   if diagramOrDiagramsOrNone is None:
-    diagrams = allDiagrams()
+    diagrams = None if indexed else allDiagrams()
   elif isinstance(diagramOrDiagramsOrNone,AbstractDiagram):
     diagrams = [ diagramOrDiagramsOrNone ]
   else: 
     diagrams = diagramOrDiagramsOrNone
+  if indexed:
+    return theDiagramIndex(refresh=refresh).getDiagramGraphics(element,diagrams)
   diagramGraphics = []
   for diagram in diagrams:
     handle = getDiagramHandle(diagram)  
@@ -314,6 +465,244 @@ def getDiagramGraphics(element,diagramOrDiagramsOrNone=None):
   return diagramGraphics
   
 
+#----------------------------------------------------------------------------
+#   Index of diagram graphics
+#----------------------------------------------------------------------------
+# The graphics of all diagrams are collected once in an index giving, for each
+# element, the graphics displaying it in each diagram. Diagrams are scanned
+# by a pool of threads (jython threads run in parallel). Each thread opens and
+# closes the handles of the diagrams it scans. The diagrams whose scan fails
+# in a thread are scanned again sequentially: if this succeeds, the failure
+# was caused by the concurrent scan, the diagram service is considered as not
+# thread-safe and diagrams are scanned sequentially from then on. Otherwise
+# the diagram itself cannot be scanned and its error is reported.
+# The index keeps a fingerprint of each diagram scanned, computed from the
+# serialized form of the diagram (getUiData) and its version. When the index
+# is refreshed, only the diagrams that are new or whose fingerprint changed
+# are scanned again.
+
+import threading
+import Queue
+
+# number of threads scanning diagrams. 1 to scan diagrams sequentially
+DIAGRAM_SCAN_THREADS = 4
+
+# set to True when a diagram could be scanned sequentially but not in parallel
+DIAGRAM_SCAN_SEQUENTIAL_ONLY = False
+
+def getDiagramContent(diagram):
+  """ Return a dictionary giving for each element displayed in the diagram
+      the list of the graphics displaying it. The graphics are found by
+      traversing the nodes of the diagram, their subnodes and their links.
+      AbstractDiagram -> { Element : [ IDiagramGraphic ] }
+  """
+  content = {}
+  def _add(graphic):
+    element = graphic.getElement()
+    if element is not None:
+      if element in content:
+        content[element].append(graphic)
+      else:
+        content[element] = [graphic]
+  handle = getDiagramHandle(diagram)
+  try:
+    visitedLinks = set()
+    nodes = [handle.getDiagramNode()]
+    while len(nodes) != 0:
+      node = nodes.pop()
+      _add(node)
+      for link in list(node.getFromLinks())+list(node.getToLinks()):
+        if link not in visitedLinks:
+          visitedLinks.add(link)
+          _add(link)
+      nodes.extend(node.getNodes())
+  finally:
+    handle.close()
+  return content
+
+def getDiagramFingerprint(diagram):
+  """ Return a value that changes when the content of the diagram changes,
+      or None if it cannot be computed. Handles are not opened.
+      AbstractDiagram -> (int,int,int)|None
+  """
+  try:
+    uiData = diagram.getUiData()
+    if uiData is None:
+      return None
+    return (diagram.getUiDataVersion(),len(uiData),hash(uiData))
+  except:
+    return None
+
+def _scanDiagramsSequentially(diagrams,contents,errors):
+  for diagram in diagrams:
+    try:
+      contents[diagram] = getDiagramContent(diagram)
+    except Exception, e:
+      errors[diagram] = e
+
+def scanDiagrams(diagrams,nbThreads=None,errors=None):
+  """ Return a dictionary giving the content of each diagram (see
+      getDiagramContent). Diagrams are scanned by a pool of nbThreads
+      threads, DIAGRAM_SCAN_THREADS by default. The diagrams that cannot be
+      scanned are not in the result: if errors is a dictionary, the exception
+      raised by each of these diagrams is added to it, otherwise the first
+      exception is raised.
+      ([AbstractDiagram],int?,dict?) -> { AbstractDiagram : { Element : [ IDiagramGraphic ] } }
+  """
+  global DIAGRAM_SCAN_SEQUENTIAL_ONLY
+  if nbThreads is None:
+    nbThreads = DIAGRAM_SCAN_THREADS
+  diagrams = list(diagrams)
+  nbThreads = min(nbThreads,len(diagrams))
+  contents = {}
+  scanErrors = {}
+  if nbThreads <= 1 or DIAGRAM_SCAN_SEQUENTIAL_ONLY:
+    _scanDiagramsSequentially(diagrams,contents,scanErrors)
+  else:
+    queue = Queue.Queue()
+    for diagram in diagrams:
+      queue.put(diagram)
+    # each worker fills its own dictionaries, merged when all workers are done
+    partialContents = [ {} for i in range(nbThreads) ]
+    partialErrors = [ {} for i in range(nbThreads) ]
+    def _work(contents,errors):
+      while True:
+        try:
+          diagram = queue.get_nowait()
+        except Queue.Empty:
+          return
+        try:
+          contents[diagram] = getDiagramContent(diagram)
+        except Exception, e:
+          errors[diagram] = e
+    workers = [ threading.Thread(target=_work,args=(partialContents[i],partialErrors[i]),
+                                 name="diagram scanner "+str(i))
+                for i in range(nbThreads) ]
+    for worker in workers:
+      worker.start()
+    for worker in workers:
+      worker.join()
+    for partial in partialContents:
+      contents.update(partial)
+    failedDiagrams = []
+    for partial in partialErrors:
+      failedDiagrams.extend(partial.keys())
+    if len(failedDiagrams) != 0:
+      retriedContents = {}
+      _scanDiagramsSequentially(failedDiagrams,retriedContents,scanErrors)
+      if len(retriedContents) != 0:
+        print len(retriedContents),"diagrams could be scanned sequentially but not in parallel:", \
+              "diagrams are now scanned sequentially"
+        DIAGRAM_SCAN_SEQUENTIAL_ONLY = True
+      contents.update(retriedContents)
+  if len(scanErrors) != 0 and errors is None:
+    raise scanErrors.values()[0]
+  if errors is not None:
+    errors.update(scanErrors)
+  return contents
+
+
+class DiagramIndex(object):
+  """ Graphics of all diagrams, indexed by element
+  """
+  def __init__(self):
+    # diagram -> { element : [graphic] }
+    self.diagramContents = {}
+    # diagram -> fingerprint when the diagram was scanned
+    self.fingerprints = {}
+    # element -> { diagram : [graphic] }
+    self.elementGraphics = {}
+    # diagram -> exception raised by the last scan of the diagram
+    self.scanErrors = {}
+  def build(self,nbThreads=None):
+    """ Scan all diagrams
+    """
+    self.diagramContents = {}
+    self.fingerprints = {}
+    self.elementGraphics = {}
+    self.scanErrors = {}
+    self.refresh(nbThreads)
+  def refresh(self,nbThreads=None):
+    """ Scan the diagrams that are new or have changed since they were scanned,
+        and forget the diagrams deleted. Return the number of diagrams scanned.
+        The diagrams that cannot be scanned are not indexed: they are in
+        scanErrors and are scanned again by the next refresh.
+    """
+    diagrams = allDiagrams()
+    fingerprints = dict([ (diagram,getDiagramFingerprint(diagram)) for diagram in diagrams ])
+    for diagram in self.diagramContents.keys():
+      if diagram not in fingerprints:
+        self._removeDiagram(diagram)
+    changedDiagrams = [ diagram for diagram in diagrams
+                          if diagram not in self.diagramContents
+                             or fingerprints[diagram] is None
+                             or fingerprints[diagram] != self.fingerprints.get(diagram) ]
+    errors = {}
+    for (diagram,content) in scanDiagrams(changedDiagrams,nbThreads,errors).items():
+      self._removeDiagram(diagram)
+      self.diagramContents[diagram] = content
+      self.fingerprints[diagram] = fingerprints[diagram]
+      self._addContent(diagram,content)
+    for diagram in errors.keys():
+      self._removeDiagram(diagram)
+    self.scanErrors = errors
+    if len(errors) != 0:
+      print len(errors),"diagrams cannot be scanned (see scanErrors of the diagram index)"
+    return len(changedDiagrams)
+  def _addContent(self,diagram,content):
+    for (element,graphics) in content.items():
+      if element in self.elementGraphics:
+        self.elementGraphics[element][diagram] = graphics
+      else:
+        self.elementGraphics[element] = { diagram : graphics }
+  def _removeDiagram(self,diagram):
+    content = self.diagramContents.pop(diagram,None)
+    self.fingerprints.pop(diagram,None)
+    if content is None:
+      return
+    for element in content.keys():
+      graphicsByDiagram = self.elementGraphics[element]
+      del graphicsByDiagram[diagram]
+      if len(graphicsByDiagram) == 0:
+        del self.elementGraphics[element]
+  def getDisplayingDiagrams(self,element):
+    return self.elementGraphics.get(element,{}).keys()
+  def getDiagramGraphics(self,element,diagrams=None):
+    graphicsByDiagram = self.elementGraphics.get(element,{})
+    if diagrams is None:
+      diagrams = graphicsByDiagram.keys()
+    graphics = []
+    for diagram in diagrams:
+      graphics.extend(graphicsByDiagram.get(diagram,[]))
+    return graphics
+  def getDisplayedElements(self,diagram):
+    return self.diagramContents.get(diagram,{}).keys()
+
+try:
+  DIAGRAM_INDEX
+except NameError:
+  DIAGRAM_INDEX = None
+
+def theDiagramIndex(rebuild=False,refresh=False):
+  """ Return the index of diagram graphics, building it on first use or if
+      rebuild is True. If refresh is True the diagrams changed since they
+      were scanned are scanned again. Without refresh the index is not
+      updated with the changes of the diagrams and may be out of date.
+      Boolean?*Boolean? -> DiagramIndex
+      EXAMPLES
+        theDiagramIndex(refresh=True).getDisplayingDiagrams(myclass)
+        theDiagramIndex(refresh=True)
+        theDiagramIndex(rebuild=True)
+  """
+  global DIAGRAM_INDEX
+  if DIAGRAM_INDEX is None or rebuild:
+    index = DiagramIndex()
+    index.build()
+    DIAGRAM_INDEX = index
+  elif refresh:
+    DIAGRAM_INDEX.refresh()
+  return DIAGRAM_INDEX
+
   
 #----------------------------------------------------------------------------
 #   Access to editors
@@ -0,0 +1,306 @@
+#
+# namefilter
+#
+# Name filters with the semantics of the AdvancedSearch macro.
+#
+# Author: jmfavre
+#
+# Compatibility: jython (inside Modelio) and python 2.x (outside Modelio)
+#
+# Description:
+#   A name filter selects names either
+#     - by substring: the name contains the expression, or
+#     - by regular expression: the whole name matches the expression.
+#   Inside Modelio java.util.regex is used, as in previous versions of
+#   AdvancedSearch. Outside Modelio the python module re is used instead; the
+#   usual constructs (classes, quantifiers, groups, alternatives, anchors) have
+#   the same meaning in both, but some java specific constructs do not.
+#   Syntax errors are reported with the exception of the regex engine used
+#   (java.util.regex.PatternSyntaxException or re.error).
+#
+#   Compiled regular expressions are kept in a bounded LRU cache, so that
+#   repeated searches do not compile them again. Simple regular expressions
+#   are analysed to find literal strings that every matching name contains,
+#   and the prefix that every matching name starts with. Names are first
+#   checked against them with find/startswith, and the regex engine is only
+#   run for the names that pass this check. For instance, with ".*Order.*"
+#   only the names containing "Order" are given to the regex engine.
+#
+# History
+#   Version 1.1
+#      - LRU cache of compiled patterns
+#      - literal and prefix precheck before running the regex engine
+#   Version 1.0
+#      - first version
+
+import re
+try:
+  from java.util.regex import Pattern as JavaPattern
+except ImportError:
+  JavaPattern = None
+
+
+#-----------------------------------------------------------------------------------
+#   Analysis of regular expressions
+#-----------------------------------------------------------------------------------
+
+# escapes followed by a code that would be taken as literal characters
+_UNSUPPORTED_ESCAPES = "xu0cQEkN"
+# escapes followed by a {...} argument
+_BRACED_ESCAPES = "pP"
+
+def _skipClass(expression,i):
+  """ Return the index following the character class starting at i ('[')
+      or None if the class is not closed
+  """
+  i += 1
+  if i < len(expression) and expression[i] == "^":
+    i += 1
+  if i < len(expression) and expression[i] == "]":
+    i += 1
+  depth = 1
+  while i < len(expression):
+    c = expression[i]
+    if c == "\\":
+      i += 2
+      continue
+    if c == "[":
+      depth += 1
+    elif c == "]":
+      depth -= 1
+      if depth == 0:
+        return i+1
+    i += 1
+  return None
+
+def _skipGroup(expression,i):
+  """ Return the index following the group starting at i ('(')
+      or None if the group is not closed
+  """
+  depth = 0
+  while i < len(expression):
+    c = expression[i]
+    if c == "\\":
+      i += 2
+      continue
+    if c == "[":
+      i = _skipClass(expression,i)
+      if i is None:
+        return None
+      continue
+    if c == "(":
+      depth += 1
+    elif c == ")":
+      depth -= 1
+      if depth == 0:
+        return i+1
+    i += 1
+  return None
+
+def _parseQuantifier(expression,i):
+  """ Parse the quantifier starting at i if any.
+      Return (index after the quantifier, minimum number of repetitions,
+      True if the atom may be repeated), or None if it cannot be parsed.
+  """
+  if i >= len(expression):
+    return (i,1,False)
+  c = expression[i]
+  if c == "*":
+    (i,minimum,repeated) = (i+1,0,True)
+  elif c == "+":
+    (i,minimum,repeated) = (i+1,1,True)
+  elif c == "?":
+    (i,minimum,repeated) = (i+1,0,False)
+  elif c == "{":
+    end = expression.find("}",i)
+    if end == -1:
+      return None
+    bounds = expression[i+1:end].split(",")
+    try:
+      minimum = int(bounds[0])
+    except ValueError:
+      return None
+    (i,repeated) = (end+1,bounds != ["1"])
+  else:
+    return (i,1,False)
+  # lazy or possessive quantifier
+  if i < len(expression) and expression[i] in "?+":
+    i += 1
+  return (i,minimum,repeated)
+
+def analyseRegex(expression):
+  """ Return a pair (prefix,literals) where prefix is a string that starts every
+      name matching the whole expression and literals is a list of strings that
+      every such name contains. prefix is "" and literals is empty when nothing
+      can be deduced, for instance for expressions with alternatives or flags.
+      String -> (String,[String])
+      EXAMPLES
+        analyseRegex(".*Order.*")        # ("",["Order"])
+        analyseRegex("get[A-Z]\\w*Id")    # ("get",["get","Id"])
+        analyseRegex("a|b")              # ("",[])
+  """
+  nothing = ("",[])
+  if "(?" in expression:
+    return nothing
+  literals = []
+  prefix = ""
+  current = ""
+  # True as long as only literals have been read
+  atBeginning = True
+  i = 0
+  if expression.startswith("^"):
+    i = 1
+  while i < len(expression):
+    c = expression[i]
+    literal = None
+    if c == "\\":
+      if i+1 >= len(expression):
+        return nothing
+      escaped = expression[i+1]
+      if escaped in _UNSUPPORTED_ESCAPES:
+        return nothing
+      i += 2
+      if not escaped.isalnum():
+        literal = escaped
+      elif escaped in _BRACED_ESCAPES and i < len(expression) and expression[i] == "{":
+        end = expression.find("}",i)
+        if end == -1:
+          return nothing
+        i = end+1
+    elif c == "[":
+      i = _skipClass(expression,i)
+    elif c == "(":
+      i = _skipGroup(expression,i)
+    elif c == "|":
+      return nothing
+    elif c in "*+?{)":
+      # quantifier without atom or unbalanced parenthesis
+      return nothing
+    elif c in ".^$":
+      i += 1
+    else:
+      literal = c
+      i += 1
+    if i is None:
+      return nothing
+    quantifier = _parseQuantifier(expression,i)
+    if quantifier is None:
+      return nothing
+    (i,minimum,repeated) = quantifier
+    if literal is not None and minimum >= 1:
+      current += literal
+      if not repeated:
+        continue
+    # the run of literals is finished
+    if current:
+      literals.append(current)
+      if atBeginning:
+        prefix = current
+      current = ""
+    atBeginning = False
+  if current:
+    literals.append(current)
+    if atBeginning:
+      prefix = current
+  return (prefix,literals)
+
+
+#-----------------------------------------------------------------------------------
+#   Cache of compiled patterns
+#-----------------------------------------------------------------------------------
+
+class LRUCache(object):
+  """ Dictionary with a bounded size. When the size is reached the least
+      recently used entry is removed.
+  """
+  def __init__(self,maxSize=64):
+    self.maxSize = maxSize
+    self.entries = {}
+    self.clock = 0
+  def get(self,key):
+    entry = self.entries.get(key)
+    if entry is None:
+      return None
+    self.clock += 1
+    entry[1] = self.clock
+    return entry[0]
+  def put(self,key,value):
+    if key not in self.entries and len(self.entries) >= self.maxSize:
+      oldestKey = min(self.entries.items(),key=lambda item:item[1][1])[0]
+      del self.entries[oldestKey]
+    self.clock += 1
+    self.entries[key] = [value,self.clock]
+  def __len__(self):
+    return len(self.entries)
+  def clear(self):
+    self.entries.clear()
+
+PATTERN_CACHE = LRUCache(64)
+
+def compilePattern(expression):
+  """ Return a tuple (pattern,prefix,literals) for a regular expression, where
+      pattern is the compiled expression (java or python) matching whole names,
+      and prefix/literals are the result of analyseRegex, the most selective
+      literals first. Compiled patterns are cached.
+  """
+  compiled = PATTERN_CACHE.get(expression)
+  if compiled is None:
+    if JavaPattern is not None:
+      pattern = JavaPattern.compile(expression)
+    else:
+      pattern = re.compile("(?:"+expression+")\\Z")
+    (prefix,literals) = analyseRegex(expression)
+    literals = sorted([ literal for literal in literals if literal != prefix ],
+                      key=len,reverse=True)
+    compiled = (pattern,prefix,literals)
+    PATTERN_CACHE.put(expression,compiled)
+  return compiled
+
+
+#-----------------------------------------------------------------------------------
+#   Name filters
+#-----------------------------------------------------------------------------------
+
+class NameFilter(object):
+  """ Filter on names.
+      EXAMPLES
+        NameFilter("Order").matches("PurchaseOrder")            # True
+        NameFilter("Order.*",True).matches("PurchaseOrder")     # False
+        NameFilter(".*Order",True).matches("PurchaseOrder")     # True
+  """
+  def __init__(self,expression,useRegex=False):
+    self.expression = expression
+    self.useRegex = useRegex
+    # number of names given to the regex engine, i.e. that passed the precheck
+    self.nbRegexCalls = 0
+    if useRegex:
+      (self.pattern,self.prefix,self.literals) = compilePattern(expression)
+      if JavaPattern is not None:
+        self._runRegex = self._matchesJava
+      else:
+        self._runRegex = self._matchesPython
+      self._matches = self._matchesRegex
+    else:
+      self._matches = self._contains
+  def _contains(self,name):
+    return name.find(self.expression) != -1
+  def _matchesJava(self,name):
+    return self.pattern.matcher(name).matches()
+  def _matchesPython(self,name):
+    return self.pattern.match(name) is not None
+  def _matchesRegex(self,name):
+    if self.prefix and not name.startswith(self.prefix):
+      return False
+    for literal in self.literals:
+      if name.find(literal) == -1:
+        return False
+    self.nbRegexCalls += 1
+    return self._runRegex(name)
+  def matches(self,name):
+    """ Return True if the name is selected by the filter. None is handled as ""
+    """
+    if name is None:
+      name = u""
+    return self._matches(name)
+  def __repr__(self):
+    return "NameFilter(%r,%r)" % (self.expression,self.useRegex)
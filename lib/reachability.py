@@ -0,0 +1,303 @@
+#
+# reachability
+#
+# Reachability queries over the associations of the model, using a compact
+# adjacency index.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   Each element of the model gets an index (an int). For each association
+#   feature (e.g. "getOwner", "getDependsOnDependency"), the links of the model
+#   are stored in compressed sparse row form (see snapshot.buildCSR): an array
+#   of offsets and an array of targets, both arrays of ints. Reachability
+#   queries are then breadth first searches on these arrays, with no call to
+#   the model. Links can be followed backwards as well ("who depends on X").
+#   The index is built once for the modeling session, in one pass over the
+#   model. It is then updated with the model changes (see modelchanges): the
+#   links of the elements changed since the index was built are stored in an
+#   overlay that takes precedence over the arrays, deleted elements are
+#   skipped, and new elements get new indexes. When the overlay becomes too
+#   large compared to the arrays, the index is built again.
+#
+# Usage:
+#   from reachability import theReachabilityIndex
+#   index = theReachabilityIndex()
+#   index.reachable(myclass,["getDependsOnDependency","getDependsOn"])
+#   index.reachable(myclass,["getDependsOnDependency","getDependsOn"],reverse=True)
+#
+# History
+#   Version 1.0
+#      - first version
+
+import time
+from array import array
+from collections import deque
+
+from misc import isList
+from introspection import ModelioElement
+from introspection import getAllInstances,getMetaclass,getElementId,getAssociationMetaFeatures
+from snapshot import buildCSR
+from modelchanges import theModelChangeTracker
+
+# the index is built again when the overlay contains more than this ratio of
+# the elements
+REBUILD_RATIO = 0.1
+
+
+#-----------------------------------------------------------------------------------
+#   Adjacency index on element indexes
+#-----------------------------------------------------------------------------------
+
+class AdjacencyIndex(object):
+  """ Links between nodes numbered from 0, grouped by feature. Links are stored
+      as CSR arrays, possibly overridden by an overlay giving the new targets of
+      some nodes. Deleted nodes are never reached.
+  """
+  def __init__(self,nbNodes,edges):
+    """ edges is a dictionary giving for each feature name a pair of int
+        arrays (sources,targets)
+    """
+    self.nbNodes = nbNodes
+    # feature name -> (offsets,targets)
+    self.csr = {}
+    for (featureName,(sources,targets)) in edges.items():
+      self.csr[featureName] = buildCSR(nbNodes,sources,targets)
+    # feature name -> (offsets,sources), computed on demand
+    self.reverseCSR = {}
+    # feature name -> { node : [targets] } for the nodes changed or added
+    self.overlay = {}
+    # feature name -> { target : set(sources) } for the links of the overlay
+    self.reverseOverlay = {}
+    # nodes of the overlay, i.e. whose links in the arrays are obsolete
+    self.overriddenNodes = set()
+    self.deleted = array("b",[0])*nbNodes
+
+  def getFeatureNames(self):
+    return sorted(set(self.csr.keys()) | set(self.overlay.keys()))
+
+  def addNode(self):
+    """ Add a node with no link and return its number
+    """
+    self.deleted.append(0)
+    self.nbNodes += 1
+    return self.nbNodes-1
+
+  def deleteNode(self,node):
+    self.deleted[node] = 1
+
+  def setTargets(self,node,targetsByFeature):
+    """ Replace all the links of the node with the given ones
+        (int,{ String : [int] }) -> ()
+    """
+    for (featureName,overlay) in self.overlay.items():
+      for target in overlay.pop(node,[]):
+        self.reverseOverlay[featureName][target].discard(node)
+    for (featureName,targets) in targetsByFeature.items():
+      self.overlay.setdefault(featureName,{})[node] = list(targets)
+      reverseOverlay = self.reverseOverlay.setdefault(featureName,{})
+      for target in targets:
+        reverseOverlay.setdefault(target,set()).add(node)
+    self.overriddenNodes.add(node)
+
+  def getOverlaySize(self):
+    return len(self.overriddenNodes)
+
+  def _getReverseCSR(self,featureName):
+    if featureName not in self.reverseCSR:
+      (offsets,targets) = self.csr[featureName]
+      nbBaseNodes = len(offsets)-1
+      sources = array("i",[0])*len(targets)
+      for node in range(nbBaseNodes):
+        for i in range(offsets[node],offsets[node+1]):
+          sources[i] = node
+      self.reverseCSR[featureName] = buildCSR(nbBaseNodes,targets,sources)
+    return self.reverseCSR[featureName]
+
+  def getTargets(self,node,featureName,reverse=False):
+    """ Return the nodes linked to/from the node by the feature
+        (int,String,Boolean) -> [int]
+    """
+    if not reverse:
+      overlay = self.overlay.get(featureName)
+      if overlay is not None and node in overlay:
+        return overlay[node]
+      if node in self.overriddenNodes or featureName not in self.csr:
+        return []
+      (offsets,targets) = self.csr[featureName]
+      if node >= len(offsets)-1:
+        return []
+      return targets[offsets[node]:offsets[node+1]]
+    else:
+      result = []
+      if featureName in self.csr:
+        (offsets,sources) = self._getReverseCSR(featureName)
+        if node < len(offsets)-1:
+          result = [ source for source in sources[offsets[node]:offsets[node+1]]
+                       if source not in self.overriddenNodes ]
+      reverseOverlay = self.reverseOverlay.get(featureName)
+      if reverseOverlay is not None and node in reverseOverlay:
+        result.extend(reverseOverlay[node])
+      return result
+
+  def reachable(self,roots,featureNames=None,maxDepth=None,reverse=False):
+    """ Return the nodes reachable from the roots through the features, in
+        breadth first order. The roots are never in the result, even when
+        they are reachable from another root.
+        ([int],[String]|None,int|None,Boolean) -> array('i')
+    """
+    if featureNames is None:
+      featureNames = self.getFeatureNames()
+    visited = array("b",self.deleted)
+    result = array("i")
+    frontier = deque()
+    for root in roots:
+      if not visited[root]:
+        visited[root] = 1
+        frontier.append((root,0))
+    while len(frontier) != 0:
+      (node,depth) = frontier.popleft()
+      if maxDepth is not None and depth >= maxDepth:
+        continue
+      for featureName in featureNames:
+        for target in self.getTargets(node,featureName,reverse):
+          if not visited[target]:
+            visited[target] = 1
+            result.append(target)
+            frontier.append((target,depth+1))
+    return result
+
+
+#-----------------------------------------------------------------------------------
+#   Reachability index of the model
+#-----------------------------------------------------------------------------------
+
+def _getLinks(element,indexOfElementFun):
+  """ Return the links of an element as a dictionary giving for each feature
+      name the list of the indexes of the targets
+  """
+  links = {}
+  for feature in getAssociationMetaFeatures(getMetaclass(element)):
+    value = feature.eval(element)
+    values = value if isList(value) else [value]
+    targets = []
+    for target in values:
+      targetIndex = indexOfElementFun(target)
+      if targetIndex is not None:
+        targets.append(targetIndex)
+    if len(targets) != 0:
+      links[feature.getName()] = targets
+  return links
+
+class ReachabilityIndex(object):
+  """ Adjacency index of all the elements of the model
+  """
+  def build(self):
+    startTime = time.time()
+    tracker = theModelChangeTracker()
+    self.watermark = tracker.getWatermark()
+    self.elements = list(getAllInstances(ModelioElement))
+    self.indexes = {}
+    for (i,element) in enumerate(self.elements):
+      self.indexes[getElementId(element)] = i
+    edges = {}
+    for (i,element) in enumerate(self.elements):
+      for (featureName,targets) in _getLinks(element,self._getIndexOrNone).items():
+        if featureName not in edges:
+          edges[featureName] = (array("i"),array("i"))
+        (sources,featureTargets) = edges[featureName]
+        for target in targets:
+          sources.append(i)
+          featureTargets.append(target)
+    self.adjacency = AdjacencyIndex(len(self.elements),edges)
+    nbLinks = sum([ len(targets) for (sources,targets) in edges.values() ])
+    print "reachability index built: %d elements, %d features, %d links in %.1fs" \
+          % (len(self.elements),len(edges),nbLinks,time.time()-startTime)
+
+  def _getIndexOrNone(self,element):
+    if element is None or not isinstance(element,ModelioElement):
+      return None
+    return self.indexes.get(getElementId(element))
+
+  def _getOrAddIndex(self,element):
+    elementId = getElementId(element)
+    if elementId not in self.indexes:
+      self.indexes[elementId] = self.adjacency.addNode()
+      self.elements.append(element)
+    return self.indexes[elementId]
+
+  def refresh(self):
+    """ Update the index with the changes of the model since it was built or
+        refreshed, or build it again if they are not known or too many
+    """
+    tracker = theModelChangeTracker()
+    changes = tracker.getChangesSince(self.watermark)
+    if changes is None:
+      self.build()
+      return
+    (changedElements,deletedIds) = changes
+    if len(changedElements) == 0 and len(deletedIds) == 0:
+      return
+    if self.adjacency.getOverlaySize()+len(changedElements) > REBUILD_RATIO*len(self.elements):
+      self.build()
+      return
+    self.watermark = tracker.getWatermark()
+    for elementId in deletedIds:
+      if elementId in self.indexes:
+        self.adjacency.deleteNode(self.indexes[elementId])
+    # elements created are indexed before links are computed
+    changedIndexes = []
+    for element in changedElements:
+      if getElementId(element) not in deletedIds:
+        changedIndexes.append((element,self._getOrAddIndex(element)))
+    for (element,index) in changedIndexes:
+      self.adjacency.setTargets(index,_getLinks(element,self._getIndexOrNone))
+
+  def reachable(self,roots,features=None,maxDepth=None,reverse=False):
+    """ Return the elements reachable from the roots (the roots excepted),
+        following the given features or all features if None, backwards if
+        reverse is True. The index should be up to date (see theReachabilityIndex).
+        (Element|[Element],[String]|None,int|None,Boolean) -> [Element]
+        EXAMPLES
+          index.reachable(myclass,["getOwner"])                # owners
+          index.reachable(mypackage,["getOwner"],reverse=True)  # content
+    """
+    if not isList(roots):
+      roots = [roots]
+    rootIndexes = [ index for index in map(self._getIndexOrNone,roots) if index is not None ]
+    return [ self.elements[index]
+             for index in self.adjacency.reachable(rootIndexes,features,maxDepth,reverse) ]
+
+  def getFeatureNames(self):
+    return self.adjacency.getFeatureNames()
+
+
+try:
+  REACHABILITY_INDEX
+except NameError:
+  REACHABILITY_INDEX = None
+
+def theReachabilityIndex():
+  """ Return the reachability index, built on first use and updated with the
+      changes of the model
+      () -> ReachabilityIndex
+  """
+  global REACHABILITY_INDEX
+  if REACHABILITY_INDEX is None:
+    REACHABILITY_INDEX = ReachabilityIndex()
+    REACHABILITY_INDEX.build()
+  else:
+    REACHABILITY_INDEX.refresh()
+  return REACHABILITY_INDEX
+
+def reachableElements(roots,features=None,maxDepth=None,reverse=False):
+  """ Return the elements reachable from the roots through the given features
+      EXAMPLES
+        reachableElements(myclass,["getDependsOnDependency","getDependsOn"])
+  """
+  return theReachabilityIndex().reachable(roots,features,maxDepth,reverse)
+
+
+print "module reachability loaded from",__file__
@@ -0,0 +1,259 @@
+#
+# savedsearches
+#
+# Named searches saved in the workspace, with their last results.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   A saved search is a named search of AdvancedSearch: a list of metaclass
+#   names, a pattern, and whether the pattern is a regular expression.
+#   Saved searches are stored with pickle in the file ".advancedsearch" of
+#   the macros directory of the workspace, together with the result of their
+#   last execution as a list of element identifiers and the watermark of the
+#   model at that time (see modelchanges).
+#   When a saved search is run again
+#     - if the model has not changed, the last results are returned,
+#     - if the changes since the last execution are known, only the elements
+#       created, updated, moved or deleted since then are checked,
+#     - otherwise the search is done on the whole model.
+#
+# Usage:
+#   from savedsearches import saveSearch,runSavedSearch
+#   saveSearch("entities",["Class"],".*Entity",True)
+#   for element in runSavedSearch("entities"):
+#     print element.getName()
+#
+# History
+#   Version 1.0
+#      - first version
+
+import os
+import pickle
+
+try:
+  from org.modelio.api.modelio import Modelio
+  orgVersion = True
+except:
+  from com.modeliosoft.modelio.api.modelio import Modelio
+  orgVersion = False
+
+from namefilter import NameFilter
+from searchengine import getMetaclassByName,searchElements,filterElements
+from searchengine import findElementById,getElementIdentifier
+from modelchanges import theModelChangeTracker
+
+SAVED_SEARCHES_FILE_NAME = ".advancedsearch"
+# version of the format of the file
+SAVED_SEARCHES_FORMAT = 1
+
+
+def getDefaultStorePath():
+  """ Return the path of the file containing the saved searches of the workspace
+  """
+  workspaceDirectory = Modelio.getInstance().getContext().getWorkspacePath().toString()
+  if orgVersion:
+    macrosDirectory = os.path.join(workspaceDirectory,'macros')
+  else:
+    macrosDirectory = os.path.join(workspaceDirectory,'.config','macros')
+  return os.path.join(macrosDirectory,SAVED_SEARCHES_FILE_NAME)
+
+
+def _getName(element):
+  try:
+    return element.getName()
+  except:
+    return None
+
+class SavedSearch(object):
+  """ A named search and its last results
+  """
+  def __init__(self,name,metaclassNames,pattern,regex=False):
+    self.name = name
+    self.metaclassNames = list(metaclassNames)
+    self.pattern = pattern
+    self.regex = regex
+    # identifiers of the elements found by the last execution, or None
+    self.resultIds = None
+    # watermark of the model at the last execution
+    self.watermark = None
+    # elements found by the last execution, not saved
+    self.results = None
+
+  def getMetaclasses(self):
+    return [ getMetaclassByName(name) for name in self.metaclassNames ]
+
+  def getNameFilter(self):
+    return NameFilter(self.pattern,self.regex)
+
+  def _getLastResults(self):
+    if self.results is None:
+      self.results = [ element for element in map(findElementById,self.resultIds)
+                         if element is not None ]
+    return self.results
+
+  def run(self,verbose=True):
+    """ Return the elements currently selected by the search, sorted by name
+        Boolean -> [Element]
+    """
+    tracker = theModelChangeTracker()
+    # the watermark is read before searching so that changes made during the
+    # search are seen by the next execution
+    watermark = tracker.getWatermark()
+    changes = None
+    if self.resultIds is not None:
+      changes = tracker.getChangesSince(self.watermark)
+    if changes is None:
+      if verbose: print "Saved search '"+self.name+"': searching the whole model"
+      results = searchElements(self.getMetaclasses(),self.getNameFilter(),verbose)
+    else:
+      (changedElements,deletedIds) = changes
+      results = self._getLastResults()
+      if len(changedElements) != 0 or len(deletedIds) != 0:
+        if verbose: print "Saved search '"+self.name+"':",len(changedElements),"elements changed,", \
+                          len(deletedIds),"deleted since last execution"
+        changedSet = set(changedElements)
+        results = [ element for element in results
+                      if element not in changedSet and getElementIdentifier(element) not in deletedIds ]
+        existing = [ element for element in changedElements
+                       if getElementIdentifier(element) not in deletedIds ]
+        results.extend(filterElements(existing,self.getMetaclasses(),self.getNameFilter()))
+        results.sort(key=_getName)
+      elif verbose:
+        print "Saved search '"+self.name+"': model unchanged since last execution"
+    self.results = results
+    self.resultIds = [ getElementIdentifier(element) for element in results ]
+    self.watermark = watermark
+    return list(results)
+
+  def _getState(self):
+    return { "name"           : self.name,
+             "metaclassNames" : self.metaclassNames,
+             "pattern"        : self.pattern,
+             "regex"          : self.regex,
+             "resultIds"      : self.resultIds,
+             "watermark"      : self.watermark }
+
+  def _setState(self,state):
+    self.resultIds = state.get("resultIds")
+    self.watermark = state.get("watermark")
+    self.results = None
+
+  def __repr__(self):
+    return "SavedSearch(%r,%r,%r,%r)" % (self.name,self.metaclassNames,self.pattern,self.regex)
+
+
+class SavedSearchStore(object):
+  """ The saved searches of a file. Searches are saved as plain dictionaries
+      so that the file does not depend on the classes of this module.
+  """
+  def __init__(self,path):
+    self.path = path
+    self.searches = {}
+    self.load()
+
+  def load(self):
+    self.searches = {}
+    if not os.path.isfile(self.path):
+      return
+    f = open(self.path,"rb")
+    try:
+      try:
+        (format,states) = pickle.load(f)
+      except Exception, e:
+        print "Saved searches cannot be read from",self.path,":",e
+        return
+    finally:
+      f.close()
+    if format != SAVED_SEARCHES_FORMAT:
+      return
+    for state in states:
+      search = SavedSearch(state["name"],state["metaclassNames"],state["pattern"],state["regex"])
+      search._setState(state)
+      self.searches[search.name] = search
+
+  def save(self):
+    states = [ search._getState() for search in self.searches.values() ]
+    # write in a temporary file first so that a partial file is never loaded
+    temporaryPath = self.path+".tmp"
+    f = open(temporaryPath,"wb")
+    try:
+      pickle.dump((SAVED_SEARCHES_FORMAT,states),f,pickle.HIGHEST_PROTOCOL)
+    finally:
+      f.close()
+    if os.path.exists(self.path):
+      os.remove(self.path)
+    os.rename(temporaryPath,self.path)
+
+  def getNames(self):
+    return sorted(self.searches.keys())
+
+  def get(self,name):
+    try:
+      return self.searches[name]
+    except KeyError:
+      raise NameError("There is no saved search named '"+name+"'")
+
+  def add(self,search):
+    """ Add a search, replacing the search with the same name if any
+    """
+    self.searches[search.name] = search
+    self.save()
+
+  def remove(self,name):
+    self.get(name)
+    del self.searches[name]
+    self.save()
+
+  def run(self,name,verbose=True):
+    results = self.get(name).run(verbose)
+    self.save()
+    return results
+
+
+try:
+  SAVED_SEARCH_STORE
+except NameError:
+  SAVED_SEARCH_STORE = None
+
+def theSavedSearchStore():
+  """ Return the store of the saved searches of the workspace
+      () -> SavedSearchStore
+  """
+  global SAVED_SEARCH_STORE
+  path = getDefaultStorePath()
+  if SAVED_SEARCH_STORE is None or SAVED_SEARCH_STORE.path != path:
+    SAVED_SEARCH_STORE = SavedSearchStore(path)
+  return SAVED_SEARCH_STORE
+
+def saveSearch(name,metaclassNames,pattern,regex=False):
+  """ Save a search with the given name, replacing the previous one if any.
+      (String,[String],String,Boolean) -> SavedSearch
+      EXAMPLES
+        saveSearch("entities",["Class"],".*Entity",True)
+  """
+  search = SavedSearch(name,metaclassNames,pattern,regex)
+  # check the criteria before saving them
+  search.getMetaclasses()
+  search.getNameFilter()
+  theSavedSearchStore().add(search)
+  return search
+
+def deleteSavedSearch(name):
+  theSavedSearchStore().remove(name)
+
+def getSavedSearchNames():
+  return theSavedSearchStore().getNames()
+
+def runSavedSearch(name,verbose=True):
+  """ Return the elements currently selected by the saved search
+      (String,Boolean) -> [Element]
+      EXAMPLES
+        runSavedSearch("entities")
+  """
+  return theSavedSearchStore().run(name,verbose)
+
+
+print "module savedsearches loaded from",__file__
@@ -0,0 +1,130 @@
+#
+# searchengine
+#
+# Search of model elements by metaclass and name, as in the AdvancedSearch macro.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   A search selects the instances of a set of metaclasses (or of their
+#   submetaclasses) whose name is selected by a name filter (see namefilter).
+#   Predefined types are excluded. Results are sorted by name.
+#   Besides searching the whole model, the elements of a given collection
+#   can be checked against the same criteria. This is used to update the
+#   results of saved searches with the elements changed since their last
+#   execution (see savedsearches).
+#
+# History
+#   Version 1.0
+#      - first version, extracted from AdvancedSearch 1.3
+
+try:
+  from org.modelio.api.modelio import Modelio
+  from org.modelio.metamodel.uml.infrastructure import ModelElement as RootMetaclass
+  orgVersion = True
+except:
+  from com.modeliosoft.modelio.api.modelio import Modelio
+  from com.modeliosoft.modelio.api.model.uml.infrastructure import IModelElement as RootMetaclass
+  orgVersion = False
+from java.util import HashSet
+
+from namefilter import NameFilter
+
+
+def getSession():
+  return Modelio.getInstance().getModelingSession()
+
+def getMetaclassByName(name):
+  """ Return the metaclass with the given simple name
+      String -> Class
+      EXAMPLES
+        getMetaclassByName("Class")
+  """
+  metaclass = Modelio.getInstance().getMetamodelService().getMetaclass(name)
+  if metaclass is None:
+    raise NameError("There is no metaclass named '"+name+"'")
+  return metaclass
+
+def getPredefinedTypesElements():
+  """ Return the elements containing the predefined types
+      (package and its owner)
+  """
+  predefTypes = getSession().getModel().getUmlTypes().getBOOLEAN().getOwner()
+  return [predefTypes,predefTypes.getOwner()]
+
+def getElementIdentifier(element):
+  """ Return the identifier of an element, as used by findElementById
+      Element -> String
+  """
+  if orgVersion:
+    return unicode(element.getUuid().toString())
+  else:
+    return unicode(element.getIdentifier())
+
+def findElementById(identifier):
+  """ Return the element with the given identifier or None if it does not exist
+      any more
+      String -> Element|None
+  """
+  try:
+    return getSession().findElementById(RootMetaclass,identifier)
+  except:
+    return None
+
+def _getName(element):
+  try:
+    name = element.getName()
+  except:
+    return None
+  return name
+
+
+def searchElements(metaclasses,nameFilter,verbose=True):
+  """ Return the instances of the metaclasses selected by the name filter,
+      sorted by name. Metaclasses are searched in the order given.
+      ([Class],NameFilter,Boolean) -> [Element]
+  """
+  if verbose: print "Searching ..."
+  rawResults = HashSet()
+  session = getSession()
+  #--- (1) Add all instances of selected metaclasses
+  for metaclass in metaclasses:
+    if verbose: print "  searching for instance of metaclass ",metaclass.getSimpleName()," ... ",
+    metaclassInstances = session.findByClass(metaclass)
+    if verbose: print unicode(len(metaclassInstances)),"elements found"
+    rawResults.addAll(metaclassInstances)
+  for excluded in getPredefinedTypesElements():
+    rawResults.remove(excluded)
+  if verbose: print "  ==>",unicode(len(rawResults)),"elements found (primitive types excluded)"
+  #--- (2) Check for name matching
+  filteredResults = [ element for element in rawResults
+                        if nameFilter.matches(_getName(element)) ]
+  if verbose:
+    if nameFilter.useRegex:
+      print "  "+unicode(nameFilter.nbRegexCalls)+" names checked by the regular expression engine"
+    print "  "+unicode(len(filteredResults))+" elements selected after name filtering"
+  #--- (3) sort results by name
+  filteredResults.sort(key=_getName)
+  return filteredResults
+
+def filterElements(elements,metaclasses,nameFilter):
+  """ Return the elements of the collection that would be selected by
+      searchElements(metaclasses,nameFilter), in the same order.
+      ([Element],[Class],NameFilter) -> [Element]
+  """
+  excluded = getPredefinedTypesElements()
+  return [ element for element in elements
+             if element not in excluded
+                and _isInstanceOfAny(element,metaclasses)
+                and nameFilter.matches(_getName(element)) ]
+
+def _isInstanceOfAny(element,metaclasses):
+  for metaclass in metaclasses:
+    if isinstance(element,metaclass):
+      return True
+  return False
+
+
+print "module searchengine loaded from",__file__
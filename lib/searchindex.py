@@ -0,0 +1,452 @@
+#
+# searchindex
+#
+# Indexes of textual fields of model elements: names, notes, tagged values
+# and stereotypes.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   A field gives a list of strings for each element, for instance the
+#   contents of the notes of the element. A field index keeps these strings
+#   for all elements of the model, and an inverted index of their trigrams
+#   (substrings of 3 characters, lower case). To search a field with a name
+#   filter (see namefilter), candidates are first obtained from the trigrams
+#   of the expression (or of the literals of a regular expression), and only
+#   these candidates are checked with the filter. Each string is checked
+#   separately: with a regular expression, one of the strings of the field
+#   must match the whole expression.
+#   A search is a list of criteria (field,filter) that must all be satisfied.
+#   Field indexes are built once for the modeling session, on first use, and
+#   updated with the elements changed since the last search (see modelchanges).
+#
+#   The trigram indexes of names and paths are also used for fuzzy searches:
+#   elements are ranked by the similarity of the trigrams of their name (Dice
+#   coefficient) or of their path (part of the trigrams of the query found in
+#   the path) with the trigrams of the query. Candidates are only taken from
+#   the postings of the rarest trigrams of the query: an element that has none
+#   of them cannot have the minimum score (prefix filtering).
+#
+# Usage:
+#   from searchindex import searchFields,fuzzySearch
+#   searchFields([Class],[("Note","TODO",False),("Stereotype","Entity",False)])
+#   fuzzySearch([Class],"purchse ordr")     # [(score,element)], best first
+#
+# History
+#   Version 1.1
+#      - field "Path"
+#      - fuzzy ranked search
+#   Version 1.0
+#      - first version
+
+import time
+import heapq
+
+try:
+  from org.modelio.api.modelio import Modelio
+  from org.modelio.metamodel.uml.infrastructure import ModelElement as RootMetaclass
+except:
+  from com.modeliosoft.modelio.api.modelio import Modelio
+  from com.modeliosoft.modelio.api.model.uml.infrastructure import IModelElement as RootMetaclass
+
+from namefilter import NameFilter,compilePattern
+from searchengine import getSession,getElementIdentifier,getPredefinedTypesElements
+from modelchanges import theModelChangeTracker
+
+
+#-----------------------------------------------------------------------------------
+#   N-gram inverted index
+#-----------------------------------------------------------------------------------
+
+def getNGrams(text,n=3):
+  """ Return the set of the n-grams of a text, in lower case
+      String -> set(String)
+      EXAMPLES
+        getNGrams("Order")    # set(["ord","rde","der"])
+  """
+  text = text.lower()
+  return set([ text[i:i+n] for i in range(len(text)-n+1) ])
+
+class NGramIndex(object):
+  """ Inverted index from n-grams to keys. Each key is indexed with a text.
+  """
+  def __init__(self,n=3):
+    self.n = n
+    # n-gram -> set of keys
+    self.postings = {}
+    # key -> n-grams of its text
+    self.keyNGrams = {}
+  def add(self,key,text):
+    """ Index the key with the text, replacing its previous text if any
+    """
+    self.remove(key)
+    ngrams = getNGrams(text,self.n)
+    self.keyNGrams[key] = ngrams
+    for ngram in ngrams:
+      keys = self.postings.get(ngram)
+      if keys is None:
+        self.postings[ngram] = set([key])
+      else:
+        keys.add(key)
+  def remove(self,key):
+    ngrams = self.keyNGrams.pop(key,None)
+    if ngrams is None:
+      return
+    for ngram in ngrams:
+      keys = self.postings[ngram]
+      keys.discard(key)
+      if len(keys) == 0:
+        del self.postings[ngram]
+  def __len__(self):
+    return len(self.keyNGrams)
+  def __contains__(self,key):
+    return key in self.keyNGrams
+  def keys(self):
+    return self.keyNGrams.keys()
+  def getCandidates(self,substrings):
+    """ Return the keys whose text may contain all the given substrings
+        (ignoring case), or None if all keys are candidates, that is if
+        the substrings are too short to select anything.
+        [String] -> set(Key)|None
+    """
+    ngrams = set()
+    for substring in substrings:
+      ngrams.update(getNGrams(substring,self.n))
+    if len(ngrams) == 0:
+      return None
+    postings = []
+    for ngram in ngrams:
+      keys = self.postings.get(ngram)
+      if keys is None:
+        return set()
+      postings.append(keys)
+    # intersect starting from the most selective n-gram
+    postings.sort(key=len)
+    candidates = set(postings[0])
+    for keys in postings[1:]:
+      candidates.intersection_update(keys)
+      if len(candidates) == 0:
+        break
+    return candidates
+
+
+#-----------------------------------------------------------------------------------
+#   Fields
+#-----------------------------------------------------------------------------------
+
+def getNameValues(element):
+  name = element.getName()
+  if name is None:
+    return []
+  return [name]
+
+def getNoteValues(element):
+  return [ note.getContent() for note in element.getDescriptor() ]
+
+def getTaggedValueValues(element):
+  values = []
+  for taggedValue in element.getTag():
+    for parameter in taggedValue.getActual():
+      values.append(parameter.getValue())
+  return values
+
+def getStereotypeValues(element):
+  return [ stereotype.getName() for stereotype in element.getExtension() ]
+
+def _getOwner(element):
+  try:
+    # Modelio 3.x
+    return element.getCompositionOwner()
+  except:
+    try:
+      return element.getOwner()
+    except:
+      return None
+
+def getPathValues(element):
+  names = []
+  while element is not None:
+    names.append(element.getName() or "")
+    element = _getOwner(element)
+  names.reverse()
+  return [".".join(names)]
+
+# field name -> function giving the strings of an element
+FIELDS = {
+  "Name"         : getNameValues,
+  "Note"         : getNoteValues,
+  "Tagged value" : getTaggedValueValues,
+  "Stereotype"   : getStereotypeValues,
+  "Path"         : getPathValues,
+}
+FIELD_NAMES = ["Name","Note","Tagged value","Stereotype","Path"]
+
+def _getOwners(element):
+  """ Return the elements whose fields may have changed when the given element
+      changed: the element itself, and for instance for a tag parameter,
+      the tagged value and the annotated element.
+  """
+  owners = [element]
+  for i in range(2):
+    try:
+      element = element.getCompositionOwner()
+    except:
+      break
+    if element is None:
+      break
+    owners.append(element)
+  return owners
+
+def _getDescendants(element):
+  """ Return the element and all the elements it contains, as the paths of all
+      these elements change when the element is renamed or moved
+  """
+  descendants = [element]
+  i = 0
+  while i < len(descendants):
+    try:
+      descendants.extend(descendants[i].getCompositionChildren())
+    except:
+      pass
+    i += 1
+  return descendants
+
+# field name -> function giving the elements whose strings may have changed
+# when the given element changed
+FIELD_DEPENDENTS = {
+  "Path" : _getDescendants,
+}
+
+
+class FieldIndex(object):
+  """ Strings of a field for all elements of the model, with a trigram index
+  """
+  def __init__(self,fieldName):
+    self.fieldName = fieldName
+    self.valuesFun = FIELDS[fieldName]
+    self.dependentsFun = FIELD_DEPENDENTS.get(fieldName,_getOwners)
+    # element id -> (element,[String])
+    self.values = {}
+    self.ngramIndex = NGramIndex(3)
+    self.watermark = None
+
+  def _getValues(self,element):
+    try:
+      values = self.valuesFun(element)
+    except:
+      return []
+    return [ value for value in values if value ]
+
+  def _indexElement(self,element):
+    key = getElementIdentifier(element)
+    values = self._getValues(element)
+    if len(values) == 0:
+      self._removeKey(key)
+    else:
+      self.values[key] = (element,values)
+      self.ngramIndex.add(key,"\n".join(values))
+
+  def _removeKey(self,key):
+    if key in self.values:
+      del self.values[key]
+      self.ngramIndex.remove(key)
+
+  def build(self):
+    startTime = time.time()
+    tracker = theModelChangeTracker()
+    self.watermark = tracker.getWatermark()
+    self.values = {}
+    self.ngramIndex = NGramIndex(3)
+    excluded = getPredefinedTypesElements()
+    for element in getSession().findByClass(RootMetaclass):
+      if element not in excluded:
+        self._indexElement(element)
+    print "  index of field '"+self.fieldName+"' built:",len(self.values),"elements in %.1fs" % (time.time()-startTime)
+
+  def refresh(self):
+    """ Build the index or update it with the elements changed since the last
+        refresh
+    """
+    tracker = theModelChangeTracker()
+    changes = tracker.getChangesSince(self.watermark)
+    if changes is None:
+      self.build()
+      return
+    self.watermark = tracker.getWatermark()
+    (changedElements,deletedIds) = changes
+    if len(changedElements) == 0 and len(deletedIds) == 0:
+      return
+    toIndex = {}
+    for element in changedElements:
+      for dependent in self.dependentsFun(element):
+        toIndex[dependent] = True
+    for element in toIndex.keys():
+      try:
+        key = getElementIdentifier(element)
+      except:
+        continue
+      if key not in deletedIds:
+        self._indexElement(element)
+    for key in deletedIds:
+      self._removeKey(key)
+
+  def search(self,nameFilter):
+    """ Return the elements having a string of the field selected by the filter
+        NameFilter -> [Element]
+    """
+    if nameFilter.useRegex:
+      (pattern,prefix,literals) = compilePattern(nameFilter.expression)
+      substrings = [prefix]+literals
+    else:
+      substrings = [nameFilter.expression]
+    candidates = self.ngramIndex.getCandidates(substrings)
+    if candidates is None:
+      candidates = self.values.keys()
+    results = []
+    for key in candidates:
+      (element,values) = self.values[key]
+      for value in values:
+        if nameFilter.matches(value):
+          results.append(element)
+          break
+    return results
+
+
+try:
+  FIELD_INDEXES
+except NameError:
+  # field name -> FieldIndex
+  FIELD_INDEXES = {}
+
+def getFieldIndex(fieldName):
+  """ Return the up to date index of the given field
+      String -> FieldIndex
+  """
+  if fieldName not in FIELDS:
+    raise NameError("There is no field named '"+fieldName+"'")
+  index = FIELD_INDEXES.get(fieldName)
+  if index is None:
+    index = FieldIndex(fieldName)
+    FIELD_INDEXES[fieldName] = index
+  index.refresh()
+  return index
+
+
+#-----------------------------------------------------------------------------------
+#   Search
+#-----------------------------------------------------------------------------------
+
+def _isInstanceOfAny(element,metaclasses):
+  for metaclass in metaclasses:
+    if isinstance(element,metaclass):
+      return True
+  return False
+
+def searchFields(metaclasses,criteria,verbose=True):
+  """ Return the instances of the metaclasses satisfying all the criteria,
+      sorted by name. A criterion is a tuple (fieldName,pattern,regex).
+      ([Class],[(String,String,Boolean)],Boolean) -> [Element]
+      EXAMPLES
+        searchFields([Class],[("Note","TODO",False)])
+        searchFields([Class],[("Name","Order",False),("Stereotype","Entity",False)])
+  """
+  startTime = time.time()
+  if verbose: print "Searching ..."
+  filters = [ (fieldName,NameFilter(pattern,regex)) for (fieldName,pattern,regex) in criteria ]
+  results = None
+  for (fieldName,nameFilter) in filters:
+    found = getFieldIndex(fieldName).search(nameFilter)
+    if verbose: print "  "+unicode(len(found))+" elements selected by field '"+fieldName+"'"
+    if results is None:
+      results = set(found)
+    else:
+      results.intersection_update(found)
+  results = [ element for element in (results or [])
+                if _isInstanceOfAny(element,metaclasses) ]
+  if verbose: print "  "+unicode(len(results))+" elements selected in %.2fs" % (time.time()-startTime)
+  results.sort(key=lambda element:element.getName())
+  return results
+
+
+#-----------------------------------------------------------------------------------
+#   Fuzzy search
+#-----------------------------------------------------------------------------------
+
+# minimum score of the elements returned by fuzzy searches
+FUZZY_MIN_SCORE = 0.3
+# default number of elements returned by fuzzy searches
+FUZZY_TOP_K = 100
+# weight of the similarity of paths compared to the one of names
+FUZZY_PATH_WEIGHT = 0.8
+
+def _getPrefixCandidates(ngramIndex,queryNGrams,minOverlap):
+  """ Return the keys having at least one of the len(queryNGrams)-minOverlap+1
+      rarest n-grams of the query. Any key having at least minOverlap n-grams
+      of the query is among them.
+  """
+  postings = [ ngramIndex.postings.get(ngram,()) for ngram in queryNGrams ]
+  postings.sort(key=len)
+  candidates = set()
+  for keys in postings[:len(postings)-minOverlap+1]:
+    candidates.update(keys)
+  return candidates
+
+def _diceScore(queryNGrams,ngrams):
+  return 2.0*len(queryNGrams & ngrams)/(len(queryNGrams)+len(ngrams))
+
+def _coverScore(queryNGrams,ngrams):
+  return float(len(queryNGrams & ngrams))/len(queryNGrams)
+
+def getFuzzyScores(query,minScore=FUZZY_MIN_SCORE):
+  """ Return a dictionary giving the score of the elements similar to the query
+      by name or by path. Keys are element ids.
+      String -> { String : float }
+  """
+  queryNGrams = getNGrams(query)
+  if len(queryNGrams) == 0:
+    return {}
+  q = len(queryNGrams)
+  scores = {}
+  # name: dice >= minScore implies overlap >= minScore*q/(2-minScore)
+  nameIndex = getFieldIndex("Name").ngramIndex
+  minOverlap = max(1,int(minScore*q/(2-minScore)))
+  for key in _getPrefixCandidates(nameIndex,queryNGrams,minOverlap):
+    score = _diceScore(queryNGrams,nameIndex.keyNGrams[key])
+    if score >= minScore:
+      scores[key] = score
+  # path: weight*cover >= minScore implies overlap >= minScore*q/weight
+  pathIndex = getFieldIndex("Path").ngramIndex
+  minOverlap = max(1,int(minScore*q/FUZZY_PATH_WEIGHT))
+  if minOverlap <= q:
+    for key in _getPrefixCandidates(pathIndex,queryNGrams,minOverlap):
+      score = FUZZY_PATH_WEIGHT*_coverScore(queryNGrams,pathIndex.keyNGrams[key])
+      if score >= minScore and score > scores.get(key,0.0):
+        scores[key] = score
+  return scores
+
+def fuzzySearch(metaclasses,query,topK=FUZZY_TOP_K,minScore=FUZZY_MIN_SCORE,verbose=True):
+  """ Return the topK instances of the metaclasses whose name or path are the
+      most similar to the query, as pairs (score,element), best first.
+      Scores are between 0 and 1.
+      ([Class],String,int,float,Boolean) -> [(float,Element)]
+      EXAMPLES
+        fuzzySearch([Class],"purchse ordr",10)
+  """
+  startTime = time.time()
+  scores = getFuzzyScores(query,minScore)
+  values = getFieldIndex("Name").values
+  pathValues = getFieldIndex("Path").values
+  def _scoredElements():
+    for (key,score) in scores.iteritems():
+      entry = values.get(key) or pathValues.get(key)
+      if entry is not None and _isInstanceOfAny(entry[0],metaclasses):
+        yield (score,entry[0])
+  results = heapq.nlargest(topK,_scoredElements(),key=lambda scored:scored[0])
+  if verbose:
+    print "  "+unicode(len(scores))+" similar elements, "+unicode(len(results))+" returned in %.3fs" % (time.time()-startTime)
+  return results
+
+
+print "module searchindex loaded from",__file__
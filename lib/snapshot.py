@@ -0,0 +1,431 @@
+#
+# snapshot
+#
+# Compact columnar snapshot of a model, for offline analysis.
+#
+# Author: jmfavre
+#
+# Compatibility: jython (inside Modelio) and python 2.x (outside Modelio)
+#
+# Description:
+#   A snapshot stores the elements of a model as columns of packed integers
+#   and string tables, so that it can be analysed without Modelio.
+#   Elements are identified by their index in the snapshot (0..n-1).
+#   This module defines the file format and does not depend on Modelio.
+#   Snapshots are produced inside Modelio with the module snapshotexport.
+#   They are read with the class Snapshot, which memory maps the file and
+#   reads columns in place, or with the functions allInstances, instancesNamed,
+#   instanceNamed, getElementParent and getElementPath that have the same
+#   signatures as the ones of modelioscriptor and introspection.
+#   EXAMPLE
+#     from snapshot import *
+#     openSnapshot("mymodel.snapshot")
+#     for c in allInstances("Class"): print getElementPath(c)
+#
+#   File layout (all integers are little endian):
+#     header    : magic "MDLSNAP\0" (8 bytes), format version (uint32),
+#                 number of sections (uint32), offset of the directory (uint64)
+#     sections  : packed arrays, each one starting on a 8 bytes boundary
+#     directory : for each section, its name (32 bytes, NUL padded), its type
+#                 code (1 byte: 'i' int32, 'q' int64, 'B' byte), 7 padding bytes,
+#                 its offset (uint64) and its number of items (uint64)
+#
+#   Sections:
+#     metaclass.names.offsets/data    string table with the names of metaclasses
+#     metaclass.super                 code of the direct super metaclass or -1
+#     element.ids.offsets/data        string table with the ids of elements
+#     element.names.offsets/data      string table with the names of elements
+#     element.metaclass               metaclass code of each element
+#     element.owner                   index of the parent of each element or -1
+#     feature.names.offsets/data      string table with the names of the
+#                                     association features (e.g. getOwnedElement)
+#     edges.<k>.offsets/targets       for the k-th association feature, the
+#                                     targets of the element i are the indexes
+#                                     targets[offsets[i]:offsets[i+1]]
+#   A string table is made of an int64 section 'offsets' with n+1 items and a
+#   byte section 'data' with the concatenation of the utf-8 encoded strings.
+#
+# History
+#   Version 1.1
+#      - reader (class Snapshot) and query functions
+#   Version 1.0
+#      - first version
+
+import struct
+from array import array
+try:
+  import mmap
+except ImportError:
+  # jython has no mmap module. The file is read in memory instead.
+  mmap = None
+
+SNAPSHOT_MAGIC = "MDLSNAP\0"
+SNAPSHOT_FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<8sIIQ")
+DIRECTORY_ENTRY = struct.Struct("<32sc7xQQ")
+ITEM_SIZES = { "i":4, "q":8, "B":1 }
+PACK_CHUNK_SIZE = 65536
+
+
+def getStringTableSections(name):
+  return (name+".offsets",name+".data")
+
+def getEdgeSections(featureIndex):
+  return ("edges.%d.offsets" % featureIndex,"edges.%d.targets" % featureIndex)
+
+def buildCSR(nbNodes,sources,targets):
+  """ Build a compressed sparse row representation of the edges (sources[i],targets[i]).
+      Return a pair of int arrays (offsets,orderedTargets) where the targets of
+      the node i are orderedTargets[offsets[i]:offsets[i+1]], in their original order.
+      (int,[int],[int]) -> (array('i'),array('i'))
+  """
+  offsets = array("i",[0])*(nbNodes+1)
+  for source in sources:
+    offsets[source+1] += 1
+  for i in range(nbNodes):
+    offsets[i+1] += offsets[i]
+  position = array("i",offsets[:-1]) if nbNodes else array("i")
+  orderedTargets = array("i",[0])*len(targets)
+  for i in range(len(sources)):
+    source = sources[i]
+    orderedTargets[position[source]] = targets[i]
+    position[source] += 1
+  return (offsets,orderedTargets)
+
+
+class SnapshotWriter(object):
+  """ Write a snapshot section by section.
+      EXAMPLE
+        writer = SnapshotWriter("model.snapshot")
+        writer.writeStrings("element.names",[u"A",u"B"])
+        writer.writeInts("element.owner",[-1,0])
+        writer.close()
+  """
+  def __init__(self,path):
+    self.file = open(path,"wb")
+    self.file.write(HEADER.pack(SNAPSHOT_MAGIC,SNAPSHOT_FORMAT_VERSION,0,0))
+    self.position = HEADER.size
+    self.sections = []
+  def _startSection(self,name,typecode,count):
+    padding = (-self.position) % 8
+    if padding:
+      self.file.write("\0"*padding)
+      self.position += padding
+    self.sections.append((name,typecode,self.position,count))
+  def writeInts(self,name,values,typecode="i"):
+    """ Write a section of int32 (typecode 'i') or int64 (typecode 'q')
+    """
+    count = len(values)
+    self._startSection(name,typecode,count)
+    for start in range(0,count,PACK_CHUNK_SIZE):
+      chunk = values[start:start+PACK_CHUNK_SIZE]
+      self.file.write(struct.pack("<%d%s" % (len(chunk),typecode),*chunk))
+    self.position += count*ITEM_SIZES[typecode]
+  def writeBytes(self,name,data):
+    self._startSection(name,"B",len(data))
+    self.file.write(data)
+    self.position += len(data)
+  def writeStrings(self,name,strings):
+    """ Write a string table. None is stored as an empty string.
+    """
+    offsets = [0]
+    chunks = []
+    size = 0
+    for string in strings:
+      encoded = (string or u"").encode("utf-8")
+      chunks.append(encoded)
+      size += len(encoded)
+      offsets.append(size)
+    (offsetsSection,dataSection) = getStringTableSections(name)
+    self.writeInts(offsetsSection,offsets,"q")
+    self.writeBytes(dataSection,"".join(chunks))
+  def close(self):
+    directoryOffset = self.position + (-self.position) % 8
+    self.file.write("\0"*(directoryOffset-self.position))
+    for (name,typecode,offset,count) in self.sections:
+      self.file.write(DIRECTORY_ENTRY.pack(name.encode("ascii"),typecode.encode("ascii"),offset,count))
+    self.file.seek(0)
+    self.file.write(HEADER.pack(SNAPSHOT_MAGIC,SNAPSHOT_FORMAT_VERSION,len(self.sections),directoryOffset))
+    self.file.close()
+
+
+#-----------------------------------------------------------------------------------
+#   Reader
+#-----------------------------------------------------------------------------------
+
+READ_CHUNK_SIZE = 65536
+
+class _IntColumn(object):
+  """ Column of packed integers read in place from the snapshot buffer
+  """
+  def __init__(self,buffer,typecode,offset,count):
+    self.buffer = buffer
+    self.typecode = typecode
+    self.offset = offset
+    self.count = count
+    self.itemSize = ITEM_SIZES[typecode]
+  def __len__(self):
+    return self.count
+  def __getitem__(self,i):
+    if i < 0 or i >= self.count:
+      raise IndexError(i)
+    return struct.unpack_from("<"+self.typecode,self.buffer,self.offset+i*self.itemSize)[0]
+  def readRange(self,start,stop):
+    """ Return the tuple of the values in [start,stop)
+    """
+    return struct.unpack_from("<%d%s" % (stop-start,self.typecode),
+                              self.buffer,self.offset+start*self.itemSize)
+  def __iter__(self):
+    for start in range(0,self.count,READ_CHUNK_SIZE):
+      for value in self.readRange(start,min(start+READ_CHUNK_SIZE,self.count)):
+        yield value
+
+class _StringTable(object):
+  """ Table of strings read in place from the snapshot buffer
+  """
+  def __init__(self,buffer,offsets,dataOffset):
+    self.buffer = buffer
+    self.offsets = offsets
+    self.dataOffset = dataOffset
+  def __len__(self):
+    return len(self.offsets)-1
+  def getBytes(self,i):
+    (start,stop) = self.offsets.readRange(i,i+2)
+    return self.buffer[self.dataOffset+start:self.dataOffset+stop]
+  def __getitem__(self,i):
+    return self.getBytes(i).decode("utf-8")
+
+
+class SnapshotElement(object):
+  """ An element of a snapshot, identified by its index
+  """
+  __slots__ = ("snapshot","index")
+  def __init__(self,snapshot,index):
+    self.snapshot = snapshot
+    self.index = index
+  def getName(self):          return self.snapshot.names[self.index]
+  def getId(self):            return self.snapshot.ids[self.index]
+  def getMetaclassName(self): return self.snapshot.getMetaclassName(self.snapshot.metaclasses[self.index])
+  def getTargets(self,featureName):
+    return self.snapshot.getTargets(self,featureName)
+  def __eq__(self,other):
+    return isinstance(other,SnapshotElement) \
+           and other.snapshot is self.snapshot and other.index == self.index
+  def __ne__(self,other):
+    return not self.__eq__(other)
+  def __hash__(self):
+    return self.index
+  def __unicode__(self):
+    return (self.getName() or self.getId())+u" : "+self.getMetaclassName()
+  def __repr__(self):
+    return self.__unicode__().encode("utf-8")
+
+class SnapshotElementList(object):
+  """ Read only list of elements of a snapshot, stored as an array of indexes.
+      Elements are created only when accessed.
+  """
+  def __init__(self,snapshot,indexes):
+    self.snapshot = snapshot
+    self.indexes = indexes
+  def __len__(self):
+    return len(self.indexes)
+  def __getitem__(self,i):
+    if isinstance(i,slice):
+      return SnapshotElementList(self.snapshot,self.indexes[i])
+    return SnapshotElement(self.snapshot,self.indexes[i])
+  def __iter__(self):
+    for index in self.indexes:
+      yield SnapshotElement(self.snapshot,index)
+  def __repr__(self):
+    return repr(list(self))
+
+
+def _getMetaclassNameOf(classe):
+  """ Accept a metaclass name, a MClass or a java interface
+  """
+  if isinstance(classe,basestring):
+    return classe
+  try:
+    return classe.getName()
+  except:
+    return classe.__name__.split(".")[-1]
+
+class Snapshot(object):
+  """ A snapshot opened for reading. The file is memory mapped when possible.
+  """
+  def __init__(self,path):
+    self.path = path
+    self.file = open(path,"rb")
+    if mmap is not None:
+      self.buffer = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+    else:
+      self.buffer = self.file.read()
+    (magic,version,nbSections,directoryOffset) = HEADER.unpack_from(self.buffer,0)
+    if magic != SNAPSHOT_MAGIC:
+      raise ValueError(path+" is not a model snapshot")
+    if version > SNAPSHOT_FORMAT_VERSION:
+      raise ValueError(path+" has an unsupported snapshot format version "+str(version))
+    self.sections = {}
+    for k in range(nbSections):
+      (name,typecode,offset,count) = \
+        DIRECTORY_ENTRY.unpack_from(self.buffer,directoryOffset+k*DIRECTORY_ENTRY.size)
+      self.sections[name.rstrip("\0")] = (typecode,offset,count)
+    self.metaclassNames = self._getStrings("metaclass.names")
+    self.metaclassSupers = self._getInts("metaclass.super")
+    self.ids = self._getStrings("element.ids")
+    self.names = self._getStrings("element.names")
+    self.metaclasses = self._getInts("element.metaclass")
+    self.owners = self._getInts("element.owner")
+    self.featureNames = self._getStrings("feature.names")
+    # small tables are decoded once
+    self.metaclassCodes = dict([ (self.metaclassNames[code],code)
+                                 for code in range(len(self.metaclassNames)) ])
+    self.featureIndexes = dict([ (self.featureNames[k],k)
+                                 for k in range(len(self.featureNames)) ])
+  def _getInts(self,name):
+    (typecode,offset,count) = self.sections[name]
+    return _IntColumn(self.buffer,typecode,offset,count)
+  def _getStrings(self,name):
+    (offsetsSection,dataSection) = getStringTableSections(name)
+    return _StringTable(self.buffer,self._getInts(offsetsSection),self.sections[dataSection][1])
+  def close(self):
+    if mmap is not None:
+      self.buffer.close()
+    self.file.close()
+  def __len__(self):
+    return len(self.metaclasses)
+
+  #---- metaclasses
+  def getMetaclassName(self,code):
+    return self.metaclassNames[code]
+  def getMetaclassCodes(self,classe):
+    """ Return the set of the codes of the given metaclass and its submetaclasses
+    """
+    name = _getMetaclassNameOf(classe)
+    if name not in self.metaclassCodes:
+      return set()
+    root = self.metaclassCodes[name]
+    codes = set()
+    for code in range(len(self.metaclassSupers)):
+      current = code
+      while current != -1 and current != root:
+        current = self.metaclassSupers[current]
+      if current == root:
+        codes.add(code)
+    return codes
+
+  #---- elements
+  def getElement(self,index):
+    return SnapshotElement(self,index)
+  def _getElementsWhere(self,classe,namePredicate=None):
+    codes = self.getMetaclassCodes(classe)
+    indexes = array("i")
+    if len(codes) == 0:
+      return SnapshotElementList(self,indexes)
+    count = len(self)
+    nameOffsets = self.names.offsets
+    for start in range(0,count,READ_CHUNK_SIZE):
+      stop = min(start+READ_CHUNK_SIZE,count)
+      metaclasses = self.metaclasses.readRange(start,stop)
+      offsets = nameOffsets.readRange(start,stop+1) if namePredicate is not None else None
+      for j in range(stop-start):
+        if metaclasses[j] in codes:
+          if namePredicate is None or namePredicate(offsets[j],offsets[j+1]):
+            indexes.append(start+j)
+    return SnapshotElementList(self,indexes)
+  def allInstances(self,classe):
+    return self._getElementsWhere(classe)
+  def instancesNamed(self,classe,name):
+    encoded = name.encode("utf-8")
+    size = len(encoded)
+    buffer = self.buffer
+    dataOffset = self.names.dataOffset
+    def _hasName(start,stop):
+      return stop-start == size and buffer[dataOffset+start:dataOffset+stop] == encoded
+    return self._getElementsWhere(classe,_hasName)
+  def instanceNamed(self,classe,name):
+    r = self.instancesNamed(classe,name)
+    if len(r)==1:
+      return r[0]
+    elif len(r)==0:
+      raise NameError("There is no element named '"+name+"'")
+    else:
+      raise NameError("There are "+str(len(r))+" elements named '"+name+"'")
+  def getElementParent(self,element):
+    owner = self.owners[element.index]
+    return None if owner == -1 else SnapshotElement(self,owner)
+  def getElementParents(self,element,inclusive=False,reverse=False):
+    parents = [element] if inclusive else []
+    parent = self.getElementParent(element)
+    while parent is not None:
+      parents.append(parent)
+      parent = self.getElementParent(parent)
+    if reverse:
+      parents.reverse()
+    return parents
+  def getElementPath(self,element):
+    names = [ self.names[e.index] for e in self.getElementParents(element,inclusive=True,reverse=True) ]
+    if len([ name for name in names if not name ]) != 0:
+      return self.ids[element.index]
+    else:
+      return u".".join(names)
+
+  #---- links
+  def getTargets(self,element,featureName):
+    """ Return the elements linked to the element by the given association feature
+    """
+    if featureName not in self.featureIndexes:
+      return SnapshotElementList(self,array("i"))
+    (offsetsSection,targetsSection) = getEdgeSections(self.featureIndexes[featureName])
+    (start,stop) = self._getInts(offsetsSection).readRange(element.index,element.index+2)
+    return SnapshotElementList(self,array("i",self._getInts(targetsSection).readRange(start,stop)))
+
+
+#-----------------------------------------------------------------------------------
+#   Query functions on the current snapshot
+#   Same signatures as the functions of modelioscriptor and introspection
+#-----------------------------------------------------------------------------------
+
+CURRENT_SNAPSHOT = None
+
+def openSnapshot(path):
+  """ Open a snapshot and make it the current one for the query functions
+      String -> Snapshot
+  """
+  global CURRENT_SNAPSHOT
+  CURRENT_SNAPSHOT = Snapshot(path)
+  return CURRENT_SNAPSHOT
+
+def theSnapshot():
+  return CURRENT_SNAPSHOT
+
+def allInstances(classe):
+  """ Return the list of all instances of a given metaclass (or submetaclass)
+      (String|MClass) -> SnapshotElementList
+  """
+  return CURRENT_SNAPSHOT.allInstances(classe)
+
+def instancesNamed(classe,name):
+  """ Return the list of all instances of that have the given name.
+      (String|MClass)*String -> SnapshotElementList
+  """
+  return CURRENT_SNAPSHOT.instancesNamed(classe,name)
+
+def instanceNamed(classe,name):
+  """ Return the only instance that have the given name.
+      (String|MClass)*String -> SnapshotElement|NameError
+  """
+  return CURRENT_SNAPSHOT.instanceNamed(classe,name)
+
+def getElementParent(element):
+  """ return the parent of an element, as computed by introspection when the
+      snapshot was exported
+  """
+  return CURRENT_SNAPSHOT.getElementParent(element)
+
+def getElementPath(element):
+  """ return a qualified name for the element, or its id if one of the
+      elements of the path has no name
+  """
+  return CURRENT_SNAPSHOT.getElementPath(element)
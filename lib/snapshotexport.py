@@ -0,0 +1,133 @@
+#
+# snapshotexport
+#
+# Export of the current model as a columnar snapshot (see the module snapshot).
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 3.x
+#
+# Description:
+#   The model is walked once. Metaclasses and their association ends are
+#   obtained with the reflection functions of the introspection module and
+#   computed once per metaclass. The parent of an element is the one given by
+#   introspection.getElementParent, so that paths computed on a snapshot are
+#   the same as the ones computed with getElementPath.
+#   Values of association ends that are not exported elements are ignored.
+#
+# Usage:
+#   from snapshotexport import exportSnapshot
+#   exportSnapshot("C:\\snapshots\\mymodel.snapshot")
+#
+# History
+#   Version 1.0
+#      - first version
+
+import time
+from array import array
+
+from misc import isList
+from introspection import ModelioElement
+from introspection import getAllInstances,getMetaclass,getNameFromMetaclass,getSuperMetaclasses
+from introspection import getElementId,getElementParent,getAssociationMetaFeatures
+from snapshot import SnapshotWriter,buildCSR,getEdgeSections
+
+
+class _MetaclassTable(object):
+  """ Give a code to each metaclass, registering its super metaclasses as well
+  """
+  def __init__(self):
+    self.codes = {}
+    self.names = []
+    self.supers = []
+  def getCode(self,metaclass):
+    name = getNameFromMetaclass(metaclass)
+    if name not in self.codes:
+      superMetaclasses = getSuperMetaclasses(metaclass,inclusive=False)
+      if len(superMetaclasses) == 0:
+        superCode = -1
+      else:
+        superCode = self.getCode(superMetaclasses[0])
+      self.codes[name] = len(self.names)
+      self.names.append(name)
+      self.supers.append(superCode)
+    return self.codes[name]
+
+
+def _getName(element):
+  try:
+    return element.getName()
+  except:
+    return None
+
+def exportSnapshot(path,elements=None):
+  """ Export the given elements, or all elements of the model, to a snapshot file.
+      Return the number of elements exported.
+      (String,[Element]|None) -> int
+  """
+  startTime = time.time()
+  if elements is None:
+    elements = getAllInstances(ModelioElement)
+  elements = list(elements)
+  indexes = {}
+  for (i,element) in enumerate(elements):
+    indexes[element] = i
+  metaclassTable = _MetaclassTable()
+  metaclassCodes = array("i")
+  owners = array("i")
+  ids = []
+  names = []
+  # for each association feature name, the index of the feature and
+  # the list of edges as two arrays of sources and targets
+  featureIndexes = {}
+  featureNames = []
+  edgeSources = []
+  edgeTargets = []
+  for (i,element) in enumerate(elements):
+    metaclass = getMetaclass(element)
+    metaclassCodes.append(metaclassTable.getCode(metaclass))
+    ids.append(getElementId(element))
+    names.append(_getName(element))
+    try:
+      owners.append(indexes.get(getElementParent(element),-1))
+    except:
+      owners.append(-1)
+    for feature in getAssociationMetaFeatures(metaclass):
+      value = feature.eval(element)
+      values = value if isList(value) else [value]
+      for target in values:
+        targetIndex = indexes.get(target)
+        if targetIndex is None:
+          continue
+        featureName = feature.getName()
+        if featureName not in featureIndexes:
+          featureIndexes[featureName] = len(featureNames)
+          featureNames.append(featureName)
+          edgeSources.append(array("i"))
+          edgeTargets.append(array("i"))
+        k = featureIndexes[featureName]
+        edgeSources[k].append(i)
+        edgeTargets[k].append(targetIndex)
+  writer = SnapshotWriter(path)
+  try:
+    writer.writeStrings("metaclass.names",metaclassTable.names)
+    writer.writeInts("metaclass.super",metaclassTable.supers)
+    writer.writeStrings("element.ids",ids)
+    writer.writeStrings("element.names",names)
+    writer.writeInts("element.metaclass",metaclassCodes)
+    writer.writeInts("element.owner",owners)
+    writer.writeStrings("feature.names",featureNames)
+    for k in range(len(featureNames)):
+      (offsets,targets) = buildCSR(len(elements),edgeSources[k],edgeTargets[k])
+      (offsetsSection,targetsSection) = getEdgeSections(k)
+      writer.writeInts(offsetsSection,offsets)
+      writer.writeInts(targetsSection,targets)
+  finally:
+    writer.close()
+  nbEdges = sum([len(sources) for sources in edgeSources])
+  print "%d elements, %d metaclasses, %d association features, %d links exported to %s in %.1fs" \
+        % (len(elements),len(metaclassTable.names),len(featureNames),nbEdges,path,time.time()-startTime)
+  return len(elements)
+
+
+print "module snapshotexport loaded from",__file__
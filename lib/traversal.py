@@ -0,0 +1,166 @@
+#
+# traversal
+#
+# Traversal of the graph of model elements along the meta features.
+#
+# Author: jmfavre
+#
+# Compatibility: Modelio 2.x, Modelio 3.x
+#
+# Description:
+#   The model is a graph whose nodes are elements and whose edges are the
+#   values of the association ends of the metaclasses (see getMetaFeatures
+#   in the introspection module). This graph contains cycles, for instance
+#   between an element and its owner, so exploring it as a tree is endless.
+#   The traversal below visits each element once, elements being identified
+#   by their id (see getElementId). It can be done breadth first or depth
+#   first, restricted to some features and limited in depth. It is a
+#   generator: steps are produced while the graph is traversed, so that
+#   a traversal can be stopped at any time.
+#   Virtual features (e.g. diagram related features) are excluded by default
+#   since they are computed by scanning diagrams.
+#
+# Usage:
+#   for step in traverse(myclass,features=["getOwner","getOwnedElement"],maxDepth=2):
+#     print step.depth,step.element
+#   reachable(myclass,features=["getDependsOnDependency","getDependsOn"])
+#
+# History
+#   Version 1.0
+#      - first version
+
+__all__ = [
+  "TraversalStep",
+  "traverse",
+  "reachable",
+  "getTraversalFeatures",
+]
+
+from collections import deque
+
+from misc import isList
+from introspection import getMetaclass,getMetaFeatures,getAssociationMetaFeatures
+from introspection import getNameFromMetaclass,getElementId,isElement
+
+
+class TraversalStep(object):
+  """ The visit of an element during a traversal: the element, its depth
+      (0 for the roots), and the element and the feature from which it was
+      reached (None for the roots)
+  """
+  __slots__ = ["element","depth","source","feature"]
+  def __init__(self,element,depth,source=None,feature=None):
+    self.element = element
+    self.depth = depth
+    self.source = source
+    self.feature = feature
+  def __repr__(self):
+    if self.feature is None:
+      return "TraversalStep(%r,%d)" % (self.element,self.depth)
+    return "TraversalStep(%r,%d,%s)" % (self.element,self.depth,self.feature.getName())
+
+
+# metaclass name -> association meta features, virtual ones included
+_TRAVERSAL_FEATURES = dict()
+
+def getTraversalFeatures(metaclass,virtualFeatures=False):
+  """ Return the meta features of the metaclass that can be followed, that is
+      association ends, including virtual ones if virtualFeatures is True
+  """
+  if not virtualFeatures:
+    return getAssociationMetaFeatures(metaclass)
+  key = getNameFromMetaclass(metaclass)
+  if key not in _TRAVERSAL_FEATURES:
+    _TRAVERSAL_FEATURES[key] = \
+      [ feature for feature in getMetaFeatures(metaclass) if feature.isAssociationEnd ]
+  return _TRAVERSAL_FEATURES[key]
+
+def _getFeatureFilter(features):
+  """ Return a function selecting meta features from None (all features),
+      a list of feature names or a function
+  """
+  if features is None:
+    return lambda feature:True
+  elif callable(features):
+    return features
+  else:
+    names = set(features)
+    return lambda feature:feature.getName() in names
+
+def _getTargets(element,feature):
+  value = feature.eval(element)
+  if isList(value):
+    return [ target for target in value if isElement(target) ]
+  elif isElement(value):
+    return [value]
+  else:
+    return []
+
+def traverse(roots,features=None,maxDepth=None,depthFirst=False,
+             virtualFeatures=False,visited=None):
+  """ Generate a step for each element reachable from the roots, each element
+      being visited once. features is None to follow all the association ends,
+      a list of feature names, or a function taking a meta feature and returning
+      True if it should be followed. Elements at depth maxDepth are visited but
+      their features are not followed. visited is an optional set of element
+      ids, updated with the elements visited; the elements already in this set
+      are not visited.
+      (Element|[Element],[String]|(MetaFeature->Boolean)|None,int|None,
+       Boolean,Boolean,set|None) -> generator(TraversalStep)
+      EXAMPLES
+        for step in traverse(myclass,["getOwner"]):
+          print step.element
+        list(traverse(mypackage,maxDepth=1,depthFirst=True))
+  """
+  if not isList(roots):
+    roots = [roots]
+  featureFilter = _getFeatureFilter(features)
+  if visited is None:
+    visited = set()
+  # metaclass name -> features to follow
+  followedFeatures = {}
+  pending = deque()
+  for root in roots:
+    rootId = getElementId(root)
+    if rootId not in visited:
+      visited.add(rootId)
+      pending.append(TraversalStep(root,0))
+  while len(pending) != 0:
+    if depthFirst:
+      step = pending.pop()
+    else:
+      step = pending.popleft()
+    yield step
+    if maxDepth is not None and step.depth >= maxDepth:
+      continue
+    element = step.element
+    metaclass = getMetaclass(element)
+    metaclassName = getNameFromMetaclass(metaclass)
+    if metaclassName not in followedFeatures:
+      followedFeatures[metaclassName] = \
+        [ feature for feature in getTraversalFeatures(metaclass,virtualFeatures)
+            if featureFilter(feature) ]
+    nextSteps = []
+    for feature in followedFeatures[metaclassName]:
+      for target in _getTargets(element,feature):
+        targetId = getElementId(target)
+        if targetId not in visited:
+          visited.add(targetId)
+          nextSteps.append(TraversalStep(target,step.depth+1,element,feature))
+    if depthFirst:
+      # so that targets are visited in the order of the features
+      nextSteps.reverse()
+    pending.extend(nextSteps)
+
+def reachable(roots,features=None,maxDepth=None,inclusive=False,virtualFeatures=False):
+  """ Return the list of elements reachable from the roots, in breadth first
+      order. Roots are included only if inclusive is True.
+      EXAMPLES
+        reachable(myclass,["getOwner"])      # all owners of myclass
+  """
+  return [ step.element
+           for step in traverse(roots,features,maxDepth,virtualFeatures=virtualFeatures)
+           if inclusive or step.depth != 0 ]
+
+
+print "module traversal loaded from",__file__